@@ -0,0 +1,221 @@
+"""Benchmark the vectorized cleaning parsers against the original per-row versions.
+
+Generates synthetic raw columns in the imot.bg formats (about 44k distinct
+prices in € and лв. with thousands separators, "55 m 2" areas, float floors
+as read from CSV, heating/construction/district strings from the pilot
+vocabulary, plus a share of missing and malformed values) and, for each size:
+- checks every vectorized parser against its `legacy_*` copy below
+  (`pd.testing.assert_series_equal`, only where the legacy run is timed)
+- reports rows/s for both; legacy runs are skipped above `--legacy-max-rows`
+  because they take minutes at 10M rows
+
+Usage:
+  python -m src.benchmarks.cleaning                        # 10k, 1M, 10M rows
+  python -m src.benchmarks.cleaning --rows 10000 1000000 --legacy-max-rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from src.processing import cleaning
+from src.processing.cleaning import EUR_TO_BGN
+
+DEFAULT_ROWS = (10_000, 1_000_000, 10_000_000)
+
+HEATING = ["ТEЦ: ДА", "Газ: НЕ; ТEЦ: ДА", "ТEЦ: Лок.отопл.", "Газ: ДА", "Ток", "Климатик", "Лок.отопл.: ДА", ""]
+CONSTRUCTION = ["Тухла", "ЕПК", "Панел", "ПК", "Гредоред", "тухла 2019"]
+DISTRICTS = ["Лозенец", "Младост 1", "Овча купел 2", "Банишора", "Борово", "Център", "Люлин 5", "Студентски град"]
+
+# --- original implementations (row-wise `Series.apply`), kept verbatim for parity ---
+
+def legacy_parse_price(series: pd.Series) -> pd.Series:
+    def _one(val: str | float) -> float | np.nan:
+        if pd.isna(val):
+            return np.nan
+        text = str(val)
+        currency = "EUR" if re.search(r"€|eur|евро", text, flags=re.IGNORECASE) else "BGN"
+        num_match = re.search(r"([\d\s.,]+)", text)
+        if not num_match:
+            return np.nan
+        num_str = num_match.group(1).replace(" ", "").replace(",", ".")
+        try:
+            amt = float(num_str)
+        except ValueError:
+            return np.nan
+        return amt if currency == "EUR" else amt / EUR_TO_BGN
+
+    return series.apply(_one)
+
+def legacy_parse_area(series: pd.Series) -> pd.Series:
+    def _one(val: str | float) -> float | np.nan:
+        if pd.isna(val):
+            return np.nan
+        m = re.search(r"([\d\s.,]+)", str(val))
+        if not m:
+            return np.nan
+        num_str = m.group(1).replace(" ", "").replace(",", ".")
+        try:
+            return float(num_str)
+        except ValueError:
+            return np.nan
+
+    return series.apply(_one)
+
+def legacy_parse_floor(series: pd.Series) -> pd.Series:
+    def _one(val: str | float) -> float | np.nan:
+        if pd.isna(val):
+            return np.nan
+        m = re.search(r"(\d+)", str(val))
+        return float(m.group(1)) if m else np.nan
+
+    return series.apply(_one)
+
+def legacy_parse_max_floor(series: pd.Series) -> pd.Series:
+    def _one(val: str | float) -> float | np.nan:
+        if pd.isna(val):
+            return np.nan
+        text = str(val)
+        m = re.search(r"(?:от|/)\s*(\d+)", text)
+        if m:
+            try:
+                return float(m.group(1))
+            except ValueError:
+                return np.nan
+        m2 = re.search(r"(\d+)", text)
+        if m2:
+            try:
+                return float(m2.group(1))
+            except ValueError:
+                return np.nan
+        return np.nan
+
+    return series.apply(_one)
+
+def legacy_map_heating(series: pd.Series) -> pd.Series:
+    def _one(val: str | float) -> str | None:
+        if pd.isna(val):
+            return None
+        t = str(val).lower()
+        if "тец" in t:
+            return "district"
+        if "газ" in t:
+            return "gas"
+        if "електр" in t or "ток" in t or "клим" in t:
+            return "electric"
+        return "other"
+    return series.apply(_one)
+
+def legacy_map_construction(series: pd.Series) -> pd.Series:
+    def _one(val: str | float) -> str | None:
+        if pd.isna(val):
+            return None
+        t = str(val).lower()
+        if "панел" in t:
+            return "panel"
+        if "епк" in t or "пк" in t:
+            return "epk"
+        if "тухл" in t:
+            return "brick"
+        return "other"
+
+    return series.apply(_one)
+
+def legacy_standardize_district(series: pd.Series) -> pd.Series:
+    def _one(val: str | float) -> str | None:
+        if pd.isna(val):
+            return None
+        t = str(val)
+        t = re.sub(r"^гр\.?\s*София[, ]*", "", t, flags=re.IGNORECASE)
+        t = re.sub(r"^град\s*София[, ]*", "", t, flags=re.IGNORECASE)
+        return t.strip()
+    return series.apply(_one)
+
+# (column, vectorized, legacy)
+CASES: list[tuple[str, Callable[[pd.Series], pd.Series], Callable[[pd.Series], pd.Series]]] = [
+    ("price_raw", cleaning.parse_price, legacy_parse_price),
+    ("area_raw", cleaning.parse_area, legacy_parse_area),
+    ("floor_raw", cleaning.parse_floor, legacy_parse_floor),
+    ("max_floor_raw", cleaning.parse_max_floor, legacy_parse_max_floor),
+    ("heat_raw", cleaning.map_heating, legacy_map_heating),
+    ("construction_raw", cleaning.map_construction, legacy_map_construction),
+    ("district_raw", cleaning.standardize_district, legacy_standardize_district),
+]
+
+def _column(vocab: list[str | None], rows: int, rng: np.random.Generator, missing: float = 0.03) -> pd.Series:
+    """`rows` draws from `vocab` as a string column (like `read_csv`), with a share of missing values."""
+    values = pd.Series([None, *vocab], dtype="str")
+    picks = rng.integers(1, len(values), rows)
+    picks[rng.random(rows) < missing] = 0
+    return values.take(picks).reset_index(drop=True)
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic raw listings with realistic value formats and cardinality."""
+    rng = np.random.default_rng(seed)
+    prices = [f"{k} {h}00{suffix}" for k in range(20, 900) for h in range(10) for suffix in (" €", " EUR", " лв.", " евро", "")]
+    prices.append("Цена при запитване")
+    areas = [f"{a} m 2" for a in range(18, 250)] + ["55,5 кв.м", "около 60 кв.м"]
+    floors = rng.integers(-1, 20, rows).astype(float)
+    max_floors = floors + rng.integers(0, 10, rows)
+    return pd.DataFrame({
+        "price_raw": _column(prices, rows, rng),
+        "area_raw": _column(areas, rows, rng),
+        "floor_raw": np.where(rng.random(rows) < 0.03, np.nan, floors),
+        "max_floor_raw": np.where(rng.random(rows) < 0.05, np.nan, max_floors),
+        "heat_raw": _column(HEATING, rows, rng),
+        "construction_raw": _column(CONSTRUCTION, rows, rng),
+        "district_raw": _column([f"град София, {d}" for d in DISTRICTS] + DISTRICTS[:2], rows, rng),
+    })
+
+def _timed(fn: Callable[[pd.Series], pd.Series], series: pd.Series) -> tuple[pd.Series, float]:
+    start = time.perf_counter()
+    out = fn(series)
+    return out, time.perf_counter() - start
+
+def run(sizes: tuple[int, ...] = DEFAULT_ROWS, legacy_max_rows: int = 1_000_000) -> list[dict[str, object]]:
+    """Time and parity-check every parser at each size; one result dict per (size, column)."""
+    results = []
+    for rows in sizes:
+        df = make_frame(rows)
+        for column, fast, legacy in CASES:
+            fast_out, fast_s = _timed(fast, df[column])
+            legacy_s = None
+            same = None
+            if rows <= legacy_max_rows:
+                legacy_out, legacy_s = _timed(legacy, df[column])
+                try:
+                    pd.testing.assert_series_equal(fast_out, legacy_out)
+                    same = True
+                except AssertionError as exc:
+                    same = False
+                    print(f"[mismatch] {column} rows={rows}: {exc}")
+            results.append({
+                "rows": rows,
+                "column": column,
+                "fast_rows_per_s": rows / fast_s if fast_s else float("inf"),
+                "legacy_rows_per_s": rows / legacy_s if legacy_s else None,
+                "speedup": legacy_s / fast_s if legacy_s and fast_s else None,
+                "same_output": same,
+            })
+    return results
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark vectorized cleaning parsers")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS), help="Row counts to test")
+    parser.add_argument("--legacy-max-rows", type=int, default=1_000_000, help="Skip the row-wise versions above this size")
+    args = parser.parse_args(argv)
+    results = run(tuple(args.rows), args.legacy_max_rows)
+    print(f"{'rows':>10} {'column':<17}{'fast rows/s':>14}{'legacy rows/s':>15}{'speedup':>9}  same")
+    for r in results:
+        legacy = f"{r['legacy_rows_per_s']:>15,.0f}" if r["legacy_rows_per_s"] else f"{'-':>15}"
+        speedup = f"{r['speedup']:>8.1f}x" if r["speedup"] else f"{'-':>9}"
+        print(f"{r['rows']:>10,} {r['column']:<17}{r['fast_rows_per_s']:>14,.0f}{legacy}{speedup}  {r['same_output']}")
+    return 1 if any(r["same_output"] is False for r in results) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+"""Benchmark `_decode_html` against the original multi-candidate decoder.
+
+Builds detail pages in the imot.bg DOM shape (padded to a realistic 200-400 KB)
+in cp1251 and utf-8, with and without a declared charset, wraps them in
+`requests.Response` objects and times:
+- `legacy`: the original implementation (every candidate decoded in full,
+  Cyrillic counted per character, `apparent_encoding` via chardet)
+- `fast-cold`: the current `_decode_html` with an empty per-host cache
+- `fast-warm`: the current `_decode_html` once the host/page type is cached
+
+Outputs of both decoders are compared before timing; `ok` columns report
+whether each decoder recovered the Cyrillic text (the legacy scorer prefers
+cp1251 mojibake on utf-8 pages, so outputs differ there by design).
+
+Usage:
+  python -m src.benchmarks.decode --size-kb 300 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable, Mapping
+
+import requests
+
+from src.scraping.encoding import clear_encoding_cache
+from src.scraping.fixture_server import render_detail_page
+from src.scraping.pipeline import _decode_html
+
+SAMPLE_ROW = {
+    "url": "https://www.imot.bg/obiava-1a176060746046054-prodava-ednostaen-apartament-grad-sofiya-lozenets",
+    "listing_id": "ida1a176060746046054",
+    "price_raw": "115 000 €",
+    "area_raw": "55 m 2",
+    "rooms": 1,
+    "district_raw": "град София, Лозенец",
+    "floor_raw": 6,
+    "max_floor_raw": 10,
+    "heat_raw": "ТEЦ: ДА",
+    "construction_raw": "Тухла",
+    "year_raw": 2019,
+    "desc_text": "Описание на имота: слънчев апартамент в тухлена сграда, ТЕЦ, асансьор.",
+}
+
+def legacy_decode_html(resp: requests.Response) -> str:
+    """Original `_decode_html`: choose the candidate encoding with most Cyrillic characters."""
+    candidates: list[str] = []
+    if resp.encoding:
+        candidates.append(resp.encoding)
+    if resp.apparent_encoding and resp.apparent_encoding not in candidates:
+        candidates.append(resp.apparent_encoding)
+    for enc in ("utf-8", "cp1251"):
+        if enc not in candidates:
+            candidates.append(enc)
+
+    best_html = None
+    best_score = -1
+    for enc in candidates:
+        try:
+            html = resp.content.decode(enc, errors="ignore")
+        except Exception:
+            continue
+        score = sum(1 for ch in html if "\u0400" <= ch <= "\u04FF")
+        if score > best_score:
+            best_score = score
+            best_html = html
+    return best_html or resp.text
+
+def make_page(size_kb: int, row: Mapping[str, Any] = SAMPLE_ROW) -> str:
+    """Render a detail page for `row` and pad it with scripts/markup up to ~`size_kb` KB."""
+    page = render_detail_page(row)
+    filler_unit = (
+        '<div class="similar"><a href="/obiava-x">Продава 2-СТАЕН, град София, Младост 1</a>'
+        "<script>window.dataLayer=window.dataLayer||[];dataLayer.push({event:'view'});</script></div>"
+    )
+    filler = []
+    while len(page) + sum(map(len, filler)) < size_kb * 1024:
+        filler.append(filler_unit)
+    return page.replace("</body>", "".join(filler) + "</body>")
+
+def make_response(html: str, *, encoding: str, declare: bool, url: str = SAMPLE_ROW["url"]) -> requests.Response:
+    body = html if declare else html.replace('<meta charset="windows-1251">', "")
+    resp = requests.Response()
+    resp._content = body.encode(encoding)
+    resp.status_code = 200
+    resp.url = url
+    ctype = "text/html"
+    if declare:
+        ctype += f"; charset={encoding}"
+    resp.headers["Content-Type"] = ctype
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    return resp
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(size_kb: int = 300, repeat: int = 20) -> list[dict[str, object]]:
+    """Time both decoders on each page variant; return one result dict per variant."""
+    html = make_page(size_kb)
+    results = []
+    for encoding in ("cp1251", "utf-8"):
+        for declare in (True, False):
+            resp = make_response(html, encoding=encoding, declare=declare)
+            clear_encoding_cache()
+            fast_out = _decode_html(resp, page_type="detail")
+            legacy_out = legacy_decode_html(resp)
+
+            def cold() -> None:
+                clear_encoding_cache()
+                _decode_html(resp, page_type="detail")
+
+            legacy_s = _time(lambda: legacy_decode_html(resp), repeat)
+            cold_s = _time(cold, repeat)
+            _decode_html(resp, page_type="detail")
+            warm_s = _time(lambda: _decode_html(resp, page_type="detail"), repeat)
+            results.append({
+                "variant": f"{encoding}{'+declared' if declare else ''}",
+                "bytes": len(resp.content),
+                "legacy_ms": legacy_s * 1000,
+                "fast_cold_ms": cold_s * 1000,
+                "fast_warm_ms": warm_s * 1000,
+                "speedup_warm": legacy_s / warm_s if warm_s else float("inf"),
+                "same_output": fast_out == legacy_out,
+                "legacy_ok": "Продава" in legacy_out,
+                "fast_ok": "Продава" in fast_out,
+            })
+    return results
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark HTML decoding")
+    parser.add_argument("--size-kb", type=int, default=300, help="Approximate page size")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions (best-of)")
+    args = parser.parse_args(argv)
+    print(f"{'variant':<18}{'bytes':>9}{'legacy ms':>11}{'cold ms':>9}{'warm ms':>9}{'speedup':>9}  same  legacy-ok fast-ok")
+    for r in run(args.size_kb, args.repeat):
+        print(
+            f"{r['variant']:<18}{r['bytes']:>9}{r['legacy_ms']:>11.2f}{r['fast_cold_ms']:>9.2f}"
+            f"{r['fast_warm_ms']:>9.2f}{r['speedup_warm']:>8.0f}x  {str(r['same_output']):<5} {str(r['legacy_ok']):<9} {r['fast_ok']}"
+        )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
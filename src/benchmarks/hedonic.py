@@ -0,0 +1,117 @@
+"""Benchmark the absorbed fixed-effects OLS against the statsmodels dummy-variable fit.
+
+Generates synthetic model frames shaped like notebook 03's `df_model`
+(log price/area, rooms, floor flags, newbuild, heating and construction
+categoricals, `districts` district levels with skewed sizes and a share of
+missing floors) and, for each size:
+- fits the notebook formula with `fixed_effects.fit_fe_ols` and, up to
+  `--statsmodels-max-rows`, with `smf.ols`
+- reports wall time and peak traced memory (`tracemalloc`; NumPy and pandas
+  buffers are traced) of both
+- checks params, residuals and per-district mean residuals agree (max
+  absolute difference)
+
+Usage:
+  python -m src.benchmarks.hedonic                                  # 10k, 100k, 1M rows
+  python -m src.benchmarks.hedonic --rows 50000 --districts 500 --statsmodels-max-rows 50000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+import warnings
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from src.modeling.fixed_effects import HEDONIC_FORMULA as FORMULA, fit_fe_ols
+
+DEFAULT_ROWS = (10_000, 100_000, 1_000_000)
+
+def make_frame(rows: int, districts: int = 300, seed: int = 0) -> pd.DataFrame:
+    """Synthetic model frame with known district effects and Zipf-like district sizes."""
+    rng = np.random.default_rng(seed)
+    names = [f"district_{i:04d}" for i in range(districts)]
+    weights = 1 / np.arange(1, districts + 1)
+    district = rng.choice(districts, rows, p=weights / weights.sum())
+    effects = rng.normal(0, 0.25, districts)
+    log_area = rng.normal(4.1, 0.35, rows)
+    rooms = rng.integers(1, 4, rows).astype(float)
+    floor = rng.integers(0, 16, rows).astype(float)
+    newbuild = (rng.random(rows) < 0.5).astype(float)
+    heat = rng.choice(["district", "electric", "gas", "other"], rows)
+    construction = rng.choice(["brick", "epk", "other", "panel"], rows)
+    log_price = (7.5 + 0.7 * log_area + 0.1 * rooms + 0.01 * floor - 0.05 * newbuild
+                 + effects[district] + rng.normal(0, 0.2, rows))
+    floor[rng.random(rows) < 0.02] = np.nan
+    return pd.DataFrame({
+        "log_price": log_price,
+        "log_area": log_area,
+        "rooms": rooms,
+        "floor": floor,
+        "is_ground_floor": (floor == 0).astype(float),
+        "is_top_floor": (rng.random(rows) < 0.15).astype(float),
+        "newbuild": newbuild,
+        "heat": pd.Categorical(heat, categories=["district", "electric", "gas", "other"]),
+        "construction_type": pd.Categorical(construction, categories=["brick", "epk", "other", "panel"]),
+        "district": pd.Categorical(np.asarray(names)[district], categories=names),
+    })
+
+def _profiled(fn: Callable[[], Any]) -> tuple[Any, float, float]:
+    """(result, seconds, peak MB traced) of `fn()`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return out, seconds, peak
+
+def _statsmodels_fit(df: pd.DataFrame) -> Any:
+    import statsmodels.formula.api as smf
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return smf.ols(FORMULA, data=df).fit()
+
+def run(sizes: tuple[int, ...] = DEFAULT_ROWS, districts: int = 300,
+        statsmodels_max_rows: int = 200_000) -> list[dict[str, object]]:
+    """Time both fits at each size; one result dict per size."""
+    results = []
+    for rows in sizes:
+        df = make_frame(rows, districts)
+        fe, fe_s, fe_mb = _profiled(lambda: fit_fe_ols(FORMULA, df))
+        result: dict[str, object] = {"rows": rows, "fe_s": fe_s, "fe_peak_mb": fe_mb,
+                                     "sm_s": None, "sm_peak_mb": None, "max_abs_diff": None}
+        if rows <= statsmodels_max_rows:
+            sm, sm_s, sm_mb = _profiled(lambda: _statsmodels_fit(df))
+            resid_means = sm.resid.groupby(df.loc[sm.resid.index, "district"], observed=True).mean()
+            result.update(sm_s=sm_s, sm_peak_mb=sm_mb, max_abs_diff=max(
+                float((sm.params - fe.params[sm.params.index]).abs().max()),
+                float((sm.resid - fe.resid).abs().max()),
+                float((resid_means - fe.district_residuals()).abs().max()),
+            ))
+        results.append(result)
+    return results
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark absorbed fixed-effects OLS vs statsmodels")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS), help="Row counts to test")
+    parser.add_argument("--districts", type=int, default=300, help="Number of district levels")
+    parser.add_argument("--statsmodels-max-rows", type=int, default=200_000,
+                        help="Skip the statsmodels fit above this size (dense dummies)")
+    args = parser.parse_args(argv)
+    results = run(tuple(args.rows), args.districts, args.statsmodels_max_rows)
+    print(f"{'rows':>10}{'fe s':>9}{'fe MB':>9}{'sm s':>9}{'sm MB':>9}{'speedup':>9}{'max |diff|':>12}")
+    for r in results:
+        sm_s = f"{r['sm_s']:>9.2f}" if r["sm_s"] is not None else f"{'-':>9}"
+        sm_mb = f"{r['sm_peak_mb']:>9.0f}" if r["sm_peak_mb"] is not None else f"{'-':>9}"
+        speedup = f"{r['sm_s'] / r['fe_s']:>8.1f}x" if r["sm_s"] is not None else f"{'-':>9}"
+        diff = f"{r['max_abs_diff']:>12.1e}" if r["max_abs_diff"] is not None else f"{'-':>12}"
+        print(f"{r['rows']:>10,}{r['fe_s']:>9.2f}{r['fe_peak_mb']:>9.0f}{sm_s}{sm_mb}{speedup}{diff}")
+    return 1 if any(r["max_abs_diff"] is not None and r["max_abs_diff"] > 1e-6 for r in results) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+"""Parity check for the HTML parser backends over the pilot fixtures.
+
+Renders every row of the pilot CSVs into imot.bg-shaped result and detail pages
+(`fixture_server`), runs `extract_results_page` (cards + next page from one
+tree) and `parse_listing_detail` with each backend and reports any difference from the
+"bs4" reference. Saved real pages (`parse_pool.save_page` layout) can be added
+with `--pages-dir`. Exits non-zero on any mismatch and prints per-backend
+timings.
+
+Usage:
+  python -m src.benchmarks.parser_parity
+  python -m src.benchmarks.parser_parity --pages-dir data/html
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from src.scraping.fixture_server import render_detail_page, render_results_page
+from src.scraping.html_backend import BACKENDS, lxml
+from src.scraping.parse_pool import _iter_saved_pages, load_saved_page
+from src.scraping.pipeline import extract_results_page, parse_listing_detail
+
+PILOT_GLOB = "data/raw/sales/raw_*_pilot.csv"
+PAGE_SIZE = 20
+
+def load_pilot_rows(pattern: str = PILOT_GLOB) -> dict[int, list[dict[str, Any]]]:
+    """Pilot rows grouped by room count (empty strings become None)."""
+    by_rooms: dict[int, list[dict[str, Any]]] = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                row = {k: (v if v != "" else None) for k, v in row.items()}
+                by_rooms.setdefault(int(row["rooms"]), []).append(row)
+    return by_rooms
+
+def iter_cases(by_rooms: dict[int, list[dict[str, Any]]], pages_dir: str | None = None) -> Iterator[tuple[str, str, int, str]]:
+    """Yield (kind, name, rooms, html) for every fixture page."""
+    host = "https://www.imot.bg"
+    for rooms, rows in by_rooms.items():
+        for start in range(0, len(rows), PAGE_SIZE):
+            page_num = start // PAGE_SIZE + 1
+            yield "results", f"rooms={rooms} p-{page_num}", rooms, render_results_page(
+                rows[start:start + PAGE_SIZE], rooms=rooms, host_url=host,
+                next_url=f"{host}/p-{page_num + 1}" if start + PAGE_SIZE < len(rows) else None,
+            )
+        for row in rows:
+            yield "detail", str(row["url"]), rooms, render_detail_page(row)
+    if pages_dir:
+        for path, rooms in _iter_saved_pages(Path(pages_dir), None):
+            url, html = load_saved_page(path)
+            yield "detail", url, rooms, html
+
+def _extract(kind: str, html: str, rooms: int, backend: str) -> Any:
+    if kind == "results":
+        return extract_results_page(html, "https://www.imot.bg/p-1", backend=backend)
+    return parse_listing_detail(html, rooms=rooms, backend=backend)
+
+def run(pages_dir: str | None = None, pattern: str = PILOT_GLOB) -> tuple[int, int, dict[str, float]]:
+    """Return (cases, mismatches, seconds per backend)."""
+    backends = [b for b in BACKENDS if b != "lxml" or lxml is not None]
+    cases = list(iter_cases(load_pilot_rows(pattern), pages_dir))
+    timings = {b: 0.0 for b in backends}
+    mismatches = 0
+    for kind, name, rooms, html in cases:
+        outputs = {}
+        for backend in backends:
+            start = time.perf_counter()
+            outputs[backend] = _extract(kind, html, rooms, backend)
+            timings[backend] += time.perf_counter() - start
+        for backend in backends[1:]:
+            if outputs[backend] != outputs["bs4"]:
+                mismatches += 1
+                print(f"[mismatch] {backend} {kind} {name}")
+                print(f"  bs4:     {outputs['bs4']}")
+                print(f"  {backend}: {outputs[backend]}")
+    return len(cases), mismatches, timings
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Check parser backend parity over pilot fixtures")
+    parser.add_argument("--pages-dir", default=None, help="Also check saved pages from this directory")
+    parser.add_argument("--pattern", default=PILOT_GLOB, help="Glob of raw CSVs to render")
+    args = parser.parse_args(argv)
+    cases, mismatches, timings = run(args.pages_dir, args.pattern)
+    for backend, secs in timings.items():
+        print(f"[parity] {backend:<5} {secs:.2f}s over {cases} pages")
+    print(f"[parity] {cases} pages, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+"""Peak memory of the in-memory vs streaming combine-and-clean paths.
+
+Writes synthetic crawl histories of growing length (each file resamples the
+pilot rows, with about a third of the rows repeating listings of earlier
+files, as consecutive crawls do) and, for each history, runs in a fresh
+process:
+- `batch`: `load_and_concat` -> `drop_exact_duplicates` -> `clean_listings`
+  -> `schema.write_processed` (the notebook 02 path)
+- `stream`: `stream.stream_clean` into a fresh CSV
+
+and reports peak RSS and wall time. The two processed CSVs are compared
+(`read_processed`, `assert_frame_equal`) for every history.
+
+Usage:
+  python -m src.benchmarks.streaming                          # 4, 16, 64 files
+  python -m src.benchmarks.streaming --files 8 32 --rows-per-file 5000 --chunksize 20000
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_FILES = (4, 16, 64)
+PILOT_GLOB = "data/raw/sales/raw_room*_pilot.csv"
+
+def write_history(directory: Path, files: int, rows_per_file: int, seed: int = 0) -> list[Path]:
+    """`files` raw CSVs of resampled pilot rows; ~1/3 of each file repeats earlier listings."""
+    from src.processing.combine import list_raw_paths, load_and_concat
+
+    rng = np.random.default_rng(seed)
+    pilot = load_and_concat(list_raw_paths(PILOT_GLOB))
+    paths = []
+    for i in range(files):
+        rows = pilot.iloc[rng.integers(0, len(pilot), rows_per_file)].reset_index(drop=True)
+        crawl = rng.integers(0, i + 1, rows_per_file)
+        crawl[rng.random(rows_per_file) > 1 / 3] = i  # the rest are new in this crawl
+        rows["url"] = rows["url"] + "-c" + pd.Series(crawl).astype(str)
+        path = directory / f"raw_{i:04d}.csv"
+        rows.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def _measure(mode: str, paths: list[Path], output: Path, chunksize: int) -> tuple[float, float]:
+    """Run one path in this (fresh) process; return (peak RSS MB, seconds)."""
+    from src.processing.cleaning import clean_listings
+    from src.processing.combine import drop_exact_duplicates, load_and_concat
+    from src.processing.schema import write_processed
+    from src.processing.stream import stream_clean
+
+    start = time.perf_counter()
+    if mode == "batch":
+        write_processed(clean_listings(drop_exact_duplicates(load_and_concat(paths))), output)
+    else:
+        stream_clean(paths, output, chunksize=chunksize, rebuild=True)
+    seconds = time.perf_counter() - start
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, seconds
+
+def _in_fresh_process(*args: object) -> tuple[float, float]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_measure, *args).result()
+
+def run(file_counts: tuple[int, ...] = DEFAULT_FILES, rows_per_file: int = 2_000,
+        chunksize: int = 10_000) -> list[dict[str, object]]:
+    """Measure both paths for each history length; one result dict per file count."""
+    from src.processing.schema import read_processed
+
+    results = []
+    for files in file_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            paths = write_history(tmp, files, rows_per_file)
+            batch_mb, batch_s = _in_fresh_process("batch", paths, tmp / "batch.csv", chunksize)
+            stream_mb, stream_s = _in_fresh_process("stream", paths, tmp / "stream.csv", chunksize)
+            batch, stream = read_processed(tmp / "batch.csv"), read_processed(tmp / "stream.csv")
+            try:
+                pd.testing.assert_frame_equal(batch, stream)
+                same = True
+            except AssertionError as exc:
+                same = False
+                print(f"[mismatch] files={files}: {exc}")
+            results.append({
+                "files": files,
+                "raw_rows": files * rows_per_file,
+                "processed_rows": len(stream),
+                "batch_peak_mb": batch_mb,
+                "stream_peak_mb": stream_mb,
+                "batch_s": batch_s,
+                "stream_s": stream_s,
+                "same_output": same,
+            })
+    return results
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Peak memory of batch vs streaming cleaning")
+    parser.add_argument("--files", type=int, nargs="+", default=list(DEFAULT_FILES), help="History lengths to test")
+    parser.add_argument("--rows-per-file", type=int, default=2_000, help="Raw rows per crawl file")
+    parser.add_argument("--chunksize", type=int, default=10_000, help="Streaming chunk size")
+    args = parser.parse_args(argv)
+    results = run(tuple(args.files), args.rows_per_file, args.chunksize)
+    print(f"{'files':>6}{'raw rows':>10}{'out rows':>10}{'batch MB':>10}{'stream MB':>11}{'batch s':>9}{'stream s':>10}  same")
+    for r in results:
+        print(f"{r['files']:>6}{r['raw_rows']:>10,}{r['processed_rows']:>10,}{r['batch_peak_mb']:>10.0f}"
+              f"{r['stream_peak_mb']:>11.0f}{r['batch_s']:>9.2f}{r['stream_s']:>10.2f}  {r['same_output']}")
+    return 1 if any(r["same_output"] is False for r in results) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
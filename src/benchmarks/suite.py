@@ -0,0 +1,345 @@
+"""End-to-end benchmark suite on synthetic imot.bg data at production scale.
+
+Generates `--listings` synthetic raw rows (Sofia-like district mix with
+Zipf-like sizes, prices consistent with area/rooms/district, the raw value
+formats of the pilot CSVs, descriptions of a few hundred to ~2k characters)
+and renders them into the fixtures the parsers expect:
+- result pages (`ads2023` cards, 20 per page) and detail pages
+  (`ad2023` / `contactsBox` / `adParams`) via `fixture_server`
+- `--decode-pages` detail responses padded to `--page-kb`, in cp1251 without a declared
+  charset (the expensive `_decode_html` path)
+- raw CSVs split into `--files` crawl files
+
+then times every stage of the pipeline on them:
+- `_decode_html`
+- `extract_listing_cards` and `parse_listing_detail` (each available backend)
+- every public function of `src.processing.cleaning`, plus `clean_listings`
+- `combine.load_and_concat` and `drop_exact_duplicates`
+- `hedonic_frame` and the fixed-effects hedonic fit (`fit_fe_ols`)
+
+Each stage reports the best and median of `--repeat` runs and items/s. The
+parsed cards/rows are checked against the generated rows once, so a fast
+but wrong parser does not pass silently. Results are written as JSON (git
+commit, library versions and scale included); `--compare` prints the
+per-item time ratio against an earlier JSON and exits non-zero when a
+stage got slower by more than `--threshold`.
+
+Usage:
+  python -m src.benchmarks.suite                                     # -> reports/benchmarks/bench_<commit>.json
+  python -m src.benchmarks.suite --listings 20000 --details 200 --repeat 1
+  python -m src.benchmarks.suite --compare reports/benchmarks/bench_ab28a73.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.cleaning import CONSTRUCTION, HEATING
+from src.benchmarks.decode import make_page, make_response
+from src.scraping.fixture_server import ROOM_SLUGS, render_detail_page, render_results_page
+from src.scraping.html_backend import BACKENDS, lxml
+
+OUTPUT_DIR = "reports/benchmarks"
+HOST = "https://www.imot.bg"
+PAGE_SIZE = 20
+
+DISTRICTS = [
+    "Лозенец", "Младост 1", "Младост 2", "Младост 3", "Младост 4", "Овча купел 2", "Банишора", "Борово",
+    "Център", "Люлин 5", "Люлин 7", "Студентски град", "Манастирски ливади", "Кръстова вада", "Витоша",
+    "Дружба 1", "Дружба 2", "Надежда 1", "Хаджи Димитър", "Слатина", "Гео Милев", "Изток", "Изгрев",
+    "Яворов", "Оборище", "Лагера", "Красно село", "Бъкстон", "Хиподрума", "Гоце Делчев", "Редута",
+    "Подуяне", "Бояна", "Драгалевци", "Симеоново", "Малинова долина", "Зона Б-5", "Сухата река",
+]
+DESCRIPTIONS = [
+    "Описание на имота: Продава се светъл апартамент в тухлена сграда с асансьор, в близост до метро, "
+    "училища и паркове. Апартаментът е с южно изложение, саниран вход и подземен паркинг. ",
+    "Описание на имота: Нова сграда, Акт 16, директно от инвеститор. Качествено строителство, "
+    "вентилируема фасада и отлична топлоизолация за висока енергийна ефективност. БЕЗ КОМИСИОННА. ",
+    "Описание на имота: Панелен блок, ТЕЦ, нуждае се от ремонт, подходящ за инвестиция с цел "
+    "отдаване под наем. Спирки на градския транспорт, магазини и детски градини наблизо. ",
+    "Описание на имота: Апартамент в ЕПК сграда, обзаведен, с мазе и таван. Степен на завършеност: "
+    "въведен в експлоатация. Виж всички обяви на агенцията. ",
+]
+
+# --- synthetic fixtures -----------------------------------------------------
+
+def make_rows(listings: int, districts: int = 120, seed: int = 0) -> pd.DataFrame:
+    """Synthetic raw listings (`pipeline.RAW_COLUMNS`) in the formats the crawl writes."""
+    rng = np.random.default_rng(seed)
+    names = DISTRICTS + [f"Квартал {i}" for i in range(max(districts - len(DISTRICTS), 0))]
+    names = names[:districts]
+    weights = 1 / np.arange(1, len(names) + 1) ** 0.8
+    district = rng.choice(len(names), listings, p=weights / weights.sum())
+    effect = rng.normal(0, 0.25, len(names))
+    rooms = rng.integers(1, 4, listings)
+    area = np.round(np.exp(rng.normal(3.4 + 0.3 * rooms, 0.2)))
+    price = np.exp(7.6 + 0.9 * np.log(area) + effect[district] + rng.normal(0, 0.2, listings))
+    price = (np.round(price / 500) * 500).astype(np.int64)
+    bgn = rng.random(listings) < 0.1
+    price_raw = [f"{p:,}".replace(",", " ") + (" лв." if b else " €") for p, b in zip(price.tolist(), bgn.tolist())]
+    price_raw = np.where(rng.random(listings) < 0.01, "Цена при запитване", np.array(price_raw, dtype=object))
+    max_floor = rng.integers(2, 17, listings).astype(float)
+    floor = np.floor(rng.random(listings) * (max_floor + 1))
+    floor[rng.random(listings) < 0.03] = np.nan
+    year = rng.integers(1950, 2028, listings).astype(float)
+    year[rng.random(listings) < 0.3] = np.nan
+    ids = [f"1a{n:016d}" for n in rng.choice(10**16, listings, replace=False).tolist()]
+    desc = np.asarray(DESCRIPTIONS, dtype=object)[rng.integers(0, len(DESCRIPTIONS), listings)]
+    repeats = rng.integers(1, 8, listings)
+    return pd.DataFrame({
+        "url": [f"{HOST}/obiava-{i}-prodava-{ROOM_SLUGS[r]}-apartament-grad-sofiya-kvartal-{d}"
+                for i, r, d in zip(ids, rooms.tolist(), district.tolist())],
+        "listing_id": [f"ida{i}" for i in ids],
+        "source": "imot.bg",
+        "price_raw": price_raw,
+        "area_raw": [f"{int(a)} m 2" for a in area.tolist()],
+        "rooms": rooms,
+        "district_raw": [f"град София, {names[d]}" for d in district.tolist()],
+        "floor_raw": floor,
+        "max_floor_raw": max_floor,
+        "heat_raw": np.asarray(HEATING, dtype=object)[rng.integers(0, len(HEATING), listings)],
+        "construction_raw": np.asarray(CONSTRUCTION, dtype=object)[rng.integers(0, len(CONSTRUCTION), listings)],
+        "year_raw": year,
+        "desc_text": [d * r for d, r in zip(desc.tolist(), repeats.tolist())],
+    })
+
+def _records(rows: pd.DataFrame) -> list[dict[str, Any]]:
+    """Rows as dicts with missing values as None (what `render_*` and the parsers use)."""
+    return [{k: (None if isinstance(v, float) and v != v else v) for k, v in r.items()}
+            for r in rows.to_dict("records")]
+
+def write_raw_files(rows: pd.DataFrame, directory: Path, files: int) -> list[Path]:
+    """Split `rows` into `files` raw CSVs like a crawl history."""
+    paths = []
+    for i, part in enumerate(np.array_split(np.arange(len(rows)), files)):
+        path = directory / f"raw_{i:04d}.csv"
+        rows.iloc[part].to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+# --- timing -------------------------------------------------------------------
+
+def _timed(fn: Callable[[], Any], repeat: int) -> tuple[float, float, Any]:
+    """(best seconds, median seconds, last result) of `repeat` calls."""
+    times = []
+    out = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times), out
+
+def _result(stage: str, items: int, unit: str, best: float, median: float, ok: bool | None = None) -> dict[str, Any]:
+    return {
+        "stage": stage,
+        "items": items,
+        "unit": unit,
+        "best_s": best,
+        "median_s": median,
+        "items_per_s": items / best if best else float("inf"),
+        "ok": None if ok is None else bool(ok),
+    }
+
+def bench_scraping(rows: pd.DataFrame, details: int, result_pages: int, decode_pages: int, page_kb: int,
+                   repeat: int) -> list[dict[str, Any]]:
+    from src.scraping.encoding import clear_encoding_cache
+    from src.scraping.pipeline import _decode_html, extract_listing_cards, parse_listing_detail
+
+    results = []
+    records = _records(rows.head(max(details, decode_pages, result_pages * PAGE_SIZE)))
+    detail_rows = records[:details]
+
+    decode_rows = records[:decode_pages]
+    responses = [make_response(make_page(page_kb, r), encoding="cp1251", declare=False, url=r["url"]) for r in decode_rows]
+    clear_encoding_cache()
+
+    def decode_all() -> None:
+        for resp in responses:
+            _decode_html(resp, page_type="detail")
+
+    best, median, _ = _timed(decode_all, repeat)
+    ok = all(r["price_raw"] is None or str(r["price_raw"]) in _decode_html(resp, page_type="detail")
+             for r, resp in zip(decode_rows, responses))
+    mb = sum(len(r.content) for r in responses) / 1e6
+    results.append(_result("decode_html", len(responses), "pages", best, median, ok) | {"mb_per_s": mb / best})
+    del responses
+
+    pages = []
+    for start in range(0, result_pages * PAGE_SIZE, PAGE_SIZE):
+        chunk = records[start:start + PAGE_SIZE]
+        pages.append((chunk, render_results_page(chunk, rooms=int(chunk[0]["rooms"]), host_url=HOST,
+                                                 next_url=f"{HOST}/p-{start // PAGE_SIZE + 2}")))
+    detail_pages = [render_detail_page(r) for r in detail_rows]
+    for backend in (b for b in BACKENDS if b != "lxml" or lxml is not None):
+        best, median, cards = _timed(lambda: [extract_listing_cards(html, backend=backend) for _, html in pages], repeat)
+        ok = all([c["url"] for c in page_cards] == [r["url"] for r in chunk]
+                 and [c["price_raw"] for c in page_cards] == [r["price_raw"] for r in chunk]
+                 for (chunk, _), page_cards in zip(pages, cards))
+        results.append(_result(f"extract_listing_cards[{backend}]", len(pages) * PAGE_SIZE, "cards", best, median, ok))
+
+        best, median, parsed = _timed(
+            lambda: [parse_listing_detail(html, rooms=int(r["rooms"]), backend=backend)
+                     for r, html in zip(detail_rows, detail_pages)], repeat)
+        ok = all(p["price_raw"] == r["price_raw"] and p["area_raw"] == r["area_raw"]
+                 and p["district_raw"] == r["district_raw"] for p, r in zip(parsed, detail_rows))
+        results.append(_result(f"parse_listing_detail[{backend}]", len(detail_pages), "pages", best, median, ok))
+    return results
+
+def bench_processing(rows: pd.DataFrame, files: int, repeat: int) -> list[dict[str, Any]]:
+    from src.processing import cleaning
+    from src.processing.combine import drop_exact_duplicates, load_and_concat
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_raw_files(rows, Path(tmp), files)
+        best, median, raw = _timed(lambda: load_and_concat(paths), repeat)
+        results.append(_result("load_and_concat", len(raw), "rows", best, median, len(raw) == len(rows)))
+    best, median, _ = _timed(lambda: drop_exact_duplicates(raw), repeat)
+    results.append(_result("drop_exact_duplicates", len(raw), "rows", best, median))
+
+    n = len(raw)
+    floors = pd.DataFrame({"floor": cleaning.parse_floor(raw["floor_raw"]),
+                           "max_floor": cleaning.parse_max_floor(raw["max_floor_raw"])})
+    cases: list[tuple[str, Callable[[], Any]]] = [
+        ("parse_price", lambda: cleaning.parse_price(raw["price_raw"])),
+        ("parse_area", lambda: cleaning.parse_area(raw["area_raw"])),
+        ("parse_floor", lambda: cleaning.parse_floor(raw["floor_raw"])),
+        ("parse_max_floor", lambda: cleaning.parse_max_floor(raw["max_floor_raw"])),
+        ("derive_floor_flags", lambda: cleaning.derive_floor_flags(floors)),
+        ("map_heating", lambda: cleaning.map_heating(raw["heat_raw"])),
+        ("map_construction", lambda: cleaning.map_construction(raw["construction_raw"])),
+        ("derive_newbuild", lambda: cleaning.derive_newbuild(raw["year_raw"], raw["construction_raw"], raw["desc_text"])),
+        ("standardize_district", lambda: cleaning.standardize_district(raw["district_raw"])),
+        ("clean_listings", lambda: cleaning.clean_listings(raw)),
+    ]
+    for name, fn in cases:
+        best, median, _ = _timed(fn, repeat)
+        results.append(_result(name, n, "rows", best, median))
+    return results
+
+def bench_hedonic(rows: pd.DataFrame, repeat: int) -> list[dict[str, Any]]:
+    from src.modeling.fixed_effects import HEDONIC_FORMULA, fit_fe_ols, hedonic_frame
+    from src.processing.cleaning import clean_listings
+    from src.processing.schema import apply_schema
+
+    with contextlib.redirect_stdout(io.StringIO()):  # hedonic_frame prints [stats] lines
+        processed = apply_schema(clean_listings(rows))
+        best, median, frame = _timed(lambda: hedonic_frame(processed), repeat)
+    results = [_result("hedonic_frame", len(processed), "rows", best, median)]
+    best, median, fit = _timed(lambda: fit_fe_ols(HEDONIC_FORMULA, frame), repeat)
+    ok = bool(np.isfinite(fit.params).all()) and abs(fit.params["log_area"] - 0.9) < 0.05
+    results.append(_result("fit_fe_ols", len(frame), "rows", best, median, ok))
+    return results
+
+# --- reporting ----------------------------------------------------------------
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() + ("-dirty" if dirty else "")
+
+def environment() -> dict[str, Any]:
+    import bs4
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "bs4": bs4.__version__,
+        "lxml": ".".join(map(str, lxml.etree.LXML_VERSION)) if lxml is not None else None,
+    }
+
+def run(listings: int = 100_000, *, details: int = 1_000, result_pages: int = 100, decode_pages: int = 200,
+        page_kb: int = 300,
+        files: int = 10, districts: int = 120, repeat: int = 3, seed: int = 0,
+        stages: tuple[str, ...] = ("scraping", "processing", "hedonic")) -> dict[str, Any]:
+    """Run the selected stage groups; return the JSON-ready report."""
+    rows = make_rows(listings, districts, seed)
+    results = []
+    if "scraping" in stages:
+        results += bench_scraping(rows, min(details, listings), min(result_pages, listings // PAGE_SIZE),
+                                  min(decode_pages, listings), page_kb, repeat)
+    if "processing" in stages:
+        results += bench_processing(rows, files, repeat)
+    if "hedonic" in stages:
+        results += bench_hedonic(rows, repeat)
+    scale = {"listings": listings, "details": details, "result_pages": result_pages,
+             "decode_pages": decode_pages, "page_kb": page_kb,
+             "files": files, "districts": districts, "repeat": repeat, "seed": seed}
+    return {"environment": environment(), "scale": scale, "results": results}
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """Per-stage ratio of seconds per item (current / baseline) for stages in both reports."""
+    before = {r["stage"]: r for r in baseline["results"]}
+    rows = []
+    for r in report["results"]:
+        old = before.get(r["stage"])
+        if not old or not old["items"] or not r["items"]:
+            continue
+        ratio = (r["best_s"] / r["items"]) / (old["best_s"] / old["items"]) if old["best_s"] else float("inf")
+        rows.append({"stage": r["stage"], "ratio": ratio, "regression": ratio > 1 + threshold})
+    return rows
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the scrape -> clean -> model pipeline on synthetic data")
+    parser.add_argument("--listings", type=int, default=100_000, help="Synthetic raw rows (cleaning, combine, hedonic)")
+    parser.add_argument("--details", type=int, default=1_000, help="Detail pages to parse")
+    parser.add_argument("--result-pages", type=int, default=100, help=f"Result pages ({PAGE_SIZE} cards each)")
+    parser.add_argument("--decode-pages", type=int, default=200, help="Detail responses to decode")
+    parser.add_argument("--page-kb", type=int, default=300, help="Size of the detail responses for _decode_html")
+    parser.add_argument("--files", type=int, default=10, help="Raw CSV files the rows are split into")
+    parser.add_argument("--districts", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (best and median reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", choices=["scraping", "processing", "hedonic"],
+                        default=["scraping", "processing", "hedonic"])
+    parser.add_argument("--output", default=None, help=f"JSON report (default {OUTPUT_DIR}/bench_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown counted as a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.listings, details=args.details, result_pages=args.result_pages,
+                 decode_pages=args.decode_pages, page_kb=args.page_kb,
+                 files=args.files, districts=args.districts, repeat=args.repeat, seed=args.seed,
+                 stages=tuple(args.stages))
+    output = Path(args.output or f"{OUTPUT_DIR}/bench_{report['environment']['commit'] or 'local'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding="utf-8")
+
+    print(f"{'stage':<32}{'items':>10}{'best s':>10}{'median s':>10}{'items/s':>14}  ok")
+    for r in report["results"]:
+        print(f"{r['stage']:<32}{r['items']:>10,}{r['best_s']:>10.3f}{r['median_s']:>10.3f}"
+              f"{r['items_per_s']:>14,.0f}  {'-' if r['ok'] is None else r['ok']}")
+    print(f"[bench] wrote {output}")
+    status = 1 if any(r["ok"] is False for r in report["results"]) else 0
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"[bench] vs {args.compare} (commit {baseline['environment'].get('commit')}), time per item:")
+        for c in compare(report, baseline, args.threshold):
+            flag = "  SLOWER" if c["regression"] else ""
+            print(f"  {c['stage']:<32}{c['ratio']:>6.2f}x{flag}")
+            status = 1 if c["regression"] else status
+    return status
+
+if __name__ == "__main__":
+    raise SystemExit(main())
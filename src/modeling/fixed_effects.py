@@ -0,0 +1,228 @@
+"""Hedonic OLS with district fixed effects absorbed by the within transformation.
+
+`smf.ols("log_price ~ ... + C(district)", data)` builds a dense patsy design
+matrix with one dummy column per district, so time and memory grow with
+listings x districts. `fit_fe_ols` takes the same formula and never builds
+the dummies:
+- the absorbed factor (`absorb`, default `district`) is turned into integer
+  codes; `y` and every other column are demeaned within district
+  (`np.bincount` group sums), and the slopes come from OLS on the demeaned
+  data (Frisch-Waugh-Lovell), so they equal the dummy-variable fit
+- district intercepts are recovered as `mean(y_d) - mean(X_d) @ beta` and
+  reported the way patsy parametrizes them: `Intercept` is the reference
+  (first) level, `C(district)[T.x]` the difference to it
+- residuals are those of the full model; standard errors use the full
+  model's residual degrees of freedom (n - rank(X) - districts)
+
+Other `C(col)` terms get treatment dummies (first category as reference, as
+patsy does for Categoricals); rows with a missing value in any model column
+are dropped, as patsy does. Rank-deficient designs (e.g. an all-zero
+`is_ground_floor`) use the pseudo-inverse like statsmodels, so such
+coefficients are 0. A column that is constant within every district is
+collinear with the dummies and gets 0 here, where statsmodels' minimum-norm
+solution would share it with the district effects.
+
+`FEDesign` / `fit_design` are exposed separately so resampling code can
+build the design once and refit subsets of it. `fit_fe_ols` times both steps
+(`model_step_seconds`, `src.workflow.metrics`).
+
+Usage:
+  fit = fit_fe_ols("log_price ~ log_area + rooms + C(heat) + C(district)", df_model)
+  fit.params, fit.bse, fit.resid
+  fit.district_effects.reset_index()      # district, coef (district_effects.csv)
+  fit.district_residuals().reset_index()  # district, resid (district_residuals.csv)
+"""
+from __future__ import annotations
+
+import re
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from src.workflow import metrics
+
+from src.processing.schema import model_frame
+
+MIN_LISTINGS = 3  # notebook 03's keep_districts cut
+HEDONIC_FORMULA = ("log_price ~ log_area + rooms + floor + is_ground_floor + is_top_floor + newbuild"
+                   " + C(heat) + C(construction_type) + C(district)")  # notebook 03's location model
+
+_CATEGORICAL_TERM_RE = re.compile(r"^C\(\s*(\w+)\s*\)$")
+_NAME_RE = re.compile(r"^\w+$")
+
+def hedonic_frame(df: pd.DataFrame, min_listings: int = MIN_LISTINGS) -> pd.DataFrame:
+    """Notebook 03's `df_model`: positive price/area, districts with `min_listings`+ listings, logs."""
+    rows = df[(df["price_eur"] > 0) & (df["area_m2"] > 0)]
+    rows = rows.dropna(subset=["price_eur", "area_m2", "rooms", "district"])
+    if min_listings > 1:
+        counts = rows["district"].value_counts()
+        rows = rows[rows["district"].isin(counts[counts >= min_listings].index)]
+    rows = model_frame(rows, rows.columns)  # float64 numerics, only the districts present
+    return rows.assign(log_price=np.log(rows["price_eur"]), log_area=np.log(rows["area_m2"]))
+
+def parse_formula(formula: str) -> tuple[str, list[str], list[str]]:
+    """Split "y ~ a + C(b) + ..." into (y, numeric terms, categorical terms), in formula order."""
+    if "~" not in formula:
+        raise ValueError(f"formula needs a '~': {formula!r}")
+    lhs, rhs = (part.strip() for part in formula.split("~", 1))
+    if not _NAME_RE.match(lhs):
+        raise ValueError(f"left-hand side must be a column name, got {lhs!r}")
+    numeric, categorical = [], []
+    for term in (t.strip() for t in rhs.split("+")):
+        match = _CATEGORICAL_TERM_RE.match(term)
+        if match:
+            categorical.append(match.group(1))
+        elif _NAME_RE.match(term) and term not in ("0", "1"):
+            numeric.append(term)
+        else:
+            raise ValueError(f"unsupported term {term!r}; use column names and C(column)")
+    return lhs, numeric, categorical
+
+def _levels(series: pd.Series) -> list[Any]:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return list(series.cat.categories)
+    return sorted(series.dropna().unique())
+
+def _codes(values: pd.Series, levels: list[Any]) -> np.ndarray:
+    codes = pd.Categorical(values, categories=levels).codes
+    if (codes < 0).any():
+        unseen = sorted(set(values[codes < 0].astype(str)))
+        raise ValueError(f"{values.name}: values outside the fixed levels: {unseen}")
+    return codes
+
+def group_means(values: np.ndarray, codes: np.ndarray, n_groups: int) -> tuple[np.ndarray, np.ndarray]:
+    """Per-group means of each column of `values` (2-D) and the group sizes."""
+    counts = np.bincount(codes, minlength=n_groups).astype(float)
+    sums = np.column_stack([np.bincount(codes, weights=col, minlength=n_groups) for col in values.T])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts[:, None], counts
+
+class FEDesign:
+    """Model arrays for one formula: `y`, the non-absorbed columns `X`, and absorbed-factor codes."""
+
+    def __init__(self, formula: str, data: pd.DataFrame, absorb: str = "district",
+                 levels: dict[str, list[Any]] | None = None) -> None:
+        """`levels` fixes the categories of some `C()` columns (e.g. to build a batch with the
+        dummy columns of an earlier fit); a value outside them raises `ValueError`."""
+        lhs, numeric, categorical = parse_formula(formula)
+        if absorb not in categorical:
+            raise ValueError(f"formula has no C({absorb}) term to absorb")
+        used = [lhs, *numeric, *categorical]
+        complete = data[used].notna().all(axis=1).to_numpy()
+        frame = data.loc[complete, used]
+        self.formula = formula
+        self.absorb = absorb
+        self.index = frame.index
+        self.y = frame[lhs].to_numpy(dtype=float)
+        self.category_levels = {col: list(levels[col]) if levels and col in levels else _levels(data[col])
+                                for col in categorical}
+        self.levels = self.category_levels[absorb]
+        self.codes = _codes(frame[absorb], self.levels).astype(np.intp)
+        columns: list[np.ndarray] = []
+        self.dummy_names: list[str] = []
+        for col in categorical:
+            if col == absorb:
+                continue
+            col_levels = self.category_levels[col]
+            codes = _codes(frame[col], col_levels)
+            for i, level in enumerate(col_levels[1:], start=1):
+                self.dummy_names.append(f"C({col})[T.{level}]")
+                columns.append((codes == i).astype(float))
+        self.numeric_names = list(numeric)
+        columns.extend(frame[col].to_numpy(dtype=float) for col in numeric)
+        self.X = np.column_stack(columns) if columns else np.empty((len(frame), 0))
+
+    @property
+    def columns(self) -> list[str]:
+        return [*self.dummy_names, *self.numeric_names]
+
+    @property
+    def nobs(self) -> int:
+        return len(self.y)
+
+    def subset(self, rows: np.ndarray) -> "FEDesign":
+        """Design restricted to positions `rows` (e.g. a bootstrap sample or a fold), without copying the parse."""
+        sub = object.__new__(FEDesign)
+        sub.__dict__.update(self.__dict__)
+        sub.index = self.index[rows]
+        sub.y, sub.X, sub.codes = self.y[rows], self.X[rows], self.codes[rows]
+        return sub
+
+class FEResult:
+    """Fitted fixed-effects model; attribute names follow statsmodels' `RegressionResults`."""
+
+    def __init__(self, design: FEDesign, beta: np.ndarray, cov_unscaled: np.ndarray, alphas: np.ndarray,
+                 counts: np.ndarray, resid: np.ndarray, df_resid: float) -> None:
+        self.design = design
+        self.formula = design.formula
+        self.levels = {col: [str(v) for v in levels]
+                       for col, levels in design.category_levels.items() if col != design.absorb}
+        self.nobs = design.nobs
+        self.df_resid = df_resid
+        self.ssr = float(resid @ resid)
+        self.scale = self.ssr / df_resid if df_resid > 0 else np.nan
+        self.resid = pd.Series(resid, index=design.index)
+        self.fittedvalues = pd.Series(design.y - resid, index=design.index)
+        self.group_counts = pd.Series(counts.astype(int), index=pd.Index(design.levels, name=design.absorb))
+        self.group_alphas = pd.Series(alphas, index=self.group_counts.index)
+        self.params, self.district_effects = assemble_params(design, beta, alphas, counts)
+        self.bse_slopes = pd.Series(np.sqrt(np.clip(np.diag(cov_unscaled) * self.scale, 0, None)),
+                                    index=design.columns)
+
+    @property
+    def bse(self) -> pd.Series:
+        """Standard errors of the slopes (the absorbed effects have none here)."""
+        return self.bse_slopes
+
+    def district_residuals(self) -> pd.Series:
+        """Mean residual per absorbed level with observations (`district_residuals.csv`)."""
+        design = self.design
+        sums = np.bincount(design.codes, weights=self.resid.to_numpy(), minlength=len(design.levels))
+        counts = self.group_counts.to_numpy()
+        observed = counts > 0
+        return pd.Series(sums[observed] / counts[observed], index=self.group_counts.index[observed], name="resid")
+
+def assemble_params(design: FEDesign, beta: np.ndarray, alphas: np.ndarray,
+                    counts: np.ndarray) -> tuple[pd.Series, pd.Series]:
+    """(params in statsmodels' order and names, district effects vs the reference level)."""
+    present = np.flatnonzero(counts > 0)
+    ref = present[0] if len(present) else 0
+    effects = np.where(counts > 0, alphas - alphas[ref], 0.0)
+    keep = np.arange(len(design.levels)) != ref
+    kept_levels = [level for level, k in zip(design.levels, keep) if k]
+    beta_s = pd.Series(beta, index=design.columns)
+    params = pd.concat([
+        pd.Series([alphas[ref]], index=["Intercept"]),
+        beta_s[design.dummy_names],
+        pd.Series(effects[keep], index=[f"C({design.absorb})[T.{level}]" for level in kept_levels]),
+        beta_s[design.numeric_names],
+    ])
+    return params, pd.Series(effects[keep], index=pd.Index(kept_levels, name=design.absorb), name="coef")
+
+def within_solve(y: np.ndarray, X: np.ndarray, codes: np.ndarray,
+                 n_groups: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(beta, unscaled covariance, group intercepts (NaN if empty), group sizes, residuals, demeaned X)."""
+    stacked = np.column_stack([y, X])
+    means, counts = group_means(stacked, codes, n_groups)
+    demeaned = stacked - means[codes]
+    y_w, X_w = demeaned[:, 0], demeaned[:, 1:]
+    cov_unscaled = np.linalg.pinv(X_w.T @ X_w)
+    beta = cov_unscaled @ (X_w.T @ y_w)
+    alphas = np.where(counts > 0, means[:, 0] - means[:, 1:] @ beta, np.nan)
+    return beta, cov_unscaled, alphas, counts, y_w - X_w @ beta, X_w
+
+def fit_design(design: FEDesign) -> FEResult:
+    """OLS on the within-transformed design."""
+    beta, cov_unscaled, alphas, counts, resid, X_w = within_solve(design.y, design.X, design.codes,
+                                                                  len(design.levels))
+    rank = np.linalg.matrix_rank(X_w) if X_w.shape[1] else 0
+    df_resid = design.nobs - rank - int((counts > 0).sum())
+    return FEResult(design, beta, cov_unscaled, np.nan_to_num(alphas), counts, resid, df_resid)
+
+def fit_fe_ols(formula: str, data: pd.DataFrame, absorb: str = "district") -> FEResult:
+    """Fit `formula` with the `C(absorb)` dummies absorbed (see module docstring)."""
+    with metrics.timer("model_step_seconds", step="design"):
+        design = FEDesign(formula, data, absorb)
+    with metrics.timer("model_step_seconds", step="solve"):
+        return fit_design(design)
@@ -0,0 +1,308 @@
+"""Incremental updates of the district fixed-effects hedonic model.
+
+Notebook 03 refits the location model over all of `processed.csv` whenever
+listings arrive. The within estimator only needs, per district d, the row
+count n_d, the column sums S_d = sum(z) and the cross-products
+C_d = sum(z z') of z = [log_price, X]: the within cross-product is
+sum_d (C_d - S_d S_d' / n_d), the slopes solve it like `fit_fe_ols`, district
+intercepts are (S_d,y - S_d,X @ beta) / n_d, and the mean residual of a
+district is (S_d,y - n_d alpha_d - S_d,X @ beta) / n_d. `HedonicStats` keeps
+these in one SQLite file:
+- `district_stats`: per district the filtered listing count (for the
+  notebook's `keep_districts` cut, applied at solve time), n_d, S_d, C_d
+- `listings`: each listing's z row keyed by a hash of its URL, so `add`
+  replaces a listing already counted (price change, re-crawl) and `retire`
+  subtracts listings by URL
+- `meta`: formula, dummy levels of the other categoricals, and the shift
+  subtracted from z before accumulating (the first batch's means, which
+  keeps C_d - S_d S_d' / n_d well conditioned)
+
+`add`/`retire` cost O(batch rows + districts), `solve` O(districts x k^2);
+neither touches the history. The solve matches `fit_fe_ols` /
+`smf.ols` on the same rows (params, district effects, mean residuals).
+
+Dummy columns are fixed when the statistics are created: a later batch with
+an unseen heating or construction type raises `ValueError` (run `--rebuild`);
+new districts are added as they appear.
+
+`write_outputs` writes the notebook's two district CSVs and
+`hedonic_model.json`, the full coefficient set the valuation service
+(`src.modeling.valuation`) loads: formula, params, absolute district
+intercepts and the dummy levels, replaced atomically so a reader never sees
+a half-written model.
+
+Usage:
+  python -m src.modeling.incremental --rebuild --add data/processed/processed.csv
+  python -m src.modeling.incremental --add data/processed/new_listings.csv
+  python -m src.modeling.incremental --retire data/processed/delisted.csv   # any file with a `url` column
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+from src.modeling.fixed_effects import (
+    HEDONIC_FORMULA, MIN_LISTINGS, FEDesign, FEResult, assemble_params, hedonic_frame, parse_formula,
+)
+from src.processing.schema import read_processed
+
+DEFAULT_STATS_PATH = "data/processed/hedonic_stats.sqlite"
+DEFAULT_OUTPUT_DIR = "data/processed"
+MODEL_FILE = "hedonic_model.json"
+MODEL_COLUMNS = ["url", "price_eur", "area_m2", "rooms", "floor", "is_ground_floor", "is_top_floor",
+                 "newbuild", "heat", "construction_type", "district"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS district_stats (
+    district TEXT PRIMARY KEY, listings INTEGER NOT NULL, n INTEGER NOT NULL, sums BLOB NOT NULL, cross BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (h INTEGER PRIMARY KEY, district TEXT NOT NULL, z BLOB);
+"""
+
+def model_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Notebook 03's model frame before the `keep_districts` cut (applied at solve time)."""
+    return hedonic_frame(df, min_listings=0)
+
+def url_hashes(urls: pd.Series) -> np.ndarray:
+    return pd.util.hash_array(urls.astype(str).to_numpy(dtype=object)).view(np.int64)
+
+class HedonicStats:
+    """Persisted sufficient statistics of the fixed-effects model (see module docstring)."""
+
+    def __init__(self, path: str | Path = DEFAULT_STATS_PATH) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_keys (h INTEGER PRIMARY KEY)")
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.formula: str | None = meta.get("formula")
+        self.absorb: str = meta.get("absorb", "district")
+        self.levels: dict[str, list[Any]] = json.loads(meta.get("levels", "{}"))
+        self.columns: list[str] = json.loads(meta.get("columns", "[]"))
+        self.shift = np.asarray(json.loads(meta.get("shift", "[]")), dtype=float)
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "HedonicStats":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _init_meta(self, design: FEDesign) -> None:
+        z = np.column_stack([design.y, design.X])
+        self.formula = design.formula
+        self.absorb = design.absorb
+        self.levels = {col: [str(v) for v in levels]
+                       for col, levels in design.category_levels.items() if col != design.absorb}
+        self.columns = design.columns
+        self.shift = z.mean(axis=0) if len(z) else np.zeros(z.shape[1])
+        self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+            ("formula", self.formula), ("absorb", self.absorb), ("levels", json.dumps(self.levels)),
+            ("columns", json.dumps(self.columns)), ("shift", json.dumps(self.shift.tolist())),
+        ])
+
+    def _district_arrays(self, districts: Iterable[str]) -> dict[str, list[Any]]:
+        k = len(self.shift)
+        stats = {d: [0, 0, np.zeros(k), np.zeros((k, k))] for d in districts}
+        marks = ",".join("?" * len(stats))
+        for d, listings, n, sums, cross in self._conn.execute(
+                f"SELECT district, listings, n, sums, cross FROM district_stats WHERE district IN ({marks})", list(stats)):
+            stats[d] = [listings, n, np.frombuffer(sums).copy(), np.frombuffer(cross).reshape(k, k).copy()]
+        return stats
+
+    def _apply(self, district: np.ndarray, z: np.ndarray, has_z: np.ndarray, sign: int) -> None:
+        """Add (`sign`=1) or subtract (-1) rows: listing counts for all, n/S/C for those with z."""
+        stats = self._district_arrays(np.unique(district).tolist())
+        zs = z - self.shift
+        for d, entry in stats.items():
+            rows = district == d
+            full = rows & has_z
+            entry[0] += sign * int(rows.sum())
+            entry[1] += sign * int(full.sum())
+            entry[2] += sign * zs[full].sum(axis=0)
+            entry[3] += sign * (zs[full].T @ zs[full])
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO district_stats (district, listings, n, sums, cross) VALUES (?, ?, ?, ?, ?)",
+            [(d, listings, n, sums.tobytes(), cross.tobytes()) for d, (listings, n, sums, cross) in stats.items()],
+        )
+
+    def _stored(self, hashes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(hashes, districts, z, has_z) of the listings among `hashes` already counted."""
+        self._conn.execute("DELETE FROM batch_keys")
+        self._conn.executemany("INSERT OR IGNORE INTO batch_keys (h) VALUES (?)", ((int(h),) for h in hashes))
+        found = self._conn.execute("SELECT h, district, z FROM listings JOIN batch_keys USING (h)").fetchall()
+        k = len(self.shift)
+        z = np.zeros((len(found), k))
+        for i, (_, _, blob) in enumerate(found):
+            if blob is not None:
+                z[i] = np.frombuffer(blob)
+        return (np.array([h for h, _, _ in found], dtype=np.int64), np.array([d for _, d, _ in found], dtype=object),
+                z, np.array([blob is not None for _, _, blob in found], dtype=bool))
+
+    def _retire_hashes(self, hashes: np.ndarray) -> int:
+        found, district, z, has_z = self._stored(hashes)
+        if len(found):
+            self._apply(district, z, has_z, -1)
+            self._conn.executemany("DELETE FROM listings WHERE h = ?", ((int(h),) for h in found))
+        return len(found)
+
+    def add(self, df: pd.DataFrame, formula: str = HEDONIC_FORMULA) -> dict[str, int]:
+        """Count the processed listings in `df`; a URL already counted is replaced. Commits."""
+        rows = model_rows(df)
+        rows = rows[~rows["url"].duplicated(keep="last")].reset_index(drop=True)  # design.index is positional
+        if self.formula is not None and formula != self.formula:
+            raise ValueError(f"{self.path} holds statistics for {self.formula!r}; use --rebuild to change the model")
+        design = FEDesign(formula, rows, levels=self.levels if self.formula else None)
+        if self.formula is None:
+            self._init_meta(design)
+        hashes = url_hashes(rows["url"])
+        z = np.zeros((len(rows), len(self.shift)))
+        has_z = rows.index.isin(design.index)
+        z[has_z] = np.column_stack([design.y, design.X])
+        district = rows[self.absorb].astype(str).to_numpy(dtype=object)
+        replaced = self._retire_hashes(hashes)
+        self._apply(district, z, has_z, 1)
+        self._conn.executemany(
+            "INSERT INTO listings (h, district, z) VALUES (?, ?, ?)",
+            ((int(h), d, zi.tobytes() if full else None) for h, d, zi, full in zip(hashes, district, z, has_z)),
+        )
+        self._conn.commit()
+        return {"rows": len(df), "model_rows": len(rows), "complete": int(has_z.sum()), "replaced": replaced}
+
+    def retire(self, urls: Iterable[str]) -> int:
+        """Remove listings by URL from the statistics; return how many were counted. Commits."""
+        retired = self._retire_hashes(url_hashes(pd.Series(list(urls), dtype=object)))
+        self._conn.commit()
+        return retired
+
+    def solve(self, min_listings: int = MIN_LISTINGS) -> "IncrementalFit":
+        """Fit from the statistics, keeping districts with at least `min_listings` filtered listings."""
+        if self.formula is None:
+            raise ValueError(f"{self.path} holds no listings yet")
+        k = len(self.shift)
+        rows = self._conn.execute("SELECT district, listings, n, sums, cross FROM district_stats "
+                                  "WHERE listings >= ? AND n > 0 ORDER BY district", (min_listings,)).fetchall()
+        if not rows:
+            raise ValueError(f"{self.path}: no district has {min_listings}+ listings")
+        districts = [d for d, *_ in rows]
+        counts = np.array([n for _, _, n, _, _ in rows], dtype=float)
+        sums = np.array([np.frombuffer(s) for *_, s, _ in rows]).reshape(len(rows), k)
+        cross = np.array([np.frombuffer(c).reshape(k, k) for *_, c in rows]).reshape(len(rows), k, k)
+        within = (cross - sums[:, :, None] * sums[:, None, :] / counts[:, None, None]).sum(axis=0)
+        cov_unscaled = np.linalg.pinv(within[1:, 1:])
+        beta = cov_unscaled @ within[1:, 0]
+        means = sums / counts[:, None] + self.shift
+        alphas = means[:, 0] - means[:, 1:] @ beta
+        resid_means = means[:, 0] - alphas - means[:, 1:] @ beta
+        ssr = float(within[0, 0] - 2 * beta @ within[1:, 0] + beta @ within[1:, 1:] @ beta)
+        rank = np.linalg.matrix_rank(within[1:, 1:]) if k > 1 else 0
+        return IncrementalFit(self, districts, beta, cov_unscaled, alphas, counts, resid_means, ssr,
+                              int(counts.sum()) - rank - len(districts))
+
+class IncrementalFit:
+    """Result of `HedonicStats.solve`; the row-free subset of `FEResult`'s attributes."""
+
+    def __init__(self, stats: HedonicStats, districts: list[str], beta: np.ndarray, cov_unscaled: np.ndarray,
+                 alphas: np.ndarray, counts: np.ndarray, resid_means: np.ndarray, ssr: float, df_resid: int) -> None:
+        _, numeric, _ = parse_formula(stats.formula)
+        design = object.__new__(FEDesign)  # names only, no rows
+        design.absorb, design.levels = stats.absorb, districts
+        design.numeric_names = numeric
+        design.dummy_names = stats.columns[:len(stats.columns) - len(numeric)]
+        self.formula = stats.formula
+        self.levels = stats.levels
+        self.nobs = int(counts.sum())
+        self.df_resid = df_resid
+        self.ssr = ssr
+        self.scale = ssr / df_resid if df_resid > 0 else np.nan
+        index = pd.Index(districts, name=stats.absorb)
+        self.group_counts = pd.Series(counts.astype(int), index=index)
+        self.group_alphas = pd.Series(alphas, index=index)
+        self.params, self.district_effects = assemble_params(design, beta, alphas, counts)
+        self.bse = pd.Series(np.sqrt(np.clip(np.diag(cov_unscaled) * self.scale, 0, None)), index=stats.columns)
+        self._resid_means = pd.Series(resid_means, index=index, name="resid")
+
+    def district_residuals(self) -> pd.Series:
+        """Mean residual per district (`district_residuals.csv`)."""
+        return self._resid_means
+
+def model_artifact(fit: IncrementalFit | FEResult) -> dict[str, Any]:
+    """JSON-ready coefficients of `fit`: formula, params, per-district intercepts and dummy levels."""
+    observed = fit.group_counts > 0
+    return {
+        "formula": fit.formula,
+        "absorb": fit.group_counts.index.name,
+        "params": {name: float(v) for name, v in fit.params.items()},
+        "district_alphas": {str(d): float(a) for d, a in fit.group_alphas[observed].items()},
+        "district_counts": {str(d): int(n) for d, n in fit.group_counts[observed].items()},
+        "levels": fit.levels,
+        "nobs": fit.nobs,
+        "scale": float(fit.scale),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def write_outputs(fit: IncrementalFit | FEResult,
+                  output_dir: str | Path = DEFAULT_OUTPUT_DIR) -> tuple[Path, Path, Path]:
+    """Write `district_effects.csv` and `district_residuals.csv` as notebook 03 exports them, and the model."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    effects, resid = output_dir / "district_effects.csv", output_dir / "district_residuals.csv"
+    fit.district_effects.reset_index().to_csv(effects, index=False)
+    fit.district_residuals().reset_index().to_csv(resid, index=False)
+    model = output_dir / MODEL_FILE
+    tmp = model.with_suffix(".tmp")
+    tmp.write_text(json.dumps(model_artifact(fit), ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(model)
+    return effects, resid, model
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Update the hedonic model from persisted sufficient statistics")
+    parser.add_argument("--stats", default=DEFAULT_STATS_PATH, help="Statistics file (SQLite)")
+    parser.add_argument("--add", nargs="*", default=[], metavar="PATH",
+                        help="Processed CSVs / Parquet datasets whose listings to add or replace")
+    parser.add_argument("--retire", nargs="*", default=[], metavar="PATH",
+                        help="Files with a `url` column whose listings to remove")
+    parser.add_argument("--rebuild", action="store_true", help="Start from empty statistics")
+    parser.add_argument("--min-listings", type=int, default=MIN_LISTINGS, help="Drop districts with fewer listings")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help="Where to write district_effects.csv / district_residuals.csv")
+    args = parser.parse_args(argv)
+    if args.rebuild:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{args.stats}{suffix}").unlink(missing_ok=True)
+    with HedonicStats(args.stats) as stats:
+        for path in args.add:
+            result = stats.add(read_processed(path, columns=MODEL_COLUMNS))
+            print(f"[stats] {path}: {result['model_rows']} model rows ({result['complete']} complete), "
+                  f"{result['replaced']} replaced")
+        for path in args.retire:
+            urls = pd.read_csv(path, usecols=["url"])["url"]
+            print(f"[stats] {path}: retired {stats.retire(urls)} of {len(urls)} listings")
+        try:
+            fit = stats.solve(args.min_listings)
+        except ValueError as exc:
+            print(f"[warn] {exc}; outputs not written")
+            return 1
+        print(f"[stats] {len(stats)} listings, nobs={fit.nobs}, districts={len(fit.group_counts)}, "
+              f"df_resid={fit.df_resid}")
+    for path in write_outputs(fit, args.output_dir):
+        print(f"Saved: {path}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
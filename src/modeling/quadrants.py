@@ -0,0 +1,43 @@
+"""Risk/yield quadrants of notebook 04, classified on whole arrays.
+
+A district is compared with the yield and residual cut-offs (the medians in
+notebook 04): above-median residual (expensive for its structure) with
+below-median yield is `overvalued_low_yield`, and so on. A missing value is
+`unknown`, and a value exactly on a cut-off is `speculative`, as in the
+notebook's row-wise `classify`. `classify` broadcasts, so a (replicates x
+districts) array of resampled residuals is classified in one call.
+
+Usage:
+  metrics["quadrant"] = classify(metrics["yield_pct"], metrics["resid"],
+                                 metrics["yield_pct"].median(), metrics["resid"].median())
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+QUADRANTS = (
+    "overvalued_low_yield",
+    "high_price_high_yield",
+    "low_price_low_yield",
+    "undervalued_high_yield",
+    "speculative",
+    "unknown",
+)
+
+def classify(yield_pct: Any, resid: Any, yield_cut: Any, resid_cut: Any) -> np.ndarray:
+    """Quadrant name per element of the broadcast `yield_pct` / `resid` arrays."""
+    y = np.asarray(yield_pct, dtype=float)
+    r = np.asarray(resid, dtype=float)
+    y_cut = np.asarray(yield_cut, dtype=float)
+    r_cut = np.asarray(resid_cut, dtype=float)
+    unknown = np.isnan(y) | np.isnan(r)
+    with np.errstate(invalid="ignore"):
+        low_y, high_y = y < y_cut, y > y_cut
+        high_r, low_r = r > r_cut, r < r_cut
+    return np.select(
+        [unknown, low_y & high_r, high_y & high_r, low_y & low_r, high_y & low_r],
+        ["unknown", *QUADRANTS[:4]],
+        default=QUADRANTS[4],
+    )
@@ -0,0 +1,236 @@
+"""Bootstrap and K-fold uncertainty of district effects, residuals and quadrants.
+
+Notebook 03 reports one OLS fit, and some districts keep as few as 3
+listings after the `keep_districts` cut. `resample` refits the
+fixed-effects model thousands of times in a process pool:
+- the design (`FEDesign`: y, dummy/numeric columns, district codes) is built
+  once and handed to each worker once (pool initializer); a replicate only
+  indexes rows and runs `within_solve`, without patsy or pandas
+- `bootstrap`: rows are redrawn with replacement within each district
+  (every district keeps its size and stays in the fit); the rows not drawn
+  are the replicate's held-out set
+- `kfold`: `repeats` x `folds` fits, each leaving out one fold. Folds are
+  stratified by district so small districts spread over the folds, and the
+  partitions are cached (`.npy` keyed by the district codes, `folds` and
+  the seed) so reruns and other settings reuse them
+- replicate seeds come from `SeedSequence(seed).spawn`, so results do not
+  depend on the number of workers
+
+Per replicate it keeps each district's effect (vs the reference district, as
+in `district_effects.csv`) and its mean held-out residual. In-sample mean
+residuals of a fixed-effects fit are 0 by construction, so the held-out mean
+is the resampled counterpart of `district_residuals.csv`. Each replicate is
+then classified into notebook 04's quadrants (`quadrants.classify` against
+that replicate's medians, yields from `district_metrics.csv`), giving the
+probability of each district landing in each quadrant.
+
+Output: one row per district with the point estimate, percentile
+confidence bounds and standard error of the effect, bounds of the held-out
+residual, and `p_<quadrant>` columns.
+
+Usage:
+  python -m src.modeling.resampling --method bootstrap --replicates 2000 --workers 4
+  python -m src.modeling.resampling --method kfold --folds 5 --repeats 200 --signal effect
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from src.modeling.fixed_effects import (
+    HEDONIC_FORMULA, MIN_LISTINGS, FEDesign, fit_design, hedonic_frame, within_solve,
+)
+from src.modeling.quadrants import QUADRANTS, classify
+from src.processing.schema import read_processed
+
+DEFAULT_INPUT = "data/processed/processed.csv"
+DEFAULT_METRICS = "data/processed/district_metrics.csv"
+DEFAULT_OUTPUT = "data/processed/district_uncertainty.csv"
+DEFAULT_FOLD_CACHE = "data/cache/folds"
+METHODS = ("bootstrap", "kfold")
+SIGNALS = ("resid", "effect")
+
+def stratified_folds(codes: np.ndarray, folds: int, seed: int) -> np.ndarray:
+    """Fold id per row: rows of each district are shuffled and dealt round-robin over the folds."""
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(codes)), codes))
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    rank = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    offset = rng.integers(0, folds, len(starts))  # so 3-listing districts don't all skip the last folds
+    out = np.empty(len(codes), dtype=np.int16)
+    out[order] = (rank + np.repeat(offset, np.diff(np.r_[starts, len(codes)]))) % folds
+    return out
+
+def cached_folds(codes: np.ndarray, folds: int, seed: int, cache_dir: str | Path | None = DEFAULT_FOLD_CACHE) -> np.ndarray:
+    """`stratified_folds`, read from / written to `cache_dir` when given."""
+    if cache_dir is None:
+        return stratified_folds(codes, folds, seed)
+    digest = hashlib.sha1(np.ascontiguousarray(codes, dtype=np.int64).tobytes()).hexdigest()[:16]
+    path = Path(cache_dir) / f"folds_{digest}_k{folds}_s{seed}.npy"
+    if path.exists():
+        return np.load(path)
+    out = stratified_folds(codes, folds, seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, out)
+    tmp.replace(path)
+    return out
+
+_DESIGN: FEDesign | None = None
+
+def _init_worker(design: FEDesign) -> None:
+    global _DESIGN
+    _DESIGN = design
+
+def _bootstrap_rows(codes: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Row positions drawn with replacement within each district."""
+    order = np.argsort(codes, kind="stable")
+    sizes = np.bincount(codes)
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    sorted_codes = codes[order]
+    picks = starts[sorted_codes] + (rng.random(len(codes)) * sizes[sorted_codes]).astype(np.intp)
+    return order[picks]
+
+def _replicate(design: FEDesign, train: np.ndarray, test: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(effects vs the reference district, mean held-out residual) per district; NaN where undefined."""
+    n_groups = len(design.levels)
+    beta, _, alphas, _, _, _ = within_solve(design.y[train], design.X[train], design.codes[train], n_groups)
+    codes = design.codes[test]
+    resid = design.y[test] - alphas[codes] - design.X[test] @ beta
+    ok = ~np.isnan(resid)
+    counts = np.bincount(codes[ok], minlength=n_groups)
+    sums = np.bincount(codes[ok], weights=resid[ok], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return alphas - alphas[0], np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+def _run_chunk(task: tuple[str, list[Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """Run a chunk of replicates in this worker: ("bootstrap", seeds) or ("kfold", [(folds, k), ...])."""
+    design = _DESIGN
+    method, items = task
+    effects, resid = [], []
+    for item in items:
+        if method == "bootstrap":
+            train = _bootstrap_rows(design.codes, np.random.default_rng(item))
+            test = np.flatnonzero(np.bincount(train, minlength=design.nobs) == 0)
+        else:
+            fold_ids, k = item
+            train, test = np.flatnonzero(fold_ids != k), np.flatnonzero(fold_ids == k)
+        e, r = _replicate(design, train, test)
+        effects.append(e)
+        resid.append(r)
+    return np.array(effects), np.array(resid)
+
+def _chunks(items: list[Any], n: int) -> list[list[Any]]:
+    size = max(1, -(-len(items) // n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def run_replicates(design: FEDesign, method: str = "bootstrap", *, replicates: int = 1000, folds: int = 5,
+                   repeats: int = 20, seed: int = 0, workers: int | None = None,
+                   fold_cache: str | Path | None = DEFAULT_FOLD_CACHE) -> tuple[np.ndarray, np.ndarray]:
+    """(effects, held-out residual means), each (replicates x districts), from a process pool."""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+    if method == "bootstrap":
+        items: list[Any] = np.random.SeedSequence(seed).spawn(replicates)
+    else:
+        items = [(cached_folds(design.codes, folds, seed + r, fold_cache), k)
+                 for r in range(repeats) for k in range(folds)]
+    workers = workers or os.cpu_count() or 1
+    tasks = [(method, chunk) for chunk in _chunks(items, workers * 4)]
+    if workers <= 1:
+        _init_worker(design)
+        results = [_run_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(design,)) as pool:
+            results = list(pool.map(_run_chunk, tasks))
+    return np.concatenate([e for e, _ in results]), np.concatenate([r for _, r in results])
+
+def quadrant_probabilities(signal: np.ndarray, yield_pct: np.ndarray) -> np.ndarray:
+    """(districts x quadrants) share of replicates in each quadrant, medians taken per replicate.
+
+    `signal` is (replicates x districts); missing values count as 0, as
+    notebook 04 fills missing residuals.
+    """
+    signal = np.nan_to_num(signal, nan=0.0)
+    labels = classify(yield_pct[None, :], signal, np.nanmedian(yield_pct), np.median(signal, axis=1)[:, None])
+    return np.stack([(labels == q).mean(axis=0) for q in QUADRANTS], axis=1)
+
+def summarize(design: FEDesign, effects: np.ndarray, resid: np.ndarray, metrics: pd.DataFrame | None = None,
+              *, signal: str = "resid", confidence: float = 0.95) -> pd.DataFrame:
+    """One row per district: point effect, CI / SE of the effect, CI of the held-out residual, quadrant shares."""
+    if signal not in SIGNALS:
+        raise ValueError(f"signal must be one of {SIGNALS}, got {signal!r}")
+    tail = (1 - confidence) / 2
+    point = fit_design(design)
+    levels = pd.Index(design.levels, name=design.absorb)
+    out = pd.DataFrame({
+        "listings": point.group_counts.to_numpy(),
+        "effect": point.group_alphas.to_numpy() - point.group_alphas.iloc[0],
+        "effect_lo": np.nanquantile(effects, tail, axis=0),
+        "effect_hi": np.nanquantile(effects, 1 - tail, axis=0),
+        "effect_se": np.nanstd(effects, axis=0, ddof=1),
+        "resid_lo": np.nanquantile(resid, tail, axis=0),
+        "resid_hi": np.nanquantile(resid, 1 - tail, axis=0),
+    }, index=levels)
+    if metrics is not None:
+        yields = metrics.assign(district=metrics["district"].astype(str).str.strip()).set_index("district")["yield_pct"]
+        mapped = [d in yields.index for d in levels]
+        probs = np.full((len(levels), len(QUADRANTS)), np.nan)
+        values = effects if signal == "effect" else resid
+        probs[mapped] = quadrant_probabilities(values[:, mapped], yields.reindex(levels[mapped]).to_numpy(dtype=float))
+        for i, q in enumerate(QUADRANTS):
+            out[f"p_{q}"] = probs[:, i]
+    return out.reset_index()
+
+def resample(data: pd.DataFrame, metrics: pd.DataFrame | None = None, *, method: str = "bootstrap",
+             signal: str = "resid", confidence: float = 0.95, formula: str = HEDONIC_FORMULA,
+             min_listings: int = MIN_LISTINGS, **kwargs: Any) -> pd.DataFrame:
+    """Build the notebook-03 design from processed listings, resample it and summarize per district."""
+    design = FEDesign(formula, hedonic_frame(data, min_listings))
+    effects, resid = run_replicates(design, method, **kwargs)
+    return summarize(design, effects, resid, metrics, signal=signal, confidence=confidence)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Bootstrap / K-fold uncertainty of district effects and quadrants")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Processed CSV or Parquet dataset")
+    parser.add_argument("--metrics", default=DEFAULT_METRICS, help="district_metrics.csv with yield_pct ('' to skip)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Per-district summary CSV")
+    parser.add_argument("--method", choices=METHODS, default="bootstrap")
+    parser.add_argument("--replicates", type=int, default=1000, help="Bootstrap replicates")
+    parser.add_argument("--folds", type=int, default=5, help="K for --method kfold")
+    parser.add_argument("--repeats", type=int, default=20, help="Repeated K-fold partitions")
+    parser.add_argument("--signal", choices=SIGNALS, default="resid",
+                        help="Vertical quadrant axis: held-out mean residual or district effect")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the bounds")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fold-cache", default=DEFAULT_FOLD_CACHE, help="Fold partition cache ('' to disable)")
+    args = parser.parse_args(argv)
+    data = read_processed(args.input, columns=["price_eur", "area_m2", "rooms", "floor", "is_ground_floor",
+                                               "is_top_floor", "newbuild", "heat", "construction_type", "district"])
+    metrics = pd.read_csv(args.metrics) if args.metrics and Path(args.metrics).exists() else None
+    if metrics is None:
+        print("[warn] no district metrics; quadrant probabilities skipped")
+    start = time.perf_counter()
+    summary = resample(data, metrics, method=args.method, signal=args.signal, confidence=args.confidence,
+                       replicates=args.replicates, folds=args.folds, repeats=args.repeats, seed=args.seed,
+                       workers=args.workers, fold_cache=args.fold_cache or None)
+    fits = args.replicates if args.method == "bootstrap" else args.folds * args.repeats
+    print(f"[resample] {fits} {args.method} fits over {len(summary)} districts in {time.perf_counter() - start:.1f}s")
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(output, index=False)
+    print(f"Saved: {output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
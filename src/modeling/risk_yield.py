@@ -0,0 +1,280 @@
+"""District yield and risk quadrants (notebook 04) as a library with incremental recompute.
+
+Notebook 04 merges the official sale and rent tables with the hedonic
+residuals, computes `yield_pct = rent_ppm2 / sale_ppm2 * 100` and classifies
+every district with a row-wise `apply`, from scratch on each run. Here:
+- `load_inputs` / `merge_metrics` do the notebook's load, `district` strip,
+  common-district filter and merge (same rows and values as
+  `district_metrics.csv`); `load_inputs` first resolves the rent and
+  residual district names onto the sale table's spelling
+  (`districts.DistrictResolver`), so a district spelled differently in one
+  input is not dropped from the intersection, and prints the names it could
+  not resolve; `--as-of` aligns the historical tables the same way
+  (`align_inputs`)
+- `thresholds` gives the yield and residual cut-offs: medians by default,
+  any quantile (`yield_q`, `resid_q`), optionally weighted per district
+  (e.g. by listing count); `quadrants.classify` labels all districts at once
+- `RiskYieldCache` keeps the merged inputs, per-district digests of the
+  input rows, the cut-offs and the labels in a JSON file. `update` hashes
+  the three input files and returns the cached metrics if none changed.
+  Otherwise it rebuilds only the districts whose inputs changed (or that
+  appeared or disappeared), recomputes the yield / residual cut-off only
+  when that axis changed, and reclassifies every district only when a
+  cut-off moved (else just the changed ones)
+
+Usage:
+  python -m src.modeling.risk_yield                        # writes data/processed/district_metrics.csv
+  python -m src.modeling.risk_yield --yield-q 0.4 --resid-q 0.6 --output /tmp/metrics_q.csv
+  python -m src.modeling.risk_yield --as-of 2025-06-30 --output /tmp/metrics_june.csv
+  python -m src.modeling.risk_yield --weights data/processed/district_uncertainty.csv --weights-column listings
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.modeling.quadrants import classify
+from src.processing.districts import DistrictResolver
+
+SALE_PATH = "data/official/official_sale_flat_final.csv"
+RENT_PATH = "data/official/official_rent_flat_final.csv"
+RESID_PATH = "data/processed/district_residuals.csv"
+OUTPUT_PATH = "data/processed/district_metrics.csv"
+CACHE_PATH = "data/cache/risk_yield.json"
+METRIC_COLUMNS = ["district", "sale_ppm2", "rent_ppm2", "resid", "yield_pct", "quadrant", "plot_id"]
+
+class Thresholds(NamedTuple):
+    yield_cut: float
+    resid_cut: float
+
+def load_inputs(sale_path: str | Path = SALE_PATH, rent_path: str | Path = RENT_PATH,
+                resid_path: str | Path = RESID_PATH, *,
+                resolve: bool = True) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Official sale / rent tables and district residuals, `district` stripped; no residual file -> empty.
+
+    With `resolve`, rent and residual district names are mapped onto the sale table's names.
+    """
+    sale = pd.read_csv(sale_path)
+    rent = pd.read_csv(rent_path)
+    resid = pd.read_csv(resid_path) if Path(resid_path).exists() else pd.DataFrame(columns=["district", "resid"])
+    return align_inputs(sale, rent, resid, resolve=resolve)
+
+def align_inputs(sale: pd.DataFrame, rent: pd.DataFrame, resid: pd.DataFrame, *,
+                 resolve: bool = True) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """`district` stripped in all three tables; with `resolve`, rent and residual names mapped onto the sale table's."""
+    sale, rent, resid = (df.assign(district=df["district"].astype(str).str.strip()) for df in (sale, rent, resid))
+    if resolve:
+        resolver = DistrictResolver(sale["district"])
+        rent = resolver.align(rent, label="rent")
+        resid = resolver.align(resid, label="residuals")
+    return sale, rent, resid
+
+def merge_metrics(sale: pd.DataFrame, rent: pd.DataFrame, resid: pd.DataFrame,
+                  only: set[str] | None = None) -> pd.DataFrame:
+    """Per-district sale_ppm2, rent_ppm2, resid (missing -> 0) and yield_pct, sorted by district.
+
+    `only` restricts the output to some districts (the common-district filter
+    still sees the full tables).
+    """
+    common = set(sale["district"]) & set(rent["district"])
+    if not resid.empty:
+        common &= set(resid["district"])
+    if only is not None:
+        common = (common or set(sale["district"]) | set(rent["district"])) & only
+    if common or only is not None:
+        sale, rent = sale[sale["district"].isin(common)], rent[rent["district"].isin(common)]
+        resid = resid[resid["district"].isin(common)]
+    metrics = pd.DataFrame({"district": sale["district"],
+                            "sale_ppm2": pd.to_numeric(sale["ppm2_all"], errors="coerce")})
+    metrics = metrics.merge(pd.DataFrame({"district": rent["district"],
+                                          "rent_ppm2": pd.to_numeric(rent["rent_ppm2_all"], errors="coerce")}),
+                            on="district", how="outer")
+    metrics = metrics.merge(resid[["district", "resid"]], on="district", how="left")
+    metrics = metrics.dropna(subset=["sale_ppm2", "rent_ppm2"])
+    metrics["resid"] = metrics["resid"].astype(float).fillna(0)
+    metrics["yield_pct"] = (metrics["rent_ppm2"] / metrics["sale_ppm2"] * 100).round(2)
+    return metrics.sort_values("district").reset_index(drop=True)
+
+def weighted_quantile(values: np.ndarray, q: float, weights: np.ndarray | None = None) -> float:
+    """`np.quantile` without weights; with weights, interpolated over weight-centred positions."""
+    values = np.asarray(values, dtype=float)
+    ok = ~np.isnan(values)
+    if weights is None:
+        return float(np.quantile(values[ok], q)) if ok.any() else float("nan")
+    weights = np.asarray(weights, dtype=float)
+    ok &= ~np.isnan(weights) & (weights > 0)
+    if not ok.any():
+        return float("nan")
+    order = np.argsort(values[ok])
+    v, w = values[ok][order], weights[ok][order]
+    positions = (np.cumsum(w) - 0.5 * w) / w.sum()
+    return float(np.interp(q, positions, v))
+
+def yield_cut(metrics: pd.DataFrame, q: float = 0.5, weights: pd.Series | None = None) -> float:
+    return weighted_quantile(metrics["yield_pct"], q, _aligned(metrics, weights))
+
+def resid_cut(metrics: pd.DataFrame, q: float = 0.5, weights: pd.Series | None = None) -> float:
+    return weighted_quantile(metrics["resid"], q, _aligned(metrics, weights))
+
+def _aligned(metrics: pd.DataFrame, weights: pd.Series | None) -> np.ndarray | None:
+    return None if weights is None else weights.reindex(metrics["district"]).to_numpy(dtype=float)
+
+def thresholds(metrics: pd.DataFrame, *, yield_q: float = 0.5, resid_q: float = 0.5,
+               weights: pd.Series | None = None) -> Thresholds:
+    """Cut-offs of both axes: medians by default, else quantiles, optionally weighted per district."""
+    return Thresholds(yield_cut(metrics, yield_q, weights), resid_cut(metrics, resid_q, weights))
+
+def classify_metrics(metrics: pd.DataFrame, cuts: Thresholds) -> pd.Series:
+    return pd.Series(classify(metrics["yield_pct"], metrics["resid"], cuts.yield_cut, cuts.resid_cut),
+                     index=metrics.index, name="quadrant")
+
+def risk_yield_metrics(sale: pd.DataFrame, rent: pd.DataFrame, resid: pd.DataFrame, *, yield_q: float = 0.5,
+                       resid_q: float = 0.5, weights: pd.Series | None = None) -> pd.DataFrame:
+    """Full recompute: the `district_metrics.csv` frame of notebook 04."""
+    metrics = merge_metrics(sale, rent, resid)
+    metrics["quadrant"] = classify_metrics(metrics, thresholds(metrics, yield_q=yield_q, resid_q=resid_q,
+                                                               weights=weights))
+    metrics["plot_id"] = metrics.index + 1
+    return metrics[METRIC_COLUMNS]
+
+def file_digest(path: str | Path) -> str | None:
+    path = Path(path)
+    return hashlib.sha1(path.read_bytes()).hexdigest() if path.exists() else None
+
+def _row_digests(sale: pd.DataFrame, rent: pd.DataFrame, resid: pd.DataFrame) -> dict[str, str]:
+    """Digest per district of the input values it depends on (and whether it has a residual)."""
+    parts: dict[str, list[str]] = {}
+    for name, frame, cols in (("sale", sale, ["ppm2_all"]), ("rent", rent, ["rent_ppm2_all"]),
+                              ("resid", resid, ["resid"])):
+        for district, *values in frame[["district", *cols]].astype(str).itertuples(index=False):
+            parts.setdefault(district, []).append(f"{name}={'|'.join(values)}")
+    return {d: hashlib.sha1(";".join(sorted(p)).encode("utf-8")).hexdigest() for d, p in parts.items()}
+
+class RiskYieldCache:
+    """Merged inputs, cut-offs and labels of the last run (JSON), updated incrementally."""
+
+    def __init__(self, path: str | Path = CACHE_PATH) -> None:
+        self.path = Path(path)
+        self.state: dict[str, Any] = {}
+        if self.path.exists():
+            try:
+                self.state = json.loads(self.path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                self.state = {}
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def update(self, sale_path: str | Path = SALE_PATH, rent_path: str | Path = RENT_PATH,
+               resid_path: str | Path = RESID_PATH, *, yield_q: float = 0.5, resid_q: float = 0.5,
+               weights: pd.Series | None = None) -> pd.DataFrame:
+        """Current metrics, recomputing only what changed since the cached run (see module docstring)."""
+        inputs = {"sale": file_digest(sale_path), "rent": file_digest(rent_path), "resid": file_digest(resid_path)}
+        options = {"yield_q": yield_q, "resid_q": resid_q,
+                   "weights": None if weights is None else {str(k): float(v) for k, v in weights.items()}}
+        cached_rows: dict[str, dict[str, Any]] = self.state.get("rows", {})
+        if self.state.get("inputs") == inputs and self.state.get("options") == options and cached_rows:
+            print(f"[risk-yield] inputs unchanged; {len(cached_rows)} districts from cache")
+            return self._frame(cached_rows)
+
+        sale, rent, resid = load_inputs(sale_path, rent_path, resid_path)
+        digests = _row_digests(sale, rent, resid)
+        old_digests: dict[str, str] = self.state.get("digests", {})
+        changed = {d for d in digests.keys() | old_digests.keys() if digests.get(d) != old_digests.get(d)}
+        # a district entering or leaving a table can change the common set (and so every row)
+        if self._membership(sale, rent, resid) != self.state.get("membership"):
+            changed = set(digests)
+        full = changed == set(digests)
+        merged = merge_metrics(sale, rent, resid, only=None if full else changed)
+        rows = {} if full else {d: r for d, r in cached_rows.items() if d not in changed}
+        for record in merged.to_dict("records"):
+            rows[record["district"]] = {k: record[k] for k in ("sale_ppm2", "rent_ppm2", "resid", "yield_pct")}
+        frame = self._frame(rows, with_labels=False)
+
+        old_cuts = self.state.get("cuts")
+        options_changed = self.state.get("options") != options
+        yield_moved = options_changed or any(
+            cached_rows.get(d, {}).get("yield_pct") != rows.get(d, {}).get("yield_pct") for d in changed)
+        resid_moved = options_changed or any(
+            cached_rows.get(d, {}).get("resid") != rows.get(d, {}).get("resid") for d in changed)
+        cuts = Thresholds(
+            yield_cut(frame, yield_q, weights) if yield_moved or old_cuts is None else old_cuts[0],
+            resid_cut(frame, resid_q, weights) if resid_moved or old_cuts is None else old_cuts[1],
+        )
+        relabel = frame.index if old_cuts is None or tuple(cuts) != tuple(old_cuts) \
+            else frame.index[frame["district"].isin(changed)]
+        labels = classify_metrics(frame.loc[relabel], cuts)
+        for district, quadrant in zip(frame.loc[relabel, "district"], labels):
+            rows[district]["quadrant"] = quadrant
+        print(f"[risk-yield] {len(changed & rows.keys())} of {len(rows)} districts recomputed; "
+              f"yield cut {'recomputed' if yield_moved else 'cached'}, resid cut "
+              f"{'recomputed' if resid_moved else 'cached'}; {len(relabel)} reclassified")
+        self.state = {"inputs": inputs, "options": options, "digests": digests,
+                      "membership": self._membership(sale, rent, resid), "cuts": list(cuts), "rows": rows}
+        self._save()
+        return self._frame(rows)
+
+    @staticmethod
+    def _membership(sale: pd.DataFrame, rent: pd.DataFrame, resid: pd.DataFrame) -> str:
+        names = [",".join(sorted(set(df["district"]))) for df in (sale, rent, resid)]
+        return hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _frame(rows: dict[str, dict[str, Any]], with_labels: bool = True) -> pd.DataFrame:
+        frame = pd.DataFrame([{"district": d, **r} for d, r in sorted(rows.items())],
+                             columns=["district", "sale_ppm2", "rent_ppm2", "resid", "yield_pct", "quadrant"])
+        if not with_labels:
+            return frame.drop(columns="quadrant")
+        frame["plot_id"] = frame.index + 1
+        return frame[METRIC_COLUMNS]
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="District yields and risk quadrants (notebook 04)")
+    parser.add_argument("--sale", default=SALE_PATH, help="Official sale table (district, ppm2_all)")
+    parser.add_argument("--rent", default=RENT_PATH, help="Official rent table (district, rent_ppm2_all)")
+    parser.add_argument("--resid", default=RESID_PATH, help="district_residuals.csv")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Where to write district_metrics.csv")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Incremental cache (JSON)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute everything, leave the cache alone")
+    parser.add_argument("--yield-q", type=float, default=0.5, help="Yield cut-off quantile (0.5 = median)")
+    parser.add_argument("--resid-q", type=float, default=0.5, help="Residual cut-off quantile (0.5 = median)")
+    parser.add_argument("--as-of", help="Use the official history (src.processing.official) at this date "
+                                         "instead of --sale/--rent; implies --no-cache")
+    parser.add_argument("--weights", help="CSV with district weights for the cut-offs")
+    parser.add_argument("--weights-column", default="listings", help="Weight column in --weights")
+    args = parser.parse_args(argv)
+    weights = None
+    if args.weights:
+        table = pd.read_csv(args.weights)
+        weights = table.set_index(table["district"].astype(str).str.strip())[args.weights_column].astype(float)
+    if args.as_of:
+        from src.processing.official import as_of
+
+        _, _, resid = load_inputs(args.sale, args.rent, args.resid, resolve=False)
+        inputs = align_inputs(as_of("sale", args.as_of), as_of("rent", args.as_of), resid)
+        metrics = risk_yield_metrics(*inputs,
+                                     yield_q=args.yield_q, resid_q=args.resid_q, weights=weights)
+    elif args.no_cache:
+        metrics = risk_yield_metrics(*load_inputs(args.sale, args.rent, args.resid), yield_q=args.yield_q,
+                                     resid_q=args.resid_q, weights=weights)
+    else:
+        metrics = RiskYieldCache(args.cache).update(args.sale, args.rent, args.resid, yield_q=args.yield_q,
+                                                    resid_q=args.resid_q, weights=weights)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    metrics.to_csv(output, index=False)
+    print(metrics["quadrant"].value_counts().to_string())
+    print(f"Saved: {output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
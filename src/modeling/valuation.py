@@ -0,0 +1,418 @@
+"""Local valuation service: fair price and residual of listings, district yield quadrants.
+
+Pricing a listing used to mean rerunning notebooks 03 and 04. `ValuationModel`
+loads the hedonic fit (`hedonic_model.json`, written with the district CSVs by
+`incremental.write_outputs` / the pipeline's hedonic stage) and
+`district_metrics.csv` once into lookup tables:
+- district -> absolute intercept (`Intercept` + district effect), plus each
+  district's yield / quadrant row
+- a slope vector over the formula's numeric terms, and per categorical
+  column a level -> coefficient table (reference level 0)
+- district names go through a `districts.DistrictResolver` over the model's
+  districts, so "град София, Лозенец" or "ж.к. Младост I" price like the
+  canonical name
+
+`predict(frame)` prices a whole batch with array operations: log fair price
+= intercept[district] + X @ beta + dummy coefficients; `fair_price_eur` is
+its exponent and `residual` = log(price_eur) - log fair price when a price
+is given (the quantity the district residuals average). Listings the model
+cannot price (unknown district or level, missing inputs) get NaN and an
+`error`. Single listings (`predict_record`) take a plain-Python path over
+the same tables (a one-row frame would cost milliseconds) behind an LRU
+cache keyed by the model inputs.
+
+`ValuationService` holds the current model and checks the artifact files'
+size / mtime at most every `check_seconds`. When either file changes (the
+pipeline published a new fit), it loads a new model and swaps it in. A load
+that fails keeps the old model, and a new model starts with an empty cache.
+Every request's latency goes into a window of the last `window` requests per
+endpoint (`latency()` gives count, p50, p99 in ms) and into the
+`valuation_seconds` histogram (`src.workflow.metrics`).
+
+HTTP (standard library `ThreadingHTTPServer`, JSON):
+  GET  /predict?area_m2=65&rooms=2&district=Лозенец&...   one listing (cached)
+  POST /predict   {...} -> one prediction, [{...}, ...] -> a list (vectorized)
+  GET  /district?name=Лозенец                              yield / quadrant row
+  GET  /stats     latency p50/p99 per endpoint, model version, cache info
+  GET  /health
+
+Usage:
+  python -m src.modeling.valuation --serve --port 8765
+  python -m src.modeling.valuation --predict data/processed/processed.csv --output /tmp/valued.csv
+  python -m src.modeling.valuation --district "Младост 1"
+  python -m src.modeling.valuation --bench 2000 --predict data/processed/processed.csv
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Mapping
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from src.modeling.fixed_effects import parse_formula
+from src.processing.districts import DistrictResolver
+from src.workflow import metrics
+
+MODEL_PATH = "data/processed/hedonic_model.json"
+METRICS_PATH = "data/processed/district_metrics.csv"
+CACHE_SIZE = 4096
+WINDOW = 10_000
+CHECK_SECONDS = 2.0
+INPUT_COLUMNS = ["area_m2", "rooms", "floor", "max_floor", "is_ground_floor", "is_top_floor", "newbuild",
+                 "heat", "construction_type", "district", "price_eur"]
+DISTRICT_COLUMNS = ["sale_ppm2", "rent_ppm2", "resid", "yield_pct", "quadrant"]
+
+def _file_version(path: str | Path) -> tuple[int, int] | None:
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class ValuationModel:
+    """Hedonic coefficients and district metrics as in-memory lookup tables."""
+
+    def __init__(self, model: Mapping[str, Any], district_metrics: pd.DataFrame | None = None, *,
+                 cache_size: int = CACHE_SIZE) -> None:
+        self.formula = model["formula"]
+        self.created = model.get("created")
+        lhs, self.numeric, categorical = parse_formula(self.formula)
+        if lhs != "log_price":
+            raise ValueError(f"expected a log_price model, got {self.formula!r}")
+        params: dict[str, float] = model["params"]
+        absorb = model.get("absorb", "district")
+        self.categorical = [c for c in categorical if c != absorb]
+        self.districts = sorted(model["district_alphas"])
+        self._district_code = {d: i for i, d in enumerate(self.districts)}
+        self._alphas = np.array([model["district_alphas"][d] for d in self.districts], dtype=float)
+        self._beta = np.array([params[name] for name in self.numeric], dtype=float)
+        self._dummies = {
+            col: {str(level): params.get(f"C({col})[T.{level}]", 0.0) for level in model["levels"][col]}
+            for col in self.categorical
+        }
+        self.resolver = DistrictResolver(self.districts)
+        table = district_metrics if district_metrics is not None else pd.DataFrame(columns=["district"])
+        table = table.assign(district=table["district"].astype(str).str.strip()).set_index("district")
+        self.district_table = {d: {c: _plain(row.get(c)) for c in DISTRICT_COLUMNS}
+                               for d, row in table.to_dict("index").items()}
+        self._metrics_resolver = DistrictResolver(self.district_table)
+        self.predict_one = lru_cache(maxsize=cache_size)(self._predict_key)  # per model: a reload starts empty
+
+    @classmethod
+    def load(cls, model_path: str | Path = MODEL_PATH, metrics_path: str | Path = METRICS_PATH,
+             **kwargs: int) -> "ValuationModel":
+        model = json.loads(Path(model_path).read_text(encoding="utf-8"))
+        table = pd.read_csv(metrics_path) if Path(metrics_path).exists() else None
+        return cls(model, table, **kwargs)
+
+    def predict(self, listings: pd.DataFrame) -> pd.DataFrame:
+        """district (resolved), log_fair, fair_price_eur, fair_ppm2, residual, quadrant, error per row."""
+        n = len(listings)
+        col = lambda name: (pd.to_numeric(listings[name], errors="coerce").to_numpy(dtype=float)
+                            if name in listings else np.full(n, np.nan))
+        area, floor, max_floor = col("area_m2"), col("floor"), col("max_floor")
+        derived = {
+            "log_area": np.log(np.where(area > 0, area, np.nan)),
+            # cleaning.derive_floor_flags, for listings that only give floor / max_floor
+            "is_ground_floor": (floor <= 0).astype(float),
+            "is_top_floor": (floor == max_floor).astype(float),
+        }
+        given = {name: col(name) for name in self.numeric}
+        X = np.column_stack([np.where(np.isnan(given[name]), derived[name], given[name]) if name in derived
+                             else given[name] for name in self.numeric]) if self.numeric else np.zeros((n, 0))
+        raw_district = listings["district"] if "district" in listings else pd.Series([None] * n, index=listings.index)
+        district = self.resolver.resolve_series(raw_district.astype("object"), keep_unresolved=False)
+        codes = district.map(self._district_code).to_numpy(dtype=float)
+        log_fair = np.where(np.isnan(codes), np.nan, self._alphas[np.nan_to_num(codes).astype(int)]) + X @ self._beta
+        error = np.where(np.isnan(codes), "unknown district", "")
+        for name in self.categorical:
+            values = listings[name].astype("object") if name in listings else pd.Series([None] * n)
+            coef = values.map(lambda v, table=self._dummies[name]: table.get(str(v), np.nan)).to_numpy(dtype=float)
+            error = np.where((error == "") & np.isnan(coef), f"unknown {name}", error)
+            log_fair = log_fair + coef
+        error = np.where((error == "") & np.isnan(log_fair), "missing inputs", error)
+        price = col("price_eur")
+        fair = np.exp(log_fair)
+        out = pd.DataFrame({
+            "district": district.to_numpy(dtype=object),
+            "log_fair": log_fair,
+            "fair_price_eur": fair,
+            "fair_ppm2": fair / area,
+            "residual": np.log(np.where(price > 0, price, np.nan)) - log_fair,
+            "quadrant": [self.district_table.get(d, {}).get("quadrant") for d in district],
+            "error": error,
+        }, index=listings.index)
+        return out
+
+    def _predict_key(self, key: tuple[tuple[str, Any], ...]) -> dict[str, Any]:
+        """`predict` for one listing in plain Python (a one-row frame costs milliseconds)."""
+        record = dict(key)
+        district = self.resolver.resolve(str(record["district"])) if record["district"] is not None else None
+        out = {"district": district, "log_fair": None, "fair_price_eur": None, "fair_ppm2": None, "residual": None,
+               "quadrant": self.district_table.get(district, {}).get("quadrant"), "error": ""}
+        if district is None:
+            out["error"] = "unknown district"
+            return out
+        area, floor, max_floor = _number(record["area_m2"]), _number(record["floor"]), _number(record["max_floor"])
+        derived = {"log_area": math.log(area) if area > 0 else math.nan,
+                   "is_ground_floor": float(floor <= 0), "is_top_floor": float(floor == max_floor)}
+        log_fair = float(self._alphas[self._district_code[district]])
+        for name, beta in zip(self.numeric, self._beta.tolist()):
+            value = _number(record.get(name))
+            log_fair += beta * (derived[name] if math.isnan(value) and name in derived else value)
+        for name in self.categorical:
+            coef = self._dummies[name].get(str(record.get(name)))
+            if coef is None:
+                out["error"] = f"unknown {name}"
+                return out
+            log_fair += coef
+        if math.isnan(log_fair):
+            out["error"] = "missing inputs"
+            return out
+        price = _number(record["price_eur"])
+        fair = math.exp(log_fair)
+        out.update(log_fair=log_fair, fair_price_eur=fair, fair_ppm2=fair / area,
+                   residual=math.log(price) - log_fair if price > 0 else None)
+        return out
+
+    def predict_record(self, record: Mapping[str, Any]) -> dict[str, Any]:
+        """One listing through the LRU cache (the key is its model inputs)."""
+        return dict(self.predict_one(tuple((c, _plain(record.get(c))) for c in INPUT_COLUMNS)))
+
+    def district(self, name: str) -> dict[str, Any] | None:
+        """district_metrics row (sale/rent per m2, residual, yield, quadrant) and model intercept."""
+        canonical = self._metrics_resolver.resolve(name) or self.resolver.resolve(name)
+        if canonical is None:
+            return None
+        code = self._district_code.get(canonical)
+        return {"district": canonical, **self.district_table.get(canonical, {}),
+                "intercept": None if code is None else float(self._alphas[code])}
+
+def _number(value: Any) -> float:
+    try:
+        return float(value) if value is not None else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+def _plain(value: Any) -> Any:
+    """JSON / hash friendly scalar: numpy -> Python, NaN / NA -> None."""
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+class ValuationService:
+    """Current `ValuationModel` with hot reload and per-endpoint latency windows."""
+
+    def __init__(self, model_path: str | Path = MODEL_PATH, metrics_path: str | Path = METRICS_PATH, *,
+                 cache_size: int = CACHE_SIZE, check_seconds: float = CHECK_SECONDS, window: int = WINDOW) -> None:
+        self.model_path, self.metrics_path = Path(model_path), Path(metrics_path)
+        self.cache_size = cache_size
+        self.check_seconds = check_seconds
+        self.window = window
+        self.latencies: dict[str, deque[float]] = {}
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._version = self._versions()
+        self.model = ValuationModel.load(self.model_path, self.metrics_path, cache_size=cache_size)
+
+    def _versions(self) -> tuple[Any, Any]:
+        return _file_version(self.model_path), _file_version(self.metrics_path)
+
+    def maybe_reload(self) -> bool:
+        """Swap in a new model if an artifact changed (checked at most every `check_seconds`)."""
+        now = time.monotonic()
+        if now - self._checked < self.check_seconds:
+            return False
+        with self._lock:
+            if now - self._checked < self.check_seconds:
+                return False
+            self._checked = now
+            version = self._versions()
+            if version == self._version or version[0] is None:
+                return False
+            try:
+                model = ValuationModel.load(self.model_path, self.metrics_path, cache_size=self.cache_size)
+            except (OSError, ValueError, KeyError) as exc:
+                print(f"[warn] reload of {self.model_path} failed, keeping the current model: {exc!r}")
+                return False
+            self.model, self._version = model, version
+            self.reloads += 1
+        print(f"[valuation] reloaded model created {model.created} ({len(model.districts)} districts)")
+        return True
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            window = self.latencies.get(endpoint)
+            if window is None:
+                window = self.latencies[endpoint] = deque(maxlen=self.window)
+            window.append(seconds)
+        metrics.observe("valuation_seconds", seconds, endpoint=endpoint)
+
+    def latency(self) -> dict[str, dict[str, float]]:
+        """count, p50_ms, p99_ms over the last `window` requests of each endpoint."""
+        with self._lock:
+            windows = {k: np.array(v) for k, v in self.latencies.items()}
+        return {k: {"count": len(v), "p50_ms": round(float(np.percentile(v, 50)) * 1e3, 3),
+                    "p99_ms": round(float(np.percentile(v, 99)) * 1e3, 3)}
+                for k, v in sorted(windows.items()) if len(v)}
+
+    def stats(self) -> dict[str, Any]:
+        cache = self.model.predict_one.cache_info()
+        return {"model": str(self.model_path), "created": self.model.created, "reloads": self.reloads,
+                "districts": len(self.model.districts), "latency": self.latency(),
+                "cache": {"hits": cache.hits, "misses": cache.misses, "size": cache.currsize}}
+
+    def predict(self, payload: Mapping[str, Any] | list[Mapping[str, Any]]) -> Any:
+        """One record -> cached single prediction; a list of records -> vectorized batch."""
+        self.maybe_reload()
+        start = time.perf_counter()
+        if isinstance(payload, list):
+            frame = self.model.predict(pd.DataFrame.from_records(payload, columns=INPUT_COLUMNS))
+            result: Any = [{k: _plain(v) for k, v in row.items()} for row in frame.to_dict("records")]
+            self.record("predict_batch", time.perf_counter() - start)
+        else:
+            result = self.model.predict_record(payload)
+            self.record("predict", time.perf_counter() - start)
+        return result
+
+    def district(self, name: str) -> dict[str, Any] | None:
+        self.maybe_reload()
+        start = time.perf_counter()
+        result = self.model.district(name)
+        self.record("district", time.perf_counter() - start)
+        return result
+
+def _query_record(query: str) -> dict[str, Any]:
+    """GET parameters as a listing: numbers parsed, the rest kept as text."""
+    record: dict[str, Any] = {}
+    for key, value in parse_qsl(query):
+        try:
+            record[key] = float(value)
+        except ValueError:
+            record[key] = value
+    return record
+
+def make_server(service: ValuationService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: Any) -> None:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:  # noqa: N802
+            url = urlsplit(self.path)
+            if url.path == "/predict":
+                self._send(200, service.predict(_query_record(url.query)))
+            elif url.path == "/district":
+                name = dict(parse_qsl(url.query)).get("name", "")
+                found = service.district(name)
+                self._send(200 if found else 404, found or {"error": f"unknown district {name!r}"})
+            elif url.path == "/stats":
+                self._send(200, service.stats())
+            elif url.path == "/health":
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self) -> None:  # noqa: N802
+            if urlsplit(self.path).path != "/predict":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"null")
+            except json.JSONDecodeError as exc:
+                self._send(400, {"error": f"invalid JSON: {exc}"})
+                return
+            if not isinstance(payload, (dict, list)):
+                self._send(400, {"error": "expected a listing object or a list of them"})
+                return
+            self._send(200, service.predict(payload))
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - keep request logs off stdout
+            return None
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+def bench(service: ValuationService, listings: pd.DataFrame, requests: int, batch: int = 500) -> dict[str, Any]:
+    """Replay `requests` single predictions (rows cycled, so the cache sees repeats) and batches."""
+    records = listings.reindex(columns=INPUT_COLUMNS).to_dict("records")
+    for i in range(requests):
+        service.predict(records[i % len(records)])
+    for start in range(0, min(len(records), requests), batch):
+        service.predict(records[start:start + batch])
+    return service.stats()
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Price listings with the fitted hedonic model; serve it over HTTP")
+    parser.add_argument("--model", default=MODEL_PATH, help="hedonic_model.json (pipeline hedonic stage)")
+    parser.add_argument("--metrics", default=METRICS_PATH, help="district_metrics.csv")
+    parser.add_argument("--serve", action="store_true", help="Run the HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--predict", default=None, metavar="CSV", help="Price the listings of this CSV")
+    parser.add_argument("--output", default=None, help="Where to write --predict results (default: print a summary)")
+    parser.add_argument("--district", default=None, help="Print one district's yield / quadrant")
+    parser.add_argument("--bench", type=int, default=0, metavar="N",
+                        help="Replay N single requests (and batches) from --predict and report p50/p99")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="LRU size for single predictions")
+    args = parser.parse_args(argv)
+    if not Path(args.model).exists():
+        print(f"[error] {args.model} not found; run the hedonic stage (src.workflow.run_pipeline) first")
+        return 1
+    service = ValuationService(args.model, args.metrics, cache_size=args.cache_size)
+    if args.district:
+        found = service.district(args.district)
+        print(json.dumps(found or {"error": f"unknown district {args.district!r}"}, ensure_ascii=False, indent=1))
+    if args.predict:
+        listings = pd.read_csv(args.predict, usecols=lambda c: c in INPUT_COLUMNS)
+        if args.bench:
+            stats = bench(service, listings, args.bench)
+            for endpoint, lat in stats["latency"].items():
+                print(f"[valuation] {endpoint}: n={lat['count']} p50={lat['p50_ms']:.3f}ms p99={lat['p99_ms']:.3f}ms")
+            print(f"[valuation] cache {stats['cache']}")
+        else:
+            start = time.perf_counter()
+            valued = service.model.predict(listings)
+            elapsed = time.perf_counter() - start
+            priced = valued["error"] == ""
+            print(f"[valuation] {len(valued)} listings in {elapsed * 1e3:.1f} ms: {int(priced.sum())} priced, "
+                  f"median residual {valued.loc[priced, 'residual'].median():+.3f}; "
+                  + ", ".join(f"{e}={n}" for e, n in valued.loc[~priced, "error"].value_counts().items()))
+            if args.output:
+                pd.concat([listings, valued.drop(columns="district")], axis=1).to_csv(args.output, index=False)
+                print(f"Saved: {args.output}")
+    if args.serve:
+        server = make_server(service, args.host, args.port)
+        print(f"[valuation] serving {args.model} on http://{args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            for endpoint, lat in service.latency().items():
+                print(f"[valuation] {endpoint}: n={lat['count']} p50={lat['p50_ms']:.3f}ms p99={lat['p99_ms']:.3f}ms")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
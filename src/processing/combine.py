@@ -1,19 +1,34 @@
-"""Combine raw scrape files into a single DataFrame for cleaning."""
+"""Combine raw scrape files into a single DataFrame for cleaning.
+
+Inputs are raw CSVs or the files of a partitioned Parquet dataset
+(`src.processing.storage`); `columns` projects both, so callers that do not
+need `desc_text` never parse it.
+"""
 from __future__ import annotations
 import glob
 from pathlib import Path
 from typing import Iterable
 import pandas as pd
 
+from src.processing.storage import dataset_files, is_dataset, read_dataset
+
 RAW_GLOB = "data/raw/raw_*.csv"
 
 def list_raw_paths(pattern: str = RAW_GLOB) -> list[Path]:
-    """Return sorted list of raw CSV paths to combine."""
+    """Return sorted list of raw CSV paths to combine (Parquet files when `pattern` is a dataset directory)."""
+    if is_dataset(pattern):
+        return dataset_files(pattern)
     return sorted(Path(p) for p in glob.glob(pattern))
 
-def load_and_concat(paths: Iterable[Path]) -> pd.DataFrame:
-    """Load provided CSVs and concatenate into one DataFrame."""
-    frames = [pd.read_csv(p) for p in paths]
+def load_and_concat(paths: Iterable[Path], columns: Iterable[str] | None = None) -> pd.DataFrame:
+    """Load provided CSV/Parquet files (optionally only `columns`) and concatenate into one DataFrame."""
+    paths = [Path(p) for p in paths]
+    cols = list(columns) if columns is not None else None
+    usecols = None if cols is None else (lambda c: c in cols)
+    frames = [pd.read_csv(p, usecols=usecols) for p in paths if p.suffix != ".parquet"]
+    parquet = [p for p in paths if p.suffix == ".parquet"]
+    if parquet:
+        frames.append(read_dataset(parquet, columns=cols))
     if not frames:
         return pd.DataFrame()
     return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,228 @@
+"""District-name resolution onto the official district vocabulary.
+
+`cleaning.standardize_district` only strips the "град София, " prefix, and
+`risk_yield.merge_metrics` joins the tables by exact name, so a spelling that
+differs between sources ("Люлин-център" / "Люлин - център", "м-т
+Киноцентъра" / "в.з.Киноцентъра", "Младост I" / "Младост 1") silently drops
+the district. `DistrictResolver` maps a name to one canonical district:
+- exact canonical name
+- explicit `aliases` (alias -> canonical; `--aliases` CSV with alias,district)
+- normalized key: case folded, Latin look-alike letters to Cyrillic, the
+  city prefix dropped, dashes / dots / spaces unified, a Roman numeral suffix
+  as digits
+- loose key: the normalized key without the settlement-type prefix ("ж.к.",
+  "кв.", "в.з.", "м-т", "с.", "гр.", ...)
+- base name: a numbered name whose number the vocabulary lacks ("Овча купел
+  7" -> "Овча купел")
+- character trigrams (an inverted index over the loose keys), Dice
+  similarity >= `min_score`, the best candidate strictly ahead of the
+  second, and the same numbers in both names (so "Люлин 11" never becomes
+  "Люлин 1")
+
+Every key level is built once from the vocabulary and only used when it
+names exactly one canonical district, so "Бояна" / "в.з.Бояна" stay apart.
+Lookups are memoized per distinct string, and `resolve_series` factorizes
+its input first, so millions of rows cost one resolution per distinct name.
+Names that resolve to nothing are counted (`unresolved`, `report()`) and
+kept as they are instead of being dropped; `align` additionally keeps a name
+whose canonical district already has an exact row in the same table.
+
+Usage:
+  resolver = DistrictResolver.from_official()           # sale + rent districts of data/official
+  df["district"] = resolver.resolve_series(df["district"])
+  python -m src.processing.districts data/raw/raw_combined.csv --column district_raw
+"""
+from __future__ import annotations
+
+import argparse
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+SALE_PATH = "data/official/official_sale_flat_final.csv"
+RENT_PATH = "data/official/official_rent_flat_final.csv"
+REPORT_PATH = "data/processed/unresolved_districts.csv"
+MIN_SCORE = 0.8
+NGRAM = 3
+
+_LATIN_TO_CYRILLIC = str.maketrans("aceopxyABCEHKMOPTX", "асеорхуАВСЕНКМОРТХ")
+_CITY_RE = re.compile(r"^\s*(?:гр\.?|град)\s*софия\s*,?\s*")
+_TYPE_RE = re.compile(r"^(?:ж\s*к|жк|кв|в\s*з|вз|м\s*т|местност|ж\s*гр|с|село|гр|град)\b\s*")
+_SEPARATOR_RE = re.compile(r"[\s\-–—.,\"'„“”()]+")
+_ROMAN_RE = re.compile(r"\b(i{1,3}|iv|vi{0,3})$")  # Latin x is a Cyrillic look-alike, so no IX / X
+_ROMAN = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6, "vii": 7, "viii": 8}
+_NUMBER_RE = re.compile(r"\s*\d+[а-я]?$")
+_DIGITS_RE = re.compile(r"\d+[а-я]?\b")  # numbers with their letter suffix: "1" is not "1а"
+
+def normalize_key(name: str) -> str:
+    """Case-folded name without the city prefix, with unified separators and Arabic numbering."""
+    key = _CITY_RE.sub("", str(name).translate(_LATIN_TO_CYRILLIC).casefold())
+    key = _SEPARATOR_RE.sub(" ", key).strip()
+    key = re.sub(r"(\d)\s+([а-я])$", r"\1\2", key)  # "младост 1 а" -> "младост 1а"
+    return _ROMAN_RE.sub(lambda m: str(_ROMAN[m.group(1)]), key.replace("і", "i"))
+
+def loose_key(name: str) -> str:
+    """`normalize_key` without the settlement-type prefix."""
+    return _TYPE_RE.sub("", normalize_key(name)).strip()
+
+def _unique_index(pairs: Iterable[tuple[str, str]]) -> dict[str, str]:
+    """key -> canonical for the keys that name exactly one canonical district."""
+    owners: dict[str, set[str]] = {}
+    for key, canonical in pairs:
+        if key:
+            owners.setdefault(key, set()).add(canonical)
+    return {key: next(iter(names)) for key, names in owners.items() if len(names) == 1}
+
+def _ngrams(key: str, n: int = NGRAM) -> set[str]:
+    padded = f" {key} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+class DistrictResolver:
+    """Memoized name -> canonical district lookups over prebuilt key and n-gram indexes."""
+
+    def __init__(self, vocabulary: Iterable[str], aliases: Mapping[str, str] | None = None, *,
+                 min_score: float = MIN_SCORE) -> None:
+        self.vocabulary = sorted({str(v).strip() for v in vocabulary if isinstance(v, str) and v.strip()})
+        canonical = set(self.vocabulary)
+        self.aliases = {normalize_key(a): c for a, c in (aliases or {}).items() if c in canonical}
+        self.min_score = min_score
+        self._normalized = _unique_index((normalize_key(c), c) for c in self.vocabulary)
+        self._loose = _unique_index((loose_key(c), c) for c in self.vocabulary)
+        self._keys = list(self._loose)  # n-gram candidates: unambiguous loose keys
+        self._grams = [_ngrams(k) for k in self._keys]
+        self._postings: dict[str, list[int]] = {}
+        for i, grams in enumerate(self._grams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(i)
+        self._cache: dict[str, tuple[str | None, str]] = {c: (c, "exact") for c in self.vocabulary}
+        self.unresolved: Counter[str] = Counter()
+
+    @classmethod
+    def from_official(cls, sale_path: str | Path = SALE_PATH, rent_path: str | Path = RENT_PATH,
+                      aliases: Mapping[str, str] | None = None, **kwargs: float) -> "DistrictResolver":
+        """Resolver over the districts of the official sale and rent tables."""
+        names = [pd.read_csv(p, usecols=["district"])["district"] for p in (sale_path, rent_path) if Path(p).exists()]
+        return cls(pd.concat(names).astype(str).str.strip() if names else [], aliases, **kwargs)
+
+    def _best_ngram(self, key: str) -> tuple[str | None, float]:
+        """Closest unambiguous loose key by trigram Dice similarity; None on a tie."""
+        grams = _ngrams(key)
+        shared: Counter[int] = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        if not shared:
+            return None, 0.0
+        scores = sorted(((2 * n / (len(grams) + len(self._grams[i])), i) for i, n in shared.items()), reverse=True)
+        best, i = scores[0]
+        if len(scores) > 1 and scores[1][0] == best:
+            return None, best
+        return self._loose[self._keys[i]], best
+
+    def _resolve(self, name: str) -> tuple[str | None, str]:
+        key = normalize_key(name)
+        if key in self.aliases:
+            return self.aliases[key], "alias"
+        if key in self._normalized:
+            return self._normalized[key], "normalized"
+        loose = _TYPE_RE.sub("", key).strip()
+        if loose in self._loose:
+            return self._loose[loose], "loose"
+        base = _NUMBER_RE.sub("", loose)
+        if base != loose and base in self._loose:
+            return self._loose[base], "base"
+        match, score = self._best_ngram(loose)
+        if match is not None and score >= self.min_score \
+                and _DIGITS_RE.findall(loose) == _DIGITS_RE.findall(loose_key(match)):
+            return match, "ngram"
+        return None, "unresolved"
+
+    def resolve(self, name: str) -> str | None:
+        """Canonical district for `name`, or None (memoized)."""
+        hit = self._cache.get(name)
+        if hit is None:
+            hit = self._cache[name] = self._resolve(name)
+        return hit[0]
+
+    def method(self, name: str) -> str:
+        """How `name` was resolved: exact, alias, normalized, loose, base, ngram or unresolved."""
+        self.resolve(name)
+        return self._cache[name][1]
+
+    def resolve_series(self, series: pd.Series, *, keep_unresolved: bool = True) -> pd.Series:
+        """Canonical district per row (one lookup per distinct value); unresolved rows keep their
+        name (or become NaN with `keep_unresolved=False`) and are counted in `unresolved`."""
+        codes, uniques = pd.factorize(series)
+        names = [str(u).strip() for u in uniques]
+        resolved = [self.resolve(n) for n in names]
+        counts = np.bincount(codes[codes >= 0], minlength=len(names))
+        for name, canonical, n in zip(names, resolved, counts):
+            if canonical is None:
+                self.unresolved[name] += int(n)
+        values = np.array([c if c is not None else (n if keep_unresolved else np.nan)
+                           for n, c in zip(names, resolved)] + [np.nan], dtype=object)
+        return pd.Series(values[codes], index=series.index, name=series.name)  # code -1 picks NaN
+
+    def align(self, df: pd.DataFrame, column: str = "district", *, label: str = "table") -> pd.DataFrame:
+        """`df` with `column` resolved, except where that would duplicate a row already named exactly.
+
+        For one-row-per-district tables (official sale / rent, residuals): "в.з.Бояна"
+        resolving to "Бояна" in a table that also has "Бояна" keeps its own name.
+        """
+        names = df[column].astype(str).str.strip()
+        resolved = self.resolve_series(names)
+        exact = set(names[names == resolved])
+        taken = (resolved != names) & resolved.isin(exact)
+        if taken.any():
+            resolved = resolved.where(~taken, names)
+        renamed = int(((resolved != names) & ~taken).sum())
+        unresolved = sorted(n for n in names.unique() if self.resolve(n) is None)
+        if renamed or unresolved or taken.any():
+            print(f"[districts] {label}: {renamed} names resolved, {int(taken.sum())} kept (already present), "
+                  f"{len(unresolved)} unresolved"
+                  + (f" ({', '.join(unresolved[:10])}{', ...' if len(unresolved) > 10 else ''})" if unresolved else ""))
+        out = df.copy(deep=False)
+        out[column] = resolved
+        return out
+
+    def report(self) -> pd.DataFrame:
+        """Unresolved names with their row counts and nearest district (below `min_score`)."""
+        rows = []
+        for name, n in self.unresolved.most_common():
+            suggestion, score = self._best_ngram(loose_key(name))
+            rows.append({"name": name, "rows": n, "suggestion": suggestion, "score": round(score, 3)})
+        return pd.DataFrame(rows, columns=["name", "rows", "suggestion", "score"])
+
+def read_aliases(path: str | Path) -> dict[str, str]:
+    """alias -> district from a CSV with `alias` and `district` columns."""
+    df = pd.read_csv(path, dtype=str).dropna(subset=["alias", "district"])
+    return dict(zip(df["alias"].str.strip(), df["district"].str.strip()))
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Resolve district names onto the official district vocabulary")
+    parser.add_argument("input", help="CSV with a district column (raw, combined or processed listings)")
+    parser.add_argument("--column", default="district", help="Column to resolve (e.g. district_raw)")
+    parser.add_argument("--sale", default=SALE_PATH)
+    parser.add_argument("--rent", default=RENT_PATH)
+    parser.add_argument("--aliases", default=None, help="CSV of alias,district pairs")
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE, help="Min trigram similarity")
+    parser.add_argument("--report", default=REPORT_PATH, help="Where to write the unresolved names")
+    args = parser.parse_args(argv)
+    resolver = DistrictResolver.from_official(args.sale, args.rent, read_aliases(args.aliases) if args.aliases else None,
+                                              min_score=args.min_score)
+    names = pd.read_csv(args.input, usecols=[args.column])[args.column]
+    resolver.resolve_series(names)
+    methods = Counter(resolver.method(str(n).strip()) for n in names.dropna().unique())
+    print(f"[districts] {names.nunique()} distinct names over {len(names)} rows: "
+          + ", ".join(f"{m}={n}" for m, n in sorted(methods.items())))
+    report = resolver.report()
+    Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(args.report, index=False)
+    print(f"[districts] {len(report)} unresolved names ({int(report['rows'].sum())} rows) -> {args.report}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
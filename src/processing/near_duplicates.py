@@ -0,0 +1,218 @@
+"""Near-duplicate listings (the same flat re-posted by several agencies) via MinHash/LSH.
+
+`combine.drop_exact_duplicates` only catches rows whose url, price and area
+match, so one flat advertised by three agencies enters the model three
+times. Comparing every description with every other is O(n²); instead:
+- `desc_text` is normalized (lower case, punctuation dropped, the portal's
+  "Описание на имота:" prefix and "Виж(те) ... обяви ..." footers removed)
+  and cut into word `shingle`-grams, hashed with `pd.util.hash_array` and
+  combined arithmetically, so tokens never become Python-level loops
+- a `num_perm`-value MinHash signature per listing (multiply-shift hashes,
+  per-listing minimum with `np.minimum.reduceat`), computed in chunks of
+  `chunk_rows` listings so memory stays flat
+- listings are blocked by district, rooms and area bucket (`area_step` m²,
+  on two grids offset by half a step so neighbours across a bucket edge
+  still meet); within a block, LSH with `bands` bands of `num_perm / bands`
+  values makes listings that share any band key candidates
+- candidates are verified by the share of equal signature values (the
+  MinHash estimate of the shingle Jaccard similarity, >= `threshold`), and
+  verified pairs are merged into clusters (connected components by
+  vectorized label propagation)
+
+Every step is a sort or a pass over arrays, so the cost grows with the
+number of listings times the description length, not with pairs. Within a
+band bucket only adjacent listings are compared (a chain), so a cluster is
+found when its members are linked by a chain of similar pairs. Listings with
+fewer than `shingle` words of description are never clustered.
+
+`cluster_id` is the row position of the cluster's first listing, so a
+listing without near-duplicates has its own position; `drop_near_duplicates`
+keeps that first listing, like `drop_duplicates(keep="first")`.
+
+Usage:
+  clusters = near_duplicate_clusters(df_raw)             # cluster_id, cluster_size per row
+  df_raw = drop_near_duplicates(drop_exact_duplicates(df_raw))
+  python -m src.processing.near_duplicates data/raw/raw_combined.csv --output data/processed/near_duplicates.csv
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.processing.cleaning import parse_area, standardize_district
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE = 3
+THRESHOLD = 0.7
+AREA_STEP = 5.0
+CHUNK_ROWS = 20_000
+
+_BOILERPLATE = [
+    r"^\s*описание на имота:\s*",
+    r"\s*виж(?:те)? (?:още|всички) обяви.*$",
+]
+_NON_WORD = r"[^\w]+"
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def normalize_text(text: pd.Series) -> pd.Series:
+    """Lower-cased description without the portal boilerplate and punctuation."""
+    t = text.fillna("").astype(str).str.lower()
+    for pattern in _BOILERPLATE:
+        t = t.str.replace(pattern, "", regex=True)
+    return t.str.replace(_NON_WORD, " ", regex=True).str.strip()
+
+def _shingle_hashes(text: pd.Series, shingle: int) -> tuple[np.ndarray, np.ndarray]:
+    """(uint64 hash per word `shingle`-gram, position of its listing in `text`), grouped by listing."""
+    words = normalize_text(text).str.split().explode()
+    words = words[words.notna()]
+    doc = words.index.to_numpy()
+    h = pd.util.hash_array(words.to_numpy(dtype=object))
+    n = len(h) - shingle + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    same_doc = doc[: n] == doc[shingle - 1:]
+    key = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(shingle):
+            key = (key ^ h[i: i + n]) * _MIX
+    return key[same_doc], doc[: n][same_doc]
+
+def _permutations(num_perm: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # odd multipliers
+    b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+    return a, b
+
+def minhash_signatures(text: pd.Series, *, num_perm: int = NUM_PERM, shingle: int = SHINGLE,
+                       chunk_rows: int = CHUNK_ROWS, seed: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """(uint32 signatures, shape (len(text), num_perm), mask of listings that have shingles)."""
+    a, b = _permutations(num_perm, seed)
+    signatures = np.full((len(text), num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    has_shingles = np.zeros(len(text), dtype=bool)
+    values = text.reset_index(drop=True)
+    for start in range(0, len(values), chunk_rows):
+        keys, doc = _shingle_hashes(values.iloc[start:start + chunk_rows], shingle)
+        if not len(keys):
+            continue
+        starts = np.flatnonzero(np.r_[True, doc[1:] != doc[:-1]])
+        rows = doc[starts]
+        has_shingles[rows] = True
+        with np.errstate(over="ignore"):
+            for j in range(num_perm):
+                hashed = ((keys * a[j] + b[j]) >> np.uint64(32)).astype(np.uint32)
+                signatures[rows, j] = np.minimum.reduceat(hashed, starts)
+    return signatures, has_shingles
+
+def _block_keys(df: pd.DataFrame, area_step: float) -> list[np.ndarray]:
+    """uint64 block key per row on each of the two area grids (district, rooms, area bucket)."""
+    district = standardize_district(df["district_raw"]) if "district_raw" in df else df["district"]
+    area = parse_area(df["area_raw"]).to_numpy() if "area_raw" in df else df["area_m2"].to_numpy(dtype=float)
+    base = pd.util.hash_array(district.fillna("").astype(str).to_numpy(dtype=object))
+    rooms = pd.to_numeric(df["rooms"], errors="coerce").fillna(-1).to_numpy().astype(np.int64).astype(np.uint64)
+    keys = []
+    for offset in (0.0, area_step / 2):
+        bucket = np.where(np.isnan(area), -1, np.floor((area + offset) / area_step)).astype(np.int64)
+        with np.errstate(over="ignore"):
+            key = ((base ^ rooms) * _MIX ^ bucket.astype(np.uint64)) * _MIX
+        keys.append(key)
+    return keys
+
+def candidate_pairs(signatures: np.ndarray, rows: np.ndarray, block_keys: list[np.ndarray], *,
+                    bands: int = BANDS) -> np.ndarray:
+    """Unique (a, b) row pairs, a < b, that share a block and at least one LSH band."""
+    per_band = signatures.shape[1] // bands
+    all_keys, all_rows = [], []
+    for block in block_keys:
+        for band in range(bands):
+            with np.errstate(over="ignore"):
+                key = (block[rows] ^ np.uint64(band)) * _MIX
+                for col in signatures[rows, band * per_band:(band + 1) * per_band].T:
+                    key = (key ^ col.astype(np.uint64)) * _MIX
+            all_keys.append(key)
+            all_rows.append(rows)
+    keys = np.concatenate(all_keys)
+    members = np.concatenate(all_rows)
+    order = np.lexsort((members, keys))
+    keys, members = keys[order], members[order]
+    same = keys[1:] == keys[:-1]
+    pairs = np.stack([members[:-1][same], members[1:][same]], axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(np.sort(pairs, axis=1), axis=0) if len(pairs) else pairs.reshape(0, 2)
+
+def _components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """Smallest row position in each row's connected component."""
+    labels = np.arange(n)
+    if not len(pairs):
+        return labels
+    a, b = pairs[:, 0], pairs[:, 1]
+    while True:
+        before = labels.copy()
+        low = np.minimum(labels[a], labels[b])
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        labels = labels[labels]  # pointer jumping
+        if np.array_equal(labels, before):
+            return labels
+
+def near_duplicate_clusters(df: pd.DataFrame, *, threshold: float = THRESHOLD, num_perm: int = NUM_PERM,
+                            bands: int = BANDS, shingle: int = SHINGLE, area_step: float = AREA_STEP,
+                            chunk_rows: int = CHUNK_ROWS, seed: int = 1) -> pd.DataFrame:
+    """`cluster_id` (position of the cluster's first row) and `cluster_size` for every row of `df`.
+
+    `df` needs `desc_text`, `rooms` and either the raw `district_raw` / `area_raw`
+    columns or the processed `district` / `area_m2`.
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm={num_perm} must be a multiple of bands={bands}")
+    signatures, has_shingles = minhash_signatures(df["desc_text"], num_perm=num_perm, shingle=shingle,
+                                                  chunk_rows=chunk_rows, seed=seed)
+    rows = np.flatnonzero(has_shingles)
+    pairs = candidate_pairs(signatures, rows, _block_keys(df, area_step), bands=bands)
+    if len(pairs):
+        similarity = np.concatenate([
+            (signatures[pairs[i:i + chunk_rows, 0]] == signatures[pairs[i:i + chunk_rows, 1]]).mean(axis=1)
+            for i in range(0, len(pairs), chunk_rows)
+        ])
+        pairs = pairs[similarity >= threshold]
+    cluster = _components(len(df), pairs)
+    size = np.bincount(cluster, minlength=len(df))[cluster]
+    return pd.DataFrame({"cluster_id": cluster, "cluster_size": size}, index=df.index)
+
+def drop_near_duplicates(df: pd.DataFrame, **kwargs: float) -> pd.DataFrame:
+    """Keep the first listing of each near-duplicate cluster (see `near_duplicate_clusters`)."""
+    clusters = near_duplicate_clusters(df, **kwargs)
+    keep = clusters["cluster_id"].to_numpy() == np.arange(len(df))
+    print(f"[near-dups] {len(df) - int(keep.sum())} of {len(df)} rows are near-duplicates "
+          f"({int((clusters['cluster_size'] > 1).sum())} rows in {int((keep & (clusters['cluster_size'] > 1).to_numpy()).sum())} clusters)")
+    return df[keep]
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate listings (MinHash/LSH on desc_text)")
+    parser.add_argument("input", help="Raw or combined listings CSV (needs desc_text, rooms, district_raw, area_raw)")
+    parser.add_argument("--output", default="data/processed/near_duplicates.csv",
+                        help="url, listing_id, cluster_id, cluster_size per listing")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Min estimated Jaccard similarity")
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM)
+    parser.add_argument("--bands", type=int, default=BANDS)
+    parser.add_argument("--shingle", type=int, default=SHINGLE, help="Words per shingle")
+    parser.add_argument("--area-step", type=float, default=AREA_STEP, help="Area bucket width (m²) for blocking")
+    args = parser.parse_args(argv)
+    columns = ["url", "listing_id", "rooms", "district_raw", "area_raw", "desc_text"]
+    df = pd.read_csv(args.input, usecols=lambda c: c in columns)
+    clusters = near_duplicate_clusters(df, threshold=args.threshold, num_perm=args.num_perm, bands=args.bands,
+                                       shingle=args.shingle, area_step=args.area_step)
+    out = pd.concat([df[[c for c in ("url", "listing_id") if c in df]], clusters], axis=1)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(args.output, index=False)
+    dup = clusters["cluster_size"] > 1
+    print(f"[near-dups] {len(df)} listings, {int(dup.sum())} in {clusters.loc[dup, 'cluster_id'].nunique()} "
+          f"clusters, {len(df) - clusters['cluster_id'].nunique()} redundant -> {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
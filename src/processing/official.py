@@ -0,0 +1,232 @@
+"""Official sale / rent statistics: snapshot parser, parse cache and time-indexed history.
+
+`imot_cleaner_sales.py` / `imot_cleaner_rent.py` parsed one hardcoded
+`official_*.txt` copy-paste at import time, on every run. Now:
+- `parse_official(text, kind)` is the one parser for both tables (a district
+  line followed by six value lines; sale values join digit groups,
+  "182 298" -> "182298", rent values keep decimals, "11,37" -> "11.37") and
+  yields exactly the `official_*_flat_final.csv` rows
+- every `official_{sale,rent}*.txt` is a snapshot dated by the
+  `YYYY-MM-DD` (or `YYYY-MM`, first of month) in its name, e.g.
+  `official_sale_2025-06.txt`; an undated file falls back to `--date` or
+  its modification date
+- `OfficialStore` caches each parsed table as `<sha1 of the file>.csv` in
+  `data/cache/official`, so an unchanged snapshot is never re-parsed, and
+  writes `official_{sale,rent}_history.csv` (snapshot, district, numeric
+  columns; "-" -> empty) sorted by snapshot
+- `read_history` / `as_of` / `yields` query the history: a date range, the
+  latest table per district at a date (same columns as the flat CSVs, so
+  `risk_yield.merge_metrics` accepts it), or yields per snapshot date (each
+  sale snapshot paired with the latest rent snapshot on or before it)
+
+Usage:
+  python -m src.processing.official                          # ingest data/official/official_*.txt
+  python -m src.processing.official --date 2025-11-01 --flat  # also rewrite the *_flat_final.csv of the latest snapshot
+  python -m src.processing.official --yields --start 2025-01-01
+  python -m src.processing.official --kind sale --flat        # what imot_cleaner_sales.py used to do
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import hashlib
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+import pandas as pd
+
+OFFICIAL_DIR = "data/official"
+CACHE_DIR = "data/cache/official"
+KINDS = ("sale", "rent")
+COLUMNS = {
+    "sale": ["district", "price_1", "ppm2_1", "price_2", "ppm2_2", "price_3", "ppm2_3", "ppm2_all"],
+    "rent": ["district", "rent_1", "rent_ppm2_1", "rent_2", "rent_ppm2_2", "rent_3", "rent_ppm2_3", "rent_ppm2_all"],
+}
+PPM2_ALL = {"sale": "ppm2_all", "rent": "rent_ppm2_all"}
+HEADER_TOKENS = ("Едностайни", "Двустайни", "Тристайни", "Район", "Цена", "€/кв.м", "Общо")
+_DATE_RE = re.compile(r"(\d{4})-(\d{2})(?:-(\d{2}))?")
+_DIGITS_RE = re.compile(r"\d+")
+
+def _value(cell: str, kind: str) -> str | None:
+    """Sale: the digit groups joined ("182 298" -> "182298"); rent: the first number, "," -> "."."""
+    if kind == "sale":
+        return "".join(_DIGITS_RE.findall(cell)) or None
+    return next((tok.replace(",", ".") for tok in cell.split() if any(ch.isdigit() for ch in tok)), None)
+
+def parse_official(text: str, kind: str) -> pd.DataFrame:
+    """Rows of one pasted official table: district, three (price, per-m2) pairs, overall per-m2; "-" if missing.
+
+    Each district is its name followed by six lines; the last holds the
+    3-room per-m2 value and the overall one, separated by a tab.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    lines = [line for line in lines if not any(token in line for token in HEADER_TOKENS)]
+    records = []
+    for i in range(0, len(lines), 7):
+        vals = ["-"] * 7
+        for idx, line in enumerate(lines[i + 1:i + 7]):
+            cells = [_value(cell, kind) or "-" for cell in line.split("\t") if cell.strip()]
+            if not cells:
+                continue
+            if idx < 5:
+                vals[idx] = cells[0]
+            else:  # "-\t2 233": no 3-room figure, overall 2233
+                vals[5] = cells[0]
+                vals[6] = cells[1] if len(cells) > 1 else cells[0]
+        records.append([lines[i], *vals])
+    return pd.DataFrame(records, columns=COLUMNS[kind], dtype=object)
+
+class Snapshot(NamedTuple):
+    kind: str
+    date: date
+    path: Path
+    sha1: str
+
+def snapshot_date(path: str | Path, default: date | None = None) -> date:
+    """Date in the file name (YYYY-MM-DD or YYYY-MM), else `default`, else the modification date."""
+    match = _DATE_RE.search(Path(path).name)
+    if match:
+        year, month, day = match.groups()
+        return date(int(year), int(month), int(day or 1))
+    if default is not None:
+        return default
+    print(f"[warn] {path}: no date in the name; using its modification date")
+    return datetime.fromtimestamp(Path(path).stat().st_mtime).date()
+
+def discover(directory: str | Path = OFFICIAL_DIR, default_date: date | None = None,
+             kinds: Iterable[str] = KINDS) -> list[Snapshot]:
+    """All `official_{sale,rent}*.txt` snapshots under `directory`, by kind and date."""
+    snapshots = []
+    for kind in kinds:
+        for path in sorted(Path(directory).rglob(f"official_{kind}*.txt")):
+            digest = hashlib.sha1(path.read_bytes()).hexdigest()
+            snapshots.append(Snapshot(kind, snapshot_date(path, default_date), path, digest))
+    dates = [(s.kind, s.date) for s in snapshots]
+    if len(set(dates)) != len(dates):
+        raise ValueError(f"two {directory} snapshots share a kind and date: {sorted(dates)}")
+    return sorted(snapshots, key=lambda s: (s.kind, s.date))
+
+def _numeric(table: pd.DataFrame) -> pd.DataFrame:
+    out = table.copy()
+    for col in out.columns[1:]:
+        out[col] = pd.to_numeric(out[col], errors="coerce")
+    return out
+
+class OfficialStore:
+    """Parses snapshots once (cache keyed by file SHA-1) and maintains the per-kind history CSVs."""
+
+    def __init__(self, cache_dir: str | Path = CACHE_DIR, history_dir: str | Path = OFFICIAL_DIR) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.history_dir = Path(history_dir)
+        self.parsed_count = 0
+
+    def parsed(self, snapshot: Snapshot) -> pd.DataFrame:
+        """Flat table of `snapshot` (strings, as in `*_flat_final.csv`), parsing only on a cache miss."""
+        cached = self.cache_dir / f"{snapshot.kind}_{snapshot.sha1}.csv"
+        if cached.exists():
+            return pd.read_csv(cached, dtype=str, keep_default_na=False)
+        table = parse_official(snapshot.path.read_text(encoding="utf-8"), snapshot.kind)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_suffix(".tmp")
+        table.to_csv(tmp, index=False)
+        tmp.replace(cached)
+        self.parsed_count += 1
+        return table
+
+    def ingest(self, snapshots: Iterable[Snapshot]) -> dict[str, Path]:
+        """Write `official_<kind>_history.csv` from all `snapshots`; return the written paths."""
+        by_kind: dict[str, list[pd.DataFrame]] = {}
+        for snapshot in snapshots:
+            table = _numeric(self.parsed(snapshot))
+            table.insert(0, "snapshot", snapshot.date.isoformat())
+            by_kind.setdefault(snapshot.kind, []).append(table)
+        written = {}
+        for kind, tables in by_kind.items():
+            path = history_path(kind, self.history_dir)
+            history = pd.concat(tables, ignore_index=True).sort_values(["snapshot", "district"], kind="stable")
+            history.to_csv(path, index=False)
+            written[kind] = path
+        return written
+
+def history_path(kind: str, history_dir: str | Path = OFFICIAL_DIR) -> Path:
+    return Path(history_dir) / f"official_{kind}_history.csv"
+
+@functools.lru_cache(maxsize=8)
+def _load_history(path: str, mtime_ns: int) -> pd.DataFrame:
+    history = pd.read_csv(path, dtype={"district": str})
+    history["snapshot"] = pd.to_datetime(history["snapshot"])
+    return history
+
+def read_history(kind: str, start: str | date | None = None, end: str | date | None = None,
+                 history_dir: str | Path = OFFICIAL_DIR) -> pd.DataFrame:
+    """Rows of snapshots dated in [start, end] (either open); the file is read once per change."""
+    path = history_path(kind, history_dir)
+    history = _load_history(str(path), path.stat().st_mtime_ns)
+    mask = pd.Series(True, index=history.index)
+    if start is not None:
+        mask &= history["snapshot"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= history["snapshot"] <= pd.Timestamp(end)
+    return history[mask].copy()
+
+def as_of(kind: str, when: str | date | None = None, history_dir: str | Path = OFFICIAL_DIR) -> pd.DataFrame:
+    """Latest row per district on or before `when` (default: latest), in the flat-table columns."""
+    rows = read_history(kind, end=when, history_dir=history_dir)
+    latest = rows.sort_values("snapshot", kind="stable").drop_duplicates("district", keep="last")
+    return latest.sort_values("district")[COLUMNS[kind]].reset_index(drop=True)
+
+def yields(start: str | date | None = None, end: str | date | None = None,
+           history_dir: str | Path = OFFICIAL_DIR) -> pd.DataFrame:
+    """snapshot, district, sale_ppm2, rent_ppm2, yield_pct for every sale snapshot in [start, end]."""
+    sale = read_history("sale", start, end, history_dir)[["snapshot", "district", PPM2_ALL["sale"]]]
+    rent = read_history("rent", end=end, history_dir=history_dir)[["snapshot", "district", PPM2_ALL["rent"]]]
+    sale = sale.rename(columns={PPM2_ALL["sale"]: "sale_ppm2"}).sort_values("snapshot")
+    rent = rent.rename(columns={"snapshot": "rent_snapshot", PPM2_ALL["rent"]: "rent_ppm2"}).sort_values("rent_snapshot")
+    merged = pd.merge_asof(sale, rent, left_on="snapshot", right_on="rent_snapshot", by="district")
+    merged = merged.dropna(subset=["sale_ppm2", "rent_ppm2"])
+    merged["yield_pct"] = (merged["rent_ppm2"] / merged["sale_ppm2"] * 100).round(2)
+    return merged.sort_values(["snapshot", "district"]).reset_index(drop=True)
+
+def write_flat(kind: str, table: pd.DataFrame, directory: str | Path = OFFICIAL_DIR) -> Path:
+    """`official_<kind>_flat_final.csv` in the layout notebook 04 reads."""
+    out = Path(directory) / f"official_{kind}_flat_final.csv"
+    table[COLUMNS[kind]].to_csv(out, index=False)
+    return out
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Parse official sale/rent snapshots into a dated history")
+    parser.add_argument("--dir", default=OFFICIAL_DIR, help="Where the official_*.txt snapshots are")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Parsed-snapshot cache directory")
+    parser.add_argument("--kind", choices=KINDS, action="append", help="Only these tables (default: both)")
+    parser.add_argument("--date", type=date.fromisoformat, help="Date of snapshots without one in their name")
+    parser.add_argument("--flat", action="store_true", help="Also write *_flat_final.csv from the latest snapshots")
+    parser.add_argument("--yields", action="store_true", help="Print yields per snapshot")
+    parser.add_argument("--start", help="First snapshot date for --yields")
+    parser.add_argument("--end", help="Last snapshot date for --yields")
+    args = parser.parse_args(argv)
+    kinds = args.kind or KINDS
+    snapshots = discover(args.dir, args.date, kinds)
+    if not snapshots:
+        print(f"[warn] no official_*.txt under {args.dir}")
+        return 1
+    store = OfficialStore(args.cache, args.dir)
+    written = store.ingest(snapshots)
+    print(f"[official] {len(snapshots)} snapshots, {store.parsed_count} parsed, "
+          f"{len(snapshots) - store.parsed_count} from cache")
+    for path in written.values():
+        print(f"Saved: {path}")
+    if args.flat:
+        for kind in kinds:
+            latest = [s for s in snapshots if s.kind == kind]
+            if latest:
+                print(f"Saved: {write_flat(kind, store.parsed(latest[-1]), args.dir)}")
+    if args.yields:
+        print(yields(args.start, args.end, args.dir).to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
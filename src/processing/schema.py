@@ -0,0 +1,173 @@
+"""Schema for the processed listings dataset (`data/processed/processed.csv`).
+
+`pd.read_csv` gives string columns for `district`, `heat` and
+`construction_type` and float64/int64 for small integers. `read_processed`
+applies a fixed layout instead:
+- `district`, `heat`, `construction_type` are Categoricals over fixed,
+  sorted vocabularies (districts from `data/reference/sofia_districts.txt`),
+  so codes are stable across files and levels sort the way patsy sorts
+  strings (same reference level in `C(...)` terms)
+- `rooms` and the 0/1 flags are nullable `Int8`, `floor` / `max_floor`
+  `Int16`; a value outside the dtype's range (a scraping outlier) becomes NA
+  with a warning instead of failing the cast
+- prices and areas stay float64 so model estimates are unchanged
+
+Values outside a vocabulary are added as extra categories with a warning
+rather than dropped. `model_frame` turns the nullable ints back into float64
+(patsy cannot handle `pd.NA`) and drops unused categories on just the columns
+a formula needs.
+
+`read_processed` also reads the partitioned Parquet dataset written by
+`storage.write_processed_dataset`.
+
+Usage:
+  df = read_processed("data/processed/processed.csv")
+  df = read_processed("data/parquet/processed", columns=["price_eur", "area_m2", "district"])
+  write_processed(df, "data/processed/processed.csv")
+  python -m src.processing.schema --report data/processed/processed.csv
+"""
+from __future__ import annotations
+
+import argparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+from src.processing.storage import is_dataset, read_dataset
+
+DISTRICTS_PATH = Path(__file__).resolve().parents[2] / "data/reference/sofia_districts.txt"
+HEAT_LEVELS = ("district", "electric", "gas", "other")
+CONSTRUCTION_LEVELS = ("brick", "epk", "other", "panel")
+
+PROCESSED_COLUMNS = [
+    "url",
+    "listing_id",
+    "price_bgn",
+    "price_eur",
+    "area_m2",
+    "rooms",
+    "floor",
+    "max_floor",
+    "is_ground_floor",
+    "is_top_floor",
+    "heat",
+    "construction_type",
+    "newbuild",
+    "district",
+]
+INT_DTYPES = {
+    "rooms": "Int8",
+    "floor": "Int16",
+    "max_floor": "Int16",
+    "is_ground_floor": "Int8",
+    "is_top_floor": "Int8",
+    "newbuild": "Int8",
+}
+SMALL_INT_COLUMNS = tuple(INT_DTYPES)
+FLOAT_COLUMNS = ("price_bgn", "price_eur", "area_m2")
+
+@lru_cache(maxsize=4)
+def district_vocabulary(path: str | Path = DISTRICTS_PATH) -> tuple[str, ...]:
+    """Sorted canonical district names (one per line in `path`)."""
+    with open(path, encoding="utf-8") as f:
+        return tuple(sorted({line.strip() for line in f if line.strip()}))
+
+def category_dtypes() -> dict[str, pd.CategoricalDtype]:
+    return {
+        "district": pd.CategoricalDtype(district_vocabulary()),
+        "heat": pd.CategoricalDtype(HEAT_LEVELS),
+        "construction_type": pd.CategoricalDtype(CONSTRUCTION_LEVELS),
+    }
+
+def _to_category(series: pd.Series, dtype: pd.CategoricalDtype) -> pd.Series:
+    extra = sorted(set(series.dropna().unique()) - set(dtype.categories))
+    if extra:
+        print(f"[warn] {series.name}: {len(extra)} values outside the vocabulary, kept as extra categories: {extra[:5]}")
+        dtype = pd.CategoricalDtype(sorted([*dtype.categories, *extra]))
+    return series.astype(dtype)
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the processed columns present in `df` to the compact layout, in place; returns `df`."""
+    for col, dtype in INT_DTYPES.items():
+        if col in df.columns and df[col].dtype != dtype:
+            values = pd.to_numeric(df[col], errors="coerce").round()
+            bounds = np.iinfo(dtype.lower())
+            outside = (values < bounds.min) | (values > bounds.max)
+            if outside.any():
+                print(f"[warn] {col}: {int(outside.sum())} values outside {dtype} set to NA: "
+                      f"{sorted(values[outside].unique().tolist())[:5]}")
+                values = values.mask(outside)
+            df[col] = values.astype(dtype)
+    for col in FLOAT_COLUMNS:
+        if col in df.columns and df[col].dtype != "float64":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    for col, dtype in category_dtypes().items():
+        if col in df.columns and df[col].dtype != dtype:
+            df[col] = _to_category(df[col], dtype)
+    return df
+
+def read_processed(path: str | Path, columns: Iterable[str] | None = None, filters: Any = None) -> pd.DataFrame:
+    """Load the processed CSV or Parquet dataset (optionally only `columns`) in the compact layout.
+
+    `filters` selects partitions of a dataset (see `storage.read_dataset`).
+    """
+    usecols = list(columns) if columns is not None else None
+    if is_dataset(path):
+        return apply_schema(read_dataset(path, columns=usecols, filters=filters))
+    dtypes = dict(INT_DTYPES)
+    dtypes.update({col: "float64" for col in FLOAT_COLUMNS})
+    df = pd.read_csv(path, usecols=usecols, dtype={k: v for k, v in dtypes.items() if usecols is None or k in usecols})
+    return apply_schema(df)
+
+def write_processed(df: pd.DataFrame, path: str | Path) -> Path:
+    """Write the processed columns of `df` (schema order, compact layout) to CSV."""
+    output = Path(path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    cols = [c for c in PROCESSED_COLUMNS if c in df.columns]
+    apply_schema(df[cols].copy(deep=False)).to_csv(output, index=False)
+    return output
+
+def model_frame(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Model-ready copy of `columns`: nullable ints as float64 (NA -> NaN), unused categories dropped."""
+    out = df[list(columns)].copy(deep=False)
+    for col in out.columns:
+        dtype = out[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            out[col] = out[col].cat.remove_unused_categories()
+        elif pd.api.types.is_extension_array_dtype(dtype) and pd.api.types.is_integer_dtype(dtype):
+            out[col] = out[col].astype("float64")
+    return out
+
+def memory_report(path: str | Path) -> pd.DataFrame:
+    """Per-column deep memory (bytes) of the plain `read_csv` load vs `read_processed`."""
+    legacy = pd.read_csv(path)
+    compact = read_processed(path)
+    report = pd.DataFrame({
+        "legacy_dtype": legacy.dtypes.astype(str),
+        "legacy_bytes": legacy.memory_usage(deep=True, index=False),
+        "compact_dtype": compact.dtypes.astype(str),
+        "compact_bytes": compact.memory_usage(deep=True, index=False),
+    })
+    report.loc["TOTAL"] = ["", report["legacy_bytes"].sum(), "", report["compact_bytes"].sum()]
+    report = report.astype({"legacy_bytes": "int64", "compact_bytes": "int64"})
+    report["ratio"] = (report["compact_bytes"] / report["legacy_bytes"]).round(2)
+    return report
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Processed-dataset schema tools")
+    parser.add_argument("--report", metavar="CSV", default="data/processed/processed.csv",
+                        help="Compare memory of the plain and compact layouts for this CSV")
+    args = parser.parse_args(argv)
+    path = Path(args.report)
+    report = memory_report(path)
+    print(report.to_string())
+    total = report.loc["TOTAL"]
+    print(f"[schema] {path}: {total['legacy_bytes'] / 1e6:.2f} MB -> {total['compact_bytes'] / 1e6:.2f} MB "
+          f"({total['ratio']:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,246 @@
+"""Partitioned Parquet storage for raw and processed listings.
+
+CSV inputs are re-parsed on every load, including the heavy `desc_text`.
+This module keeps the same rows as Hive-partitioned Parquet datasets
+(pyarrow):
+
+  data/parquet/raw/rooms=1/crawl_date=2026-10-16/part-<id>-0.parquet
+  data/parquet/processed/rooms=1/crawl_date=2026-10-16/...
+
+- `read_dataset(root, columns=..., filters=...)` projects columns and prunes
+  partitions, so modeling reads never touch `desc_text`; `iter_batches`
+  streams the same data in bounded chunks
+- `append_raw` / `import_raw_csv` add new files for a crawl batch and never
+  rewrite existing ones; `import_raw_csv` remembers how far each CSV was
+  imported (`_imported.json` in the dataset root), so re-importing a CSV that
+  a crawl keeps appending to only adds the new rows
+- `write_processed_dataset` replaces just the partitions it writes, so a
+  re-run of the cleaning notebook is idempotent
+- raw columns get a fixed Arrow schema (text as strings; `rooms`,
+  `floor_raw`, `max_floor_raw`, `year_raw` numeric, as `read_csv` infers them)
+  so files from different batches always combine
+
+`combine.list_raw_paths` / `combine.load_and_concat` and
+`schema.read_processed` accept these datasets as well as CSVs.
+
+Usage:
+  python -m src.processing.storage import data/raw/sales/raw_room1_pilot.csv --root data/parquet/raw
+  df = read_dataset("data/parquet/raw", columns=["price_raw", "area_raw", "rooms"])
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+RAW_DATASET = Path("data/parquet/raw")
+PROCESSED_DATASET = Path("data/parquet/processed")
+PARTITION_COLUMNS = ("rooms", "crawl_date")
+MANIFEST_NAME = "_imported.json"
+_NUMERIC_RAW_COLUMNS = ("floor_raw", "max_floor_raw", "year_raw")
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Parquet storage needs pyarrow (pip install pyarrow)")
+
+def _partitioning() -> "ds.Partitioning":
+    return ds.partitioning(pa.schema([("rooms", pa.int64()), ("crawl_date", pa.string())]), flavor="hive")
+
+def _crawl_date(value: date | datetime | str | None) -> str:
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+def _raw_table(df: pd.DataFrame) -> "pa.Table":
+    """Arrow table with the fixed raw schema: numerics as float64, everything else as strings."""
+    columns = {}
+    for col in df.columns:
+        if col in PARTITION_COLUMNS:
+            continue
+        if col in _NUMERIC_RAW_COLUMNS:
+            columns[col] = pa.array(pd.to_numeric(df[col], errors="coerce"), type=pa.float64())
+        else:
+            values = df[col].astype("object").where(df[col].notna(), None)
+            columns[col] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    columns["rooms"] = pa.array(pd.to_numeric(df["rooms"], errors="coerce").astype("Int64"), type=pa.int64())
+    columns["crawl_date"] = pa.array(df["crawl_date"].astype(str), type=pa.string())
+    return pa.table(columns)
+
+def _write(table: "pa.Table", root: str | Path, *, replace_partitions: bool, token: str | None = None) -> None:
+    ds.write_dataset(
+        table,
+        str(root),
+        format="parquet",
+        partitioning=_partitioning(),
+        basename_template=f"part-{token or uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="delete_matching" if replace_partitions else "overwrite_or_ignore",
+    )
+
+def append_raw(df: pd.DataFrame, root: str | Path = RAW_DATASET, *,
+               crawl_date: date | datetime | str | None = None) -> int:
+    """Append raw listing rows as new Parquet files (existing files are left as they are).
+
+    Rows without a `crawl_date` column are stamped with `crawl_date` (default:
+    today). Returns the number of rows written.
+    """
+    _require_pyarrow()
+    if df.empty:
+        return 0
+    if "crawl_date" not in df.columns:
+        df = df.assign(crawl_date=_crawl_date(crawl_date))
+    _write(_raw_table(df), root, replace_partitions=False)
+    return len(df)
+
+def _load_manifest(root: Path) -> dict[str, Any]:
+    path = root / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def _save_manifest(root: Path, manifest: dict[str, Any]) -> None:
+    path = root / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+def import_raw_csv(csv_path: str | Path, root: str | Path = RAW_DATASET, *,
+                   crawl_date: date | datetime | str | None = None) -> int:
+    """Append rows added to a raw CSV since its last import; return rows imported.
+
+    Only whole lines up to the size seen at the start are read; the rest waits
+    for the next import. The crawl date defaults to the CSV's modification date.
+    """
+    _require_pyarrow()
+    src, root = Path(csv_path), Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(root)
+    key = str(src.resolve())
+    size = src.stat().st_size
+    offset = manifest.get(key, {}).get("byte_offset", 0)
+    if offset > size:
+        offset = 0
+    if offset == size:
+        return 0
+    with src.open("rb") as f:
+        f.seek(offset)
+        data = f.read(size - offset)  # not past `size`: a crawl may be appending right now
+    end = data.rfind(b"\n") + 1  # leave a torn last line for the next import
+    if not end:
+        return 0
+    if offset:
+        header = pd.read_csv(src, nrows=0).columns.tolist()
+        df = pd.read_csv(io.BytesIO(data[:end]), header=None, names=header, encoding="utf-8")
+    else:
+        df = pd.read_csv(io.BytesIO(data[:end]), encoding="utf-8")
+    when = crawl_date if crawl_date is not None else datetime.fromtimestamp(src.stat().st_mtime)
+    written = append_raw(df, root, crawl_date=when)
+    manifest[key] = {"byte_offset": offset + end, "rows": manifest.get(key, {}).get("rows", 0) + written}
+    _save_manifest(root, manifest)
+    print(f"[storage] imported {written} rows from {src} -> {root}")
+    return written
+
+def write_processed_dataset(df: pd.DataFrame, root: str | Path = PROCESSED_DATASET, *,
+                            crawl_date: date | datetime | str | None = None, append: bool = False,
+                            token: str | None = None) -> Path:
+    """Write processed rows, replacing only the (rooms, crawl_date) partitions present in `df`.
+
+    `append=True` adds files next to the existing ones instead (chunked writers);
+    their names contain `token` (default: a random one), so a writer can find them again.
+    """
+    _require_pyarrow()
+    if "crawl_date" not in df.columns:
+        df = df.assign(crawl_date=_crawl_date(crawl_date))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.set_column(
+        table.schema.get_field_index("rooms"), "rooms",
+        pa.array(pd.to_numeric(df["rooms"], errors="coerce").astype("Int64"), type=pa.int64()),
+    )
+    table = table.set_column(
+        table.schema.get_field_index("crawl_date"), "crawl_date", pa.array(df["crawl_date"].astype(str)),
+    )
+    _write(table, root, replace_partitions=not append, token=token)
+    return Path(root)
+
+def is_dataset(path: str | Path) -> bool:
+    """True when `path` is a directory holding Parquet files."""
+    path = Path(path)
+    return path.is_dir() and next(path.rglob("*.parquet"), None) is not None
+
+def dataset_files(root: str | Path) -> list[Path]:
+    return sorted(Path(root).rglob("*.parquet"))
+
+def _partition_base(paths: Sequence[Path]) -> Path:
+    """Directory above the first `key=value` segment, shared by `paths`."""
+    first = Path(paths[0])
+    base = first.parent
+    while "=" in base.name:
+        base = base.parent
+    return base
+
+def read_dataset(root: str | Path | Sequence[Path], *, columns: Iterable[str] | None = None,
+                 filters: Any = None) -> pd.DataFrame:
+    """Load a partitioned dataset (or a list of its files) with column projection.
+
+    `columns` may include the partition columns; `filters` is a pyarrow
+    expression or a list of (column, op, value) tuples, e.g.
+    `[("rooms", "=", 2), ("crawl_date", ">=", "2026-10-01")]`.
+    """
+    _require_pyarrow()
+    if not isinstance(root, (str, Path)) and not root:
+        return pd.DataFrame(columns=list(columns) if columns is not None else None)
+    dataset = _as_dataset(root)
+    if filters is not None and not isinstance(filters, ds.Expression):
+        filters = pq.filters_to_expression(filters)
+    cols = None
+    if columns is not None:
+        cols = [c for c in columns if c in dataset.schema.names]
+    return dataset.to_table(columns=cols, filter=filters).to_pandas()
+
+def _as_dataset(source: str | Path | Sequence[Path]) -> "ds.Dataset":
+    if isinstance(source, (str, Path)):
+        return ds.dataset(str(source), format="parquet", partitioning=_partitioning())
+    paths = [Path(p) for p in source]
+    return ds.dataset([str(p) for p in paths], format="parquet", partitioning=_partitioning(),
+                      partition_base_dir=str(_partition_base(paths)))
+
+def iter_batches(source: str | Path | Sequence[Path], *, columns: Iterable[str] | None = None,
+                 batch_size: int = 50_000) -> Iterator[pd.DataFrame]:
+    """Stream a dataset (or a list of its files) as DataFrames of at most `batch_size` rows."""
+    _require_pyarrow()
+    if not isinstance(source, (str, Path)) and not source:
+        return
+    dataset = _as_dataset(source)
+    cols = [c for c in columns if c in dataset.schema.names] if columns is not None else None
+    for batch in dataset.to_batches(columns=cols, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Parquet storage for raw listings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Append new rows of raw CSVs to the dataset")
+    imp.add_argument("csv", nargs="+", help="Raw CSV files")
+    imp.add_argument("--root", default=str(RAW_DATASET), help="Dataset directory")
+    imp.add_argument("--crawl-date", default=None, help="Crawl date (YYYY-MM-DD); default: file date")
+    args = parser.parse_args(argv)
+    total = sum(import_raw_csv(p, args.root, crawl_date=args.crawl_date) for p in args.csv)
+    print(f"[storage] {total} rows imported into {args.root}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
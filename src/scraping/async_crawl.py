@@ -0,0 +1,303 @@
+"""Concurrent (asyncio) crawl mode for one imot.bg room category.
+
+Same contract as `pipeline.crawl_room_category`, but detail pages are fetched
+by a pool of workers instead of one at a time:
+- a single page walker fetches result pages and pushes listing cards into a
+  bounded queue (it blocks when the workers fall behind)
+- `workers` detail fetchers consume the queue; at most `per_host` requests are
+  in flight against any one host
+- fetched HTML goes through a second bounded queue to the parse stage, which
+  runs the parsers in a process pool when `parse_workers` is set; a full
+  parse queue blocks the fetchers, so raw HTML never piles up in memory
+- parsed rows go to one shared `RawWriter` (batched, journaled appends), and
+  listings already in the shared seen index are skipped, so an interrupted
+  crawl resumes where it stopped
+
+`requests` stays the HTTP client; blocking calls run in worker threads via
+`asyncio.to_thread`, so the event loop only coordinates.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+import requests
+
+from src.scraping.pipeline import (
+    _category_base_url,
+    _conditional_get,
+    _crawl_writer,
+    _dead_letter_cards,
+    _decode_html,
+    _no_progress,
+    _open_seen_index,
+    _response_validators,
+    _result_page_url,
+    _select_cards,
+    _session,
+    fetch_listing_detail_conditional,
+)
+from src.scraping.http_cache import HttpCache
+from src.scraping.http_client import DeadLetters, default_dead_letters_path
+from src.scraping.parse_pool import default_parse_workers, extract_cards_job, parse_detail_job, save_page
+from src.scraping.seen_index import SeenIndex
+from src.workflow import metrics
+
+_DONE = None
+
+class HostLimiter:
+    """Cap the number of concurrent requests per host."""
+
+    def __init__(self, per_host: int) -> None:
+        self.per_host = max(1, per_host)
+        self._sems: dict[str, asyncio.Semaphore] = {}
+
+    def for_url(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = self._sems.get(host)
+        if sem is None:
+            sem = self._sems[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+def _pooled_session(pool_size: int, http_cache: HttpCache | None = None) -> requests.Session:
+    return _session(http_cache, pool_size=pool_size)
+
+def _fetch_result_page(url: str, ses: requests.Session,
+                       validators: dict[str, str] | None = None) -> tuple[requests.Response, str]:
+    resp = _conditional_get(ses, url, validators, page_type="results")
+    html = "" if resp.status_code == 304 else _decode_html(resp, page_type="results")
+    return resp, html
+
+async def _run_cpu(executor: Executor | None, fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a parse job in the process pool, or in a thread when no pool is configured."""
+    if executor is None:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+async def _walk_result_pages(rooms: int, base_url: str, queue: asyncio.Queue, *, ses: requests.Session,
+                             limiter: HostLimiter, index: SeenIndex, claimed: set[str],
+                             max_pages: int | None, delay_seconds: float,
+                             executor: Executor | None = None, delta: bool = False,
+                             stop_after_known_pages: int = 3,
+                             page_validators: dict[str, dict[str, str | None]] | None = None,
+                             progress: Callable[[str], None] = _no_progress) -> int:
+    """Push cards to fetch into `queue` page by page; return the number of pages walked.
+
+    Stops at `max_pages`, on a 404 past page 1 (imot.bg's answer past the
+    last page), on a page without listing cards, or in delta mode after
+    `stop_after_known_pages` pages with nothing to fetch. Any other result
+    page failure is raised, as in `iter_result_pages`, so the category is
+    reported failed.
+    Delta mode fetches result pages conditionally and collects their
+    validators in `page_validators`; the caller stores them once every queued
+    card has been processed.
+    """
+    page_num = 0
+    known_pages = 0
+    while max_pages is None or page_num < max_pages:
+        page_num += 1
+        url = _result_page_url(base_url, page_num)
+        validators = index.page_validators(url) if delta else None
+        try:
+            async with limiter.for_url(url):
+                resp, page_html = await asyncio.to_thread(_fetch_result_page, url, ses, validators)
+            cards = await _run_cpu(executor, extract_cards_job, page_html) if page_html else []
+        except requests.HTTPError as exc:
+            if page_num > 1 and exc.response is not None and exc.response.status_code == 404:
+                print(f"[rooms={rooms}] {url} not found; last page reached")
+                return page_num - 1
+            metrics.inc("errors_total", stage="results", error=type(exc).__name__)
+            raise
+        except Exception as exc:
+            metrics.inc("errors_total", stage="results", error=type(exc).__name__)
+            raise
+        print(f"[rooms={rooms}] GET {url} status={resp.status_code} bytes={len(resp.content)}")
+        progress("page")
+        if page_validators is not None and resp.status_code != 304:
+            page_validators[url] = _response_validators(resp)
+        await asyncio.to_thread(index.touch, cards)
+        todo = await asyncio.to_thread(_select_cards, cards, index, claimed, delta=delta)
+        print(f"[rooms={rooms}] page {page_num} cards found: {len(cards)} to fetch: {len(todo)}")
+        if not cards and resp.status_code != 304:
+            return page_num
+        if delta:
+            known_pages = known_pages + 1 if not todo else 0
+            if known_pages >= stop_after_known_pages:
+                print(f"[rooms={rooms}] {known_pages} consecutive known pages; stopping delta crawl")
+                return page_num
+        for card in todo:
+            claimed.add(card["url"])
+            await queue.put(card)
+        if delay_seconds:
+            await asyncio.sleep(delay_seconds)
+            metrics.inc("sleep_seconds_total", delay_seconds)
+    return page_num
+
+async def crawl_room_category_async(
+    rooms: int,
+    *,
+    output_path: str,
+    workers: int = 8,
+    per_host: int = 4,
+    queue_size: int = 64,
+    parse_workers: int | None = 0,
+    parse_queue_size: int | None = None,
+    save_html_dir: str | None = None,
+    batch_size: int = 20,
+    durability: str = "flush",
+    index_path: str | None = None,
+    delta: bool = False,
+    stop_after_known_pages: int = 3,
+    http_cache: HttpCache | None = None,
+    delay_seconds: float = 0.0,
+    max_pages: int | None = None,
+    log_every: int = 10,
+    base_url: str | None = None,
+    session: requests.Session | None = None,
+    progress: Callable[[str], None] | None = None,
+    dead_letters_path: str | None = None,
+) -> int:
+    """Crawl one room category concurrently; return the number of new rows written.
+
+    `workers` detail fetchers share one session; `per_host` caps in-flight
+    requests per host and `queue_size` bounds the cards buffered between the
+    page walker and the fetchers. `parse_workers` > 0 parses in that many
+    processes (None = one per core, 0 = threads in this process);
+    `parse_queue_size` bounds fetched-but-unparsed pages (default
+    2 x parse workers). `save_html_dir` keeps each detail page on disk for
+    `parse_pool.reparse_directory`. Rows are written in batches of
+    `batch_size` with the given `durability` (see `RawWriter`) and recorded
+    in the seen index at `index_path` (default next to the output).
+    `delta` / `stop_after_known_pages` / `http_cache` work as in
+    `crawl_room_category`. `delay_seconds` is applied per fetcher after each
+    detail page (0 disables pacing; ignored when replaying from the cache).
+    `session`, `progress` and `dead_letters_path` work as in
+    `crawl_room_category`: dead-lettered listings are queued before the
+    first result page.
+    """
+    if http_cache is not None and http_cache.replay:
+        delay_seconds = 0.0
+    base_url = _category_base_url(rooms, base_url)
+    index = _open_seen_index(output_path, index_path, rooms=rooms)
+    writer = _crawl_writer(output_path, index, rooms=rooms, batch_size=batch_size, durability=durability)
+    claimed: set[str] = set()
+    ses = session or _pooled_session(workers, http_cache)
+    progress = progress or _no_progress
+    dead_letters = DeadLetters(dead_letters_path or default_dead_letters_path(output_path))
+    dead_urls = dead_letters.unresolved(output_path)  # only these need a "resolved" line on success
+    limiter = HostLimiter(per_host)
+    if parse_workers is None:
+        parse_workers = default_parse_workers()
+    parse_slots = max(parse_workers, 1)
+    executor = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+    card_queue: asyncio.Queue = asyncio.Queue(maxsize=max(queue_size, 1))
+    parse_queue: asyncio.Queue = asyncio.Queue(maxsize=max(parse_queue_size or 2 * parse_slots, 1))
+    page_validators: dict[str, dict[str, str | None]] = {}
+    processed = 0
+    unchanged = 0
+
+    async def fetch_worker() -> None:
+        nonlocal unchanged
+        while True:
+            card = await card_queue.get()
+            try:
+                if card is _DONE:
+                    return
+                url = card["url"]
+                try:
+                    async with limiter.for_url(url):
+                        raw_detail, validators = await asyncio.to_thread(
+                            fetch_listing_detail_conditional, url, session=ses,
+                            validators=card.pop("validators", None),
+                        )
+                    if raw_detail is None:
+                        index.mark_seen([{"listing_id": card.get("listing_id"), "url": url,
+                                          "card_price_raw": card.get("price_raw")}])
+                        if url in dead_urls:
+                            await asyncio.to_thread(dead_letters.resolve, url, output_path=output_path)
+                        unchanged += 1
+                        metrics.inc("listings_skipped_total", reason="unchanged")
+                        continue
+                    if save_html_dir:
+                        await asyncio.to_thread(save_page, save_html_dir, rooms, url, raw_detail)
+                    await parse_queue.put(({**card, **validators}, raw_detail))
+                except Exception as exc:
+                    progress("error")
+                    metrics.inc("errors_total", stage="detail", error=type(exc).__name__)
+                    await asyncio.to_thread(dead_letters.add, card, output_path=output_path,
+                                            reason=f"{type(exc).__name__}: {exc}")
+                    dead_urls.add(url)
+                    print(f"[warn] Failed to process {url}: {exc}")
+                if delay_seconds:
+                    await asyncio.sleep(delay_seconds)
+                    metrics.inc("sleep_seconds_total", delay_seconds)
+            finally:
+                card_queue.task_done()
+
+    async def parse_worker() -> None:
+        nonlocal processed
+        while True:
+            item = await parse_queue.get()
+            try:
+                if item is _DONE:
+                    return
+                card, raw_detail = item
+                try:
+                    row = await _run_cpu(executor, parse_detail_job, raw_detail, rooms, card)
+                    writer.append(row)
+                    if card["url"] in dead_urls:
+                        await asyncio.to_thread(dead_letters.resolve, card["url"], output_path=output_path)
+                    processed += 1
+                    progress("listing")
+                    if processed % log_every == 0:
+                        print(f"[rooms={rooms}] processed {processed} listings so far")
+                except Exception as exc:
+                    progress("error")
+                    metrics.inc("errors_total", stage="parse", error=type(exc).__name__)
+                    await asyncio.to_thread(dead_letters.add, card, output_path=output_path,
+                                            reason=f"{type(exc).__name__}: {exc}")
+                    dead_urls.add(card["url"])
+                    print(f"[warn] Failed to parse {card['url']}: {exc}")
+            finally:
+                parse_queue.task_done()
+
+    fetchers = [asyncio.create_task(fetch_worker()) for _ in range(max(workers, 1))]
+    parsers = [asyncio.create_task(parse_worker()) for _ in range(parse_slots)]
+    try:
+        retry = await asyncio.to_thread(_dead_letter_cards, dead_letters, output_path, index, claimed, delta=delta)
+        if retry:
+            print(f"[rooms={rooms}] retrying {len(retry)} dead-lettered listings first")
+        for card in retry:
+            claimed.add(card["url"])
+            await card_queue.put(card)
+        await _walk_result_pages(rooms, base_url, card_queue, ses=ses, limiter=limiter, index=index,
+                                 claimed=claimed, max_pages=max_pages, delay_seconds=delay_seconds,
+                                 executor=executor, delta=delta, stop_after_known_pages=stop_after_known_pages,
+                                 page_validators=page_validators if delta else None, progress=progress)
+        for _ in fetchers:
+            await card_queue.put(_DONE)
+        await asyncio.gather(*fetchers)
+        for _ in parsers:
+            await parse_queue.put(_DONE)
+        await asyncio.gather(*parsers)
+        writer.flush()
+        for url, validators in page_validators.items():
+            index.set_page_validators(url, validators)
+        await asyncio.to_thread(dead_letters.compact)
+    finally:
+        for task in fetchers + parsers:
+            task.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+        index.close()
+    print(f"[rooms={rooms}] done. new listings processed: {processed}"
+          + (f", unchanged (304): {unchanged}" if unchanged else ""))
+    return processed
+
+def crawl_room_category_concurrent(rooms: int, **kwargs: Any) -> int:
+    """Blocking wrapper around `crawl_room_category_async` for scripts and notebooks."""
+    with metrics.labels(rooms=rooms):  # copied into the event loop's tasks and to_thread calls
+        return asyncio.run(crawl_room_category_async(rooms, **kwargs))
@@ -0,0 +1,124 @@
+"""Fast charset resolution for scraped HTML.
+
+imot.bg serves windows-1251 pages, sometimes without a usable HTTP charset.
+Decoding the whole body under several encodings and counting Cyrillic
+characters (plus chardet via `apparent_encoding`) costs more than parsing a
+200-400 KB page, so the decoder resolves an encoding in this order:
+1. `charset=` from the HTTP Content-Type header
+2. `<meta charset>` / `http-equiv` declaration in the first few KB
+3. the encoding previously detected for the same (host, page type)
+4. byte-level sniffing of a bounded sample: valid UTF-8 with multi-byte
+   sequences wins, otherwise cp1251
+
+Only step 4 inspects content. Its result is cached per host and page type,
+and later pages check the cached encoding against the first `CHECK_BYTES` of
+their sample instead of sniffing the whole sample: cp1251 text fails a
+strict UTF-8 decode within its first few bytes, so a cached utf-8 stands
+while that prefix is valid UTF-8 and a cached cp1251 while it is not. A page
+the cached encoding does not fit is sniffed again and replaces the entry (a
+stale utf-8 entry would otherwise drop every Cyrillic byte of a cp1251
+page). A pure-ASCII body (an error page, a 404) says nothing about the
+site's encoding and is never cached.
+"""
+from __future__ import annotations
+
+import codecs
+import re
+import threading
+
+META_SCAN_BYTES = 4096
+SAMPLE_BYTES = 16384
+CHECK_BYTES = 256
+FALLBACK_ENCODING = "cp1251"
+
+_HTTP_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+?charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+_HIGH_BYTE_RE = re.compile(rb"[\x80-\xff]")
+
+_cache: dict[tuple[str, str], str] = {}
+_cache_lock = threading.Lock()
+
+def normalize_encoding(label: str | bytes | None) -> str | None:
+    """Return the canonical codec name for `label`, or None if Python does not know it."""
+    if not label:
+        return None
+    if isinstance(label, bytes):
+        label = label.decode("ascii", errors="ignore")
+    try:
+        return codecs.lookup(label.strip()).name
+    except LookupError:
+        return None
+
+def http_charset(content_type: str | None) -> str | None:
+    """Charset parameter of a Content-Type header value (None when absent or unknown)."""
+    if not content_type:
+        return None
+    match = _HTTP_CHARSET_RE.search(content_type)
+    return normalize_encoding(match.group(1)) if match else None
+
+def meta_charset(content: bytes) -> str | None:
+    """Charset declared by a `<meta>` tag near the top of the document."""
+    match = _META_CHARSET_RE.search(content, 0, META_SCAN_BYTES)
+    return normalize_encoding(match.group(1)) if match else None
+
+def _sample(content: bytes, sample_bytes: int = SAMPLE_BYTES) -> bytes | None:
+    """Bounded sample starting at the first non-ASCII byte; None for pure-ASCII content."""
+    first_high = _HIGH_BYTE_RE.search(content)
+    if first_high is None:
+        return None
+    return content[first_high.start():first_high.start() + sample_bytes]
+
+def _decodes(sample: bytes, encoding: str) -> bool:
+    """Whether `sample` decodes strictly under `encoding` (a multi-byte sequence may be cut at the end)."""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def sniff_encoding(content: bytes, *, sample_bytes: int = SAMPLE_BYTES) -> str:
+    """Guess utf-8 vs cp1251 from a bounded sample starting at the first non-ASCII byte.
+
+    Cyrillic cp1251 text is practically never valid UTF-8, so a sample that
+    decodes cleanly as UTF-8 picks utf-8; anything else falls back to cp1251.
+    Pure-ASCII content is reported as utf-8.
+    """
+    sample = _sample(content, sample_bytes)
+    if sample is None:
+        return "utf-8"
+    return "utf-8" if _decodes(sample, "utf-8") else FALLBACK_ENCODING
+
+def resolve_encoding(content: bytes, *, content_type: str | None = None,
+                     cache_key: tuple[str, str] | None = None) -> str:
+    """Pick the encoding for `content` (see module docstring for the order)."""
+    declared = http_charset(content_type) or meta_charset(content)
+    if declared:
+        return declared
+    sample = _sample(content)
+    if sample is None:
+        return _cache.get(cache_key, "utf-8") if cache_key is not None else "utf-8"  # ASCII decodes either way
+    cached = _cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        # cp1251 accepts almost any bytes, so it only stands while the prefix is not UTF-8
+        prefix = sample[:CHECK_BYTES]
+        if _decodes(prefix, "utf-8"):
+            if cached == "utf-8":
+                return cached
+        elif cached != "utf-8" and _decodes(prefix, cached):
+            return cached
+    enc = "utf-8" if _decodes(sample, "utf-8") else FALLBACK_ENCODING
+    if cache_key is not None:
+        with _cache_lock:
+            _cache[cache_key] = enc
+    return enc
+
+def decode_bytes(content: bytes, *, content_type: str | None = None,
+                 cache_key: tuple[str, str] | None = None) -> str:
+    """Decode an HTML body using `resolve_encoding` (undecodable bytes are dropped)."""
+    enc = resolve_encoding(content, content_type=content_type, cache_key=cache_key)
+    return content.decode(enc, errors="ignore")
+
+def clear_encoding_cache() -> None:
+    """Forget encodings detected so far (e.g. between benchmark runs)."""
+    with _cache_lock:
+        _cache.clear()
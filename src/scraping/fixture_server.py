@@ -0,0 +1,206 @@
+"""Local stand-in for imot.bg built from raw listing rows.
+
+Renders result pages and detail pages in the DOM shape the parsers expect
+(`ads2023` cards, `contactsBox` heading/price, `adParams` boxes, `borderBox`
+description) and serves them from a local HTTP server. Point a crawl at
+`base_url_for(rooms)` to exercise fetching, parsing and resume logic without
+touching the live site.
+
+Usage:
+  rows = pd.read_csv("data/raw/sales/raw_room1_pilot.csv").to_dict("records")
+  with FixtureServer({1: rows}, page_size=20) as srv:
+      crawl_room_category(1, output_path="/tmp/out.csv", base_url=srv.base_url_for(1), delay_seconds=0)
+"""
+from __future__ import annotations
+
+import hashlib
+import html
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterable, Mapping
+from urllib.parse import urlsplit
+
+ROOM_SLUGS: dict[int, str] = {1: "ednostaen", 2: "dvustaen", 3: "tristaen"}
+ROOM_LABELS: dict[int, str] = {1: "1-СТАЕН", 2: "2-СТАЕН", 3: "3-СТАЕН"}
+
+def _esc(val: Any) -> str:
+    if val is None or (isinstance(val, float) and val != val):
+        return ""
+    if isinstance(val, float) and val.is_integer():
+        val = int(val)
+    return html.escape(str(val), quote=True)
+
+def _detail_path(row: Mapping[str, Any]) -> str:
+    return urlsplit(str(row["url"])).path
+
+def render_results_page(rows: Iterable[Mapping[str, Any]], *, rooms: int, host_url: str,
+                        next_url: str | None = None) -> str:
+    """Render one search-results page with an `ads2023` card per row."""
+    items = []
+    for row in rows:
+        href = f"{host_url}{_detail_path(row)}"
+        items.append(
+            f'<div class="item TOP" id="{_esc(row.get("listing_id"))}">'
+            f'<div class="photo"><a href="{href}"><img src="/img.jpg"></a></div>'
+            f'<div class="text"><div class="zaglavie">'
+            f'<a class="title" href="{href}">Продава {ROOM_LABELS.get(rooms, "")}'
+            f'<location>{_esc(row.get("district_raw"))}</location></a></div>'
+            f'<div class="info">{_esc(row.get("area_raw"))}</div></div>'
+            f'<div class="price"><div>{_esc(row.get("price_raw"))}</div></div>'
+            f"</div>"
+        )
+    link_next = f'<link rel="next" href="{next_url}">' if next_url else ""
+    return (
+        '<!DOCTYPE html><html><head><meta charset="windows-1251">'
+        f"<title>Обяви за продажба</title>{link_next}</head><body>"
+        '<div class="ads2023">' + "".join(items) + "</div></body></html>"
+    )
+
+def render_detail_page(row: Mapping[str, Any]) -> str:
+    """Render a listing detail page that parses back into the given raw row."""
+    rooms = int(row.get("rooms") or 0)
+    listing_id = str(row.get("listing_id") or "")
+    params = [f'<div>Площ: {_esc(row.get("area_raw"))}</div>']
+    if _esc(row.get("floor_raw")):
+        floor = f'{_esc(row.get("floor_raw"))}-ти'
+        if _esc(row.get("max_floor_raw")):
+            floor += f' от {_esc(row.get("max_floor_raw"))}'
+        params.append(f"<div>Етаж: {floor}</div>")
+    cons = " ".join(p for p in (_esc(row.get("construction_raw")), _esc(row.get("year_raw"))) if p)
+    if cons:
+        params.append(f"<div>Строителство: {cons}</div>")
+    heat = str(row.get("heat_raw") or "")
+    for entry in heat.split("; "):
+        if ":" in entry:
+            label, val = entry.split(":", 1)
+            params.append(f"<div>{_esc(label.strip())}: {_esc(val.strip())}</div>")
+    return (
+        '<!DOCTYPE html><html><head><meta charset="windows-1251">'
+        f"<title>Продава {ROOM_LABELS.get(rooms, '')}</title></head><body>"
+        '<div class="ad2023"><div class="left"><div class="gallery"></div></div>'
+        '<div class="right"><div class="sticky"><div class="contactsBox">'
+        f'<div class="obTitle"><h1>Продава {ROOM_LABELS.get(rooms, "")}'
+        f'<div>{_esc(row.get("district_raw"))}</div>'
+        f"<span>Обява: {_esc(listing_id[3:] if listing_id.startswith('ida') else listing_id)}</span></h1></div>"
+        f'<div class="cena Price"><div>{_esc(row.get("price_raw"))}</div></div>'
+        "</div></div></div></div>"
+        '<div class="adParams">' + "".join(params) + "</div>"
+        f'<div class="borderBox">{_esc(row.get("desc_text"))}</div>'
+        "</body></html>"
+    )
+
+class FixtureServer:
+    """Threaded HTTP server serving rendered pages for one or more room categories.
+
+    Result pages live under `/obiavi/prodazhbi/grad-sofiya/<slug>[/p-N]`, detail
+    pages under each row's original URL path. Pages past the last one return 404.
+    Responses are encoded as cp1251 like the live site and carry an ETag, so
+    conditional requests get 304 while a page is unchanged; `fail_paths` can be
+    used to inject errors (path -> HTTP status) and `flaky_paths` transient
+    ones (path -> [status, times]: the first `times` requests fail). Mutate `rows_by_rooms` (and
+    call `reindex()`) to simulate new or re-priced listings.
+    """
+
+    def __init__(self, rows_by_rooms: Mapping[int, list[Mapping[str, Any]]], *, page_size: int = 20,
+                 encoding: str = "cp1251", declare_charset: bool = False,
+                 host: str = "127.0.0.1", port: int = 0) -> None:
+        self.rows_by_rooms = {r: list(rows) for r, rows in rows_by_rooms.items()}
+        self.page_size = page_size
+        self.encoding = encoding
+        self.declare_charset = declare_charset
+        self.fail_paths: dict[str, int] = {}
+        self.flaky_paths: dict[str, list[int]] = {}
+        self.hits: dict[str, int] = {}
+        self.reindex()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    def reindex(self) -> None:
+        """Rebuild the detail-page lookup after `rows_by_rooms` was changed."""
+        self._details = {
+            _detail_path(row): row for rows in self.rows_by_rooms.values() for row in rows
+        }
+
+    @property
+    def host_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_url_for(self, rooms: int) -> str:
+        return f"{self.host_url}/obiavi/prodazhbi/grad-sofiya/{ROOM_SLUGS.get(rooms, f'room{rooms}')}"
+
+    def _render(self, path: str) -> str | None:
+        for rooms, rows in self.rows_by_rooms.items():
+            base = urlsplit(self.base_url_for(rooms)).path
+            if path == base:
+                page_num = 1
+            elif path.startswith(f"{base}/p-") and path[len(base) + 3:].isdigit():
+                page_num = int(path[len(base) + 3:])
+            else:
+                continue
+            start = (page_num - 1) * self.page_size
+            if page_num < 1 or (start >= len(rows) and page_num > 1):
+                return None
+            has_next = start + self.page_size < len(rows)
+            next_url = f"{self.base_url_for(rooms)}/p-{page_num + 1}" if has_next else None
+            return render_results_page(rows[start:start + self.page_size], rooms=rooms,
+                                       host_url=self.host_url, next_url=next_url)
+        row = self._details.get(path)
+        return render_detail_page(row) if row is not None else None
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                path = urlsplit(self.path).path
+                with server._lock:
+                    server.hits[path] = server.hits.get(path, 0) + 1
+                with server._lock:
+                    status = server.fail_paths.get(path)
+                    flaky = server.flaky_paths.get(path)
+                    if not status and flaky and flaky[1] > 0:
+                        status, flaky[1] = flaky[0], flaky[1] - 1
+                body = None if status else server._render(path)
+                if body is None:
+                    self.send_response(status or 404)
+                    self.end_headers()
+                    return
+                payload = body.encode(server.encoding, errors="replace")
+                etag = '"' + hashlib.sha1(payload).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                ctype = "text/html"
+                if server.declare_charset:
+                    ctype += f"; charset={server.encoding}"
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
@@ -0,0 +1,178 @@
+"""HTML parser backends for the imot.bg extractors.
+
+The extractors in `pipeline` only use a small part of the BeautifulSoup API:
+`find`, `find_all`, `select_one`, `get`, `[...]` and `get_text`. `parse_html`
+returns a tree that supports that subset from one of two backends:
+- "bs4": BeautifulSoup with "html.parser" (pure Python, the original behaviour)
+- "lxml": libxml2 via `lxml.html`, wrapped in `LxmlNode`, several times faster
+
+`LxmlNode` reproduces BeautifulSoup's matching rules for the calls above
+(class/rel matching per token or on the full attribute, text from strings
+only, skipping comments, scripts, styles and templates), so both backends produce
+identical rows. The default is lxml when it is installed.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any, Iterator
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:  # pragma: no cover - optional dependency
+    lxml = None
+
+BACKENDS = ("bs4", "lxml")
+DEFAULT_BACKEND = "lxml" if lxml is not None else "bs4"
+
+_SKIP_TEXT_TAGS = frozenset({"script", "style", "template"})
+_MULTI_VALUED_ATTRS = frozenset({"class", "rel", "rev", "accept-charset", "headers", "accesskey"})
+_CSS_TOKEN_RE = re.compile(r"\s*(>)\s*|\s+|([^\s>]+)")
+_CSS_COMPOUND_RE = re.compile(r"([a-zA-Z][\w-]*|\*)|([.#][\w-]+)|\[([\w-]+)\]")
+
+def _matches_value(actual: str | None, expected: Any, multi_valued: bool) -> bool:
+    if expected is True:
+        return actual is not None
+    if actual is None:
+        return False
+    values = actual.split() if multi_valued else [actual]
+    if isinstance(expected, re.Pattern):
+        return any(expected.search(v) for v in values) or (
+            multi_valued and expected.search(actual) is not None
+        )
+    return expected in values or actual == expected
+
+def _css_to_xpath(selector: str) -> str:
+    """Translate descendant/child chains of `tag.class#id[attr]` compounds to XPath."""
+    steps: list[str] = []
+    axis = ".//"
+    for combinator, compound in (m.groups() for m in _CSS_TOKEN_RE.finditer(selector.strip())):
+        if combinator:
+            axis = "/"
+            continue
+        if not compound:
+            continue
+        tag = "*"
+        preds: list[str] = []
+        pos = 0
+        while pos < len(compound):
+            m = _CSS_COMPOUND_RE.match(compound, pos)
+            if not m or m.end() == pos:
+                raise ValueError(f"Unsupported selector for lxml backend: {selector!r}")
+            name, simple, attr = m.groups()
+            if name:
+                tag = name.lower()
+            elif simple and simple[0] == ".":
+                preds.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {simple[1:]} ')")
+            elif simple:
+                preds.append(f"@id='{simple[1:]}'")
+            elif attr:
+                preds.append(f"@{attr}")
+            pos = m.end()
+        steps.append(axis + tag + "".join(f"[{p}]" for p in preds))
+        axis = "//"
+    return "".join(steps)
+
+@lru_cache(maxsize=64)
+def _compiled_selector(selector: str) -> "lxml.etree.XPath":
+    return lxml.etree.XPath(_css_to_xpath(selector))
+
+class LxmlNode:
+    """Minimal BeautifulSoup-compatible view of an `lxml.html` element."""
+
+    __slots__ = ("el",)
+
+    def __init__(self, el: Any) -> None:
+        self.el = el
+
+    @property
+    def name(self) -> str:
+        return self.el.tag
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.el.get(key, default)
+
+    def __getitem__(self, key: str) -> str:
+        val = self.el.get(key)
+        if val is None:
+            raise KeyError(key)
+        return val
+
+    def __bool__(self) -> bool:
+        return True
+
+    def _candidates(self, name: str | None, recursive: bool) -> Iterator[Any]:
+        if recursive:
+            return self.el.iterdescendants(name) if name else self.el.iterdescendants()
+        return self.el.iterchildren(name) if name else self.el.iterchildren()
+
+    def _matching(self, name: str | None, attrs: dict[str, Any], recursive: bool) -> Iterator["LxmlNode"]:
+        for el in self._candidates(name, recursive):
+            if not isinstance(el.tag, str):
+                continue
+            if all(_matches_value(el.get(k), v, k in _MULTI_VALUED_ATTRS) for k, v in attrs.items()):
+                yield LxmlNode(el)
+
+    @staticmethod
+    def _attrs(class_: Any, attrs: dict[str, Any]) -> dict[str, Any]:
+        if class_ is not None:
+            attrs = {**attrs, "class": class_}
+        return attrs
+
+    def find(self, name: str | None = None, class_: Any = None, recursive: bool = True,
+             **attrs: Any) -> "LxmlNode | None":
+        return next(self._matching(name, self._attrs(class_, attrs), recursive), None)
+
+    def find_all(self, name: str | None = None, class_: Any = None, recursive: bool = True,
+                 **attrs: Any) -> list["LxmlNode"]:
+        return list(self._matching(name, self._attrs(class_, attrs), recursive))
+
+    def select_one(self, selector: str) -> "LxmlNode | None":
+        found = _compiled_selector(selector)(self.el)
+        return LxmlNode(found[0]) if found else None
+
+    def _strings(self) -> Iterator[str]:
+        stack: list[tuple[Any, bool]] = [(self.el, False)]
+        while stack:
+            el, tail_only = stack.pop()
+            if tail_only:
+                if el.tail:
+                    yield el.tail
+                continue
+            if el is not self.el:
+                stack.append((el, True))
+            if not isinstance(el.tag, str) or el.tag in _SKIP_TEXT_TAGS:
+                continue
+            if el.text:
+                yield el.text
+            stack.extend((child, False) for child in reversed(el))
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        if strip:
+            return separator.join(s for s in (t.strip() for t in self._strings()) if s)
+        return separator.join(self._strings())
+
+def _lxml_document(html: str) -> LxmlNode:
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    data = html.encode("utf-8")
+    if not data.strip():
+        data = b"<html></html>"
+    return LxmlNode(lxml.html.document_fromstring(data, parser=parser))
+
+def parse_html(html: Any, backend: str | None = None) -> Any:
+    """Parse `html` with the chosen backend; already-parsed trees are returned as is."""
+    if not isinstance(html, (str, bytes)):
+        return html
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="ignore")
+    backend = backend or DEFAULT_BACKEND
+    if backend == "lxml":
+        if lxml is None:
+            raise ImportError("lxml backend requested but lxml is not installed")
+        return _lxml_document(html)
+    if backend == "bs4":
+        return BeautifulSoup(html, "html.parser")
+    raise ValueError(f"Unknown HTML backend {backend!r}; expected one of {BACKENDS}")
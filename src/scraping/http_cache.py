@@ -0,0 +1,254 @@
+"""Content-addressed, compressed on-disk cache of HTTP responses.
+
+Raw HTML used to be thrown away after parsing, so every selector change in
+`parse_listing_detail` meant a re-scrape. `HttpCache` keeps the responses:
+- bodies are stored once per content hash (`blobs/ab/<sha256>.gz`, gzip), so
+  identical pages served under several URLs cost one file
+- `responses.sqlite` maps each GET URL to its status, a few headers
+  (Content-Type, ETag, Last-Modified), body hash and fetch/access times
+- `ttl_seconds` limits how long an entry is served while recording (stale
+  entries are re-fetched); `max_bytes` caps the compressed size, evicting the
+  least recently used entries first. `put` compares a running byte total
+  (loaded once, adjusted as bodies are stored and released) with the cap
+  and only queries the blob sizes once it is exceeded; it then evicts down to
+  `EVICT_TO` of the cap, so a full cache does not scan on every store
+- `mode="record"` serves fresh hits and stores misses; `mode="replay"` serves
+  everything from the cache regardless of age and raises `CacheMiss` on a
+  miss, so a crawl runs with zero network
+
+`CachedSession` is a `requests.Session` that goes through the cache; pass an
+`HttpCache` as `http_cache=` to the crawl functions (or `--cache-dir` /
+`--replay` to `run_scrape`). Only GET responses with status 200/404/410 are
+stored (404 marks the end of pagination). In replay the seen index still
+applies, so replay into a fresh output/index to re-parse everything.
+
+Usage:
+  cache = HttpCache("data/http_cache", ttl_seconds=7 * 86400, max_bytes=2 * 1024**3)
+  crawl_room_category(1, output_path="data/raw/raw_room1.csv", http_cache=cache)
+  replay = HttpCache("data/http_cache", mode="replay")
+  crawl_room_category(1, output_path="/tmp/reparse/raw_room1.csv", http_cache=replay)
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_MODES = ("record", "replay")
+CACHEABLE_STATUSES = frozenset({200, 404, 410})
+EVICT_TO = 0.9  # a full cache evicts down to this share of max_bytes, not one entry per put
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_digest ON responses(digest);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+class CacheMiss(requests.ConnectionError):
+    """Raised in replay mode for a URL that is not in the cache."""
+
+class HttpCache:
+    """On-disk response store (see module docstring). Thread-safe."""
+
+    def __init__(self, cache_dir: str | Path, *, mode: str = "record", ttl_seconds: float | None = None,
+                 max_bytes: int | None = None) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode={mode!r}; expected one of {CACHE_MODES}")
+        self.dir = Path(cache_dir)
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.dir / "responses.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.dir / "blobs" / digest[:2] / f"{digest}.gz"
+
+    def total_bytes(self) -> int:
+        """Compressed size of all stored bodies."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, url: str) -> tuple[int, dict[str, str], bytes] | None:
+        """(status, headers, body) for `url`, or None when missing or (recording) stale."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, digest, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            status, headers, digest, fetched_at = row
+            if not self.replay and self.ttl_seconds is not None and now - fetched_at > self.ttl_seconds:
+                return None
+            try:
+                body = gzip.decompress(self._blob_path(digest).read_bytes())
+            except (OSError, EOFError):
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+        return status, json.loads(headers), body
+
+    def put(self, url: str, status: int, headers: dict[str, str], body: bytes) -> None:
+        """Store a response body under its content hash and point `url` at it."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        now = time.time()
+        with self._lock:
+            known = self._conn.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if known is None or not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                data = gzip.compress(body, compresslevel=6)
+                fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO blobs (digest, size) VALUES (?, ?)", (digest, len(data))
+                )
+                self._bytes += len(data) - (known[0] if known else 0)
+            previous = self._conn.execute("SELECT digest FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, status, headers, digest, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(headers), digest, now, now),
+            )
+            if previous is not None and previous[0] != digest:
+                self._release(previous[0])
+            self._conn.commit()
+            over = self.max_bytes is not None and self._bytes > self.max_bytes
+        if over:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def touch(self, url: str) -> None:
+        """Mark a cached entry as re-validated (the server answered 304)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url)
+            )
+            self._conn.commit()
+
+    def _release(self, digest: str) -> int:
+        """Delete a body once no URL points at it; return the bytes freed."""
+        if self._conn.execute("SELECT 1 FROM responses WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return 0
+        size = self._conn.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        self._conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        self._blob_path(digest).unlink(missing_ok=True)
+        freed = size[0] if size else 0
+        self._bytes -= freed
+        return freed
+
+    def evict(self, max_bytes: int) -> int:
+        """Drop least recently used entries until bodies fit in `max_bytes`; return entries removed.
+
+        Recounts the stored size first, so the running total `put` checks
+        picks up bodies written by other processes sharing the directory.
+        """
+        removed = 0
+        with self._lock:
+            self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if self._bytes > max_bytes:
+                victims = self._conn.execute(
+                    "SELECT url, digest FROM responses ORDER BY accessed_at, fetched_at"
+                ).fetchall()
+                for url, digest in victims:
+                    self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                    removed += 1
+                    self._release(digest)
+                    if self._bytes <= max_bytes:
+                        break
+                self._conn.commit()
+        if removed:
+            print(f"[cache] evicted {removed} entries from {self.dir}")
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "HttpCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+def _cached_response(request: requests.PreparedRequest, status: int, headers: dict[str, str],
+                     body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers = CaseInsensitiveDict(headers)
+    resp.headers["X-Cache"] = "hit"
+    resp._content = body
+    resp.url = request.url or ""
+    resp.request = request
+    resp.reason = HTTPStatus(status).phrase
+    return resp
+
+class CachedSession(requests.Session):
+    """`requests.Session` whose GETs go through an `HttpCache`."""
+
+    def __init__(self, cache: HttpCache) -> None:
+        super().__init__()
+        self.cache = cache
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if request.method != "GET" or not request.url:
+            if self.cache.replay:
+                raise CacheMiss(f"replay mode: refusing {request.method} {request.url}")
+            return super().send(request, **kwargs)
+        cached = self.cache.get(request.url)
+        if cached is not None:
+            self.cache.hits += 1
+            return _cached_response(request, *cached)
+        self.cache.misses += 1
+        if self.cache.replay:
+            raise CacheMiss(f"replay mode: {request.url} is not cached")
+        resp = super().send(request, **kwargs)
+        if resp.status_code == 304:
+            self.cache.touch(request.url)
+        elif resp.status_code in CACHEABLE_STATUSES:
+            headers = {h: resp.headers[h] for h in _KEPT_HEADERS if h in resp.headers}
+            self.cache.put(request.url, resp.status_code, headers, resp.content)
+        return resp
@@ -0,0 +1,314 @@
+"""HTTP layer of the scraper: pooled connections, retry with backoff, adaptive pacing.
+
+`_session` used to be a bare `requests.Session`: default pool size, no retry,
+and a fixed `delay_seconds` sleep as the only pacing, so one transient 5xx
+or timeout lost the listing. Every crawl session now mounts a
+`ThrottledAdapter`:
+- `pool_size` connections per host (sized to the number of fetch workers)
+- `RetryPolicy`: connection errors, timeouts and 429/500/502/503/504 are
+  retried with full-jitter exponential backoff (`uniform(0, min(cap,
+  base * 2**n))`), honouring `Retry-After`; the last response is returned
+  (or the last error raised) once attempts run out, so callers see the same
+  errors as before
+- an optional pacer taking one token per request: `RequestBudget` (fixed
+  requests/second, shared by threads) or `AdaptiveThrottle`, which adds
+  `increase` req/s after each healthy response (latency under target, low
+  recent error rate) and multiplies the rate by `decrease` on 429/5xx or
+  timeouts (AIMD), within [`min_rps`, `max_rps`]
+- `DeadLetters`: listings that still fail are appended to a JSON-lines file
+  (default `dead_letters.jsonl` next to the raw CSVs) and the next crawl of
+  the same output retries them before paging
+
+Responses served by an `HttpCache` never reach the adapter, so cache hits
+are neither retried nor paced.
+
+Usage:
+  ses = _session(pool_size=8, throttle=AdaptiveThrottle(start_rps=2, max_rps=10))
+  crawl_room_category(1, output_path="data/raw/raw_room1.csv", session=ses, delay_seconds=0)
+"""
+from __future__ import annotations
+
+import email.utils
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable
+
+import requests
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEAD_LETTERS_FILENAME = "dead_letters.jsonl"
+
+class RetryPolicy:
+    """How often and how long to wait before re-sending a failed request."""
+
+    def __init__(self, attempts: int = 4, base_seconds: float = 0.5, cap_seconds: float = 30.0,
+                 statuses: Iterable[int] = RETRY_STATUSES, rng: random.Random | None = None) -> None:
+        self.attempts = max(1, attempts)
+        self.base_seconds = base_seconds
+        self.cap_seconds = cap_seconds
+        self.statuses = frozenset(statuses)
+        self._rng = rng or random.Random()
+
+    def backoff(self, retry: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before retry number `retry` (0-based): full jitter, or `Retry-After`."""
+        if retry_after is not None:
+            return min(retry_after, self.cap_seconds)
+        return self._rng.uniform(0, min(self.cap_seconds, self.base_seconds * 2 ** retry))
+
+NO_RETRY = RetryPolicy(attempts=1)
+
+def _retry_after(resp: requests.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class RequestBudget:
+    """Token bucket shared by threads: at most `rps` requests per second.
+
+    `burst` tokens can be spent at once after an idle spell; the default of 1
+    spaces requests evenly.
+    """
+
+    def __init__(self, rps: float, burst: float | None = None) -> None:
+        if rps <= 0:
+            raise ValueError("rps must be positive")
+        self.rps = rps
+        self.capacity = max(1.0, burst or 1.0)
+        self.requests = 0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rps)
+            self._updated = now
+            self._tokens -= 1  # reserve; a negative balance is the queue ahead of us
+            wait = -self._tokens / self.rps if self._tokens < 0 else 0.0
+            self.requests += 1
+        if wait:
+            time.sleep(wait)
+
+    def on_success(self, latency: float) -> None:
+        pass
+
+    def on_failure(self, reason: str, retry_after: float | None = None) -> None:
+        pass
+
+class AdaptiveThrottle(RequestBudget):
+    """AIMD pacer: additive increase while healthy, multiplicative decrease on 429/5xx/timeouts."""
+
+    def __init__(self, start_rps: float = 2.0, *, min_rps: float = 0.2, max_rps: float = 20.0,
+                 increase: float = 0.1, decrease: float = 0.5, latency_target: float = 2.0,
+                 max_error_rate: float = 0.05, cooldown_seconds: float = 1.0) -> None:
+        super().__init__(min(max(start_rps, min_rps), max_rps))
+        self.min_rps = min_rps
+        self.max_rps = max_rps
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.error_rate = 0.0  # exponentially weighted, ~20 requests
+        self._last_decrease = 0.0
+
+    def _observe(self, failed: bool) -> None:
+        self.error_rate += 0.05 * ((1.0 if failed else 0.0) - self.error_rate)
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            self._observe(False)
+            if latency <= self.latency_target and self.error_rate <= self.max_error_rate:
+                self.rps = min(self.max_rps, self.rps + self.increase)
+            elif latency > self.latency_target:
+                self._decrease(f"latency {latency:.1f}s", factor=(1 + self.decrease) / 2)
+
+    def on_failure(self, reason: str, retry_after: float | None = None) -> None:
+        with self._lock:
+            self._observe(True)
+            self._decrease(reason, factor=self.decrease)
+            if retry_after:
+                self._tokens = min(self._tokens, -retry_after * self.rps)  # nobody sends before then
+
+    def _decrease(self, reason: str, *, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_seconds:
+            return  # one back-off per burst of failures
+        self._last_decrease = now
+        old, self.rps = self.rps, max(self.min_rps, self.rps * factor)
+        if self.rps < old:
+            print(f"[throttle] {reason}: {old:.2f} -> {self.rps:.2f} req/s")
+
+class ThrottledAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter with a sized pool, retries (`RetryPolicy`) and an optional pacer."""
+
+    def __init__(self, *, pool_size: int = 10, retry: RetryPolicy | None = None,
+                 throttle: RequestBudget | None = None) -> None:
+        self.retry = retry or NO_RETRY
+        self.throttle = throttle
+        self.retries = 0
+        super().__init__(pool_connections=4, pool_maxsize=max(pool_size, 1))
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        for attempt in range(self.retry.attempts):
+            last = attempt == self.retry.attempts - 1
+            if self.throttle is not None:
+                self.throttle.acquire()
+            start = time.monotonic()
+            try:
+                resp = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if self.throttle is not None:
+                    self.throttle.on_failure(type(exc).__name__)
+                if last:
+                    raise
+                wait = self.retry.backoff(attempt)
+                print(f"[retry] {request.url}: {type(exc).__name__}; attempt {attempt + 2} in {wait:.1f}s")
+            else:
+                if resp.status_code not in self.retry.statuses and resp.status_code < 500:
+                    if self.throttle is not None:
+                        self.throttle.on_success(time.monotonic() - start)
+                    return resp
+                retry_after = _retry_after(resp)
+                if self.throttle is not None:
+                    self.throttle.on_failure(f"status {resp.status_code}", retry_after)
+                if last or resp.status_code not in self.retry.statuses:
+                    return resp
+                resp.close()
+                wait = self.retry.backoff(attempt, retry_after)
+                print(f"[retry] {request.url}: status {resp.status_code}; attempt {attempt + 2} in {wait:.1f}s")
+            self.retries += 1
+            time.sleep(wait)
+        raise AssertionError("unreachable")
+
+def mount_adapter(ses: requests.Session, adapter: requests.adapters.HTTPAdapter) -> requests.Session:
+    ses.mount("http://", adapter)
+    ses.mount("https://", adapter)
+    return ses
+
+_TRANSIENT_CARD_KEYS = ("validators", "http_etag", "http_last_modified")
+_LOCKS: dict[Path, threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+def default_dead_letters_path(output_path: str | Path) -> Path:
+    """Dead-letter file shared by every CSV in the same directory."""
+    return Path(output_path).parent / DEAD_LETTERS_FILENAME
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+class DeadLetters:
+    """Append-only JSON-lines log of listings that failed, retried first by the next crawl.
+
+    Each line is {"url", "output_path", "card", "reason", "attempts", "at",
+    "resolved"}; the last line per (output, URL) wins. The file is read once,
+    when the object is created; `add` / `resolve` update that in-memory state
+    and append one line. `unresolved` gives the URLs worth `resolve`-ing
+    (callers look successes up in it, so a clean crawl writes nothing), and
+    `pending` the unresolved ones with fewer than `max_attempts` failures.
+    `compact` re-reads the file (other categories may share it), drops
+    resolved entries and moves exhausted ones to `<name>_exhausted.jsonl`
+    (also read once, so a listing that keeps failing stays given up on).
+    Thread-safe.
+    """
+
+    def __init__(self, path: str | Path, *, max_attempts: int = 5) -> None:
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        with _LOCKS_GUARD:  # one lock per file, so categories sharing it can compact safely
+            self._lock = _LOCKS.setdefault(self.path.resolve(), threading.Lock())
+        with self._lock:
+            self._state = self._entries()
+            self._exhausted = self._entries(self.exhausted_path)
+
+    @property
+    def exhausted_path(self) -> Path:
+        return self.path.with_name(f"{self.path.stem}_exhausted{self.path.suffix}")
+
+    def _entries(self, path: Path | None = None) -> dict[tuple[str, str], dict[str, Any]]:
+        path = path or self.path
+        entries: dict[tuple[str, str], dict[str, Any]] = {}
+        if not path.exists():
+            return entries
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line after a crash
+                entries[(entry["output_path"], entry["url"])] = entry
+        return entries
+
+    def _append(self, entry: dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def add(self, card: dict[str, Any], *, output_path: str, reason: str) -> None:
+        """Record a failed listing (its results-page card) for `output_path`."""
+        key = (str(output_path), card["url"])
+        with self._lock:
+            previous = self._state.get(key) or self._exhausted.get(key)
+            attempts = previous["attempts"] + 1 if previous and not previous.get("resolved") else 1
+            entry = {"url": card["url"], "output_path": str(output_path),
+                     "card": {k: v for k, v in card.items() if k not in _TRANSIENT_CARD_KEYS},
+                     "reason": reason, "attempts": attempts, "at": _now(), "resolved": False}
+            self._state[key] = entry
+            self._append(entry)
+        if attempts >= self.max_attempts:
+            print(f"[dead-letter] giving up on {card['url']} after {attempts} failed runs")
+
+    def resolve(self, url: str, *, output_path: str) -> None:
+        """Mark a dead-lettered listing as fetched; a URL that is not dead-lettered writes nothing."""
+        key = (str(output_path), url)
+        with self._lock:
+            entry = self._state.get(key)
+            if entry is None or entry.get("resolved"):
+                return
+            entry = {"url": url, "output_path": str(output_path), "at": _now(), "resolved": True}
+            self._state[key] = entry
+            self._append(entry)
+
+    def unresolved(self, output_path: str) -> set[str]:
+        """URLs with an unresolved failure for `output_path` (retryable or not)."""
+        with self._lock:
+            return {url for (out, url), e in self._state.items() if out == str(output_path) and not e.get("resolved")}
+
+    def pending(self, output_path: str) -> list[dict[str, Any]]:
+        """Cards of unresolved failures for `output_path` that are still worth retrying."""
+        with self._lock:
+            return [e["card"] for (out, _), e in self._state.items()
+                    if out == str(output_path) and not e.get("resolved") and e.get("attempts", 0) < self.max_attempts]
+
+    def compact(self) -> int:
+        """Rewrite the file with the retryable entries (exhausted ones move to `exhausted_path`);
+        return how many remain."""
+        with self._lock:
+            if not self.path.exists():
+                return 0
+            entries = self._entries()  # includes what other instances sharing the file appended
+            keep = [e for e in entries.values() if not e.get("resolved") and e.get("attempts", 0) < self.max_attempts]
+            exhausted = [e for e in entries.values() if not e.get("resolved") and e.get("attempts", 0) >= self.max_attempts]
+            self._exhausted.update(((e["output_path"], e["url"]), e) for e in exhausted)
+            if exhausted:
+                with self.exhausted_path.open("a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in exhausted)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text("".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in keep),
+                           encoding="utf-8")
+            tmp.replace(self.path)
+            self._state = {(e["output_path"], e["url"]): e for e in keep}
+        return len(keep)
@@ -0,0 +1,156 @@
+"""Crawl several imot.bg categories at once under one request budget.
+
+`run_scrape` used to crawl rooms 1, 2 and 3 one after another, each with its
+own session. `crawl_categories` runs every category in its own thread
+instead:
+- categories come from `BASE_URLS` or a JSON file (`load_categories`), so
+  rentals, 4-room flats or houses are added by configuration, not code
+- all categories share one session (`shared_session`): one connection pool,
+  and one pacer (`http_client.RequestBudget` token bucket or
+  `AdaptiveThrottle`) capping requests per second across every category;
+  responses served by an `HttpCache` do not use the budget
+- `CrawlProgress` counts pages, listings and errors per category and prints
+  a per-category plus aggregate line every few seconds
+- a category that raises is marked failed and the others keep going
+
+Category file (a JSON list; `output` defaults to
+`<output-prefix><name>_pilot.csv`):
+
+  [
+    {"name": "1", "rooms": 1, "url": "https://www.imot.bg/obiavi/prodazhbi/grad-sofiya/ednostaen"},
+    {"name": "rent2", "rooms": 2, "url": "https://www.imot.bg/obiavi/naemi/grad-sofiya/dvustaen",
+     "output": "data/raw/rent/raw_rent2.csv"}
+  ]
+
+Usage:
+  python -m src.scraping.run_scrape --parallel --rps 4 --pages 0 --delta
+  python -m src.scraping.run_scrape --parallel --categories config/categories.example.json --workers 4
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, NamedTuple
+
+import requests
+
+from src.scraping.http_cache import HttpCache
+from src.scraping.http_client import RequestBudget, RetryPolicy
+from src.scraping.pipeline import BASE_URLS, _session
+
+class Category(NamedTuple):
+    name: str
+    rooms: int
+    base_url: str
+    output_path: str | None = None
+
+    def output_for(self, output_prefix: str) -> str:
+        return self.output_path or f"{output_prefix}{self.name}_pilot.csv"
+
+def default_categories() -> list[Category]:
+    """The built-in sale categories (`pipeline.BASE_URLS`), named by room count."""
+    return [Category(str(rooms), rooms, url) for rooms, url in BASE_URLS.items()]
+
+def load_categories(path: str | Path) -> list[Category]:
+    """Read categories from a JSON list of {"name", "rooms", "url", "output"?} objects."""
+    entries = json.loads(Path(path).read_text(encoding="utf-8"))
+    categories = []
+    for entry in entries:
+        missing = {"rooms", "url"} - set(entry)
+        if missing:
+            raise ValueError(f"{path}: category {entry} is missing {sorted(missing)}")
+        rooms = int(entry["rooms"])
+        categories.append(Category(str(entry.get("name", rooms)), rooms, entry["url"], entry.get("output")))
+    names = [c.name for c in categories]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: category names must be unique, got {names}")
+    return categories
+
+def shared_session(pool_size: int, *, rps: float | None = None, throttle: RequestBudget | None = None,
+                   retry: RetryPolicy | None = None, http_cache: HttpCache | None = None) -> requests.Session:
+    """One session for all categories: `pool_size` pooled connections per host and one pacer.
+
+    `throttle` (e.g. an `AdaptiveThrottle`) wins over a fixed `rps` budget.
+    """
+    if throttle is None and rps:
+        throttle = RequestBudget(rps)
+    return _session(http_cache, pool_size=pool_size, retry=retry, throttle=throttle)
+
+class CrawlProgress:
+    """Thread-safe per-category counters of pages, listings and errors."""
+
+    EVENTS = ("page", "listing", "error")
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.counts = {name: dict.fromkeys(self.EVENTS, 0) for name in names}
+        self.status = dict.fromkeys(self.counts, "pending")
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def callback(self, name: str) -> Callable[[str], None]:
+        """`progress=` hook for the crawl functions of category `name`."""
+        def record(event: str) -> None:
+            with self._lock:
+                self.counts[name][event] += 1
+        return record
+
+    def set_status(self, name: str, status: str) -> None:
+        with self._lock:
+            self.status[name] = status
+
+    def totals(self) -> dict[str, int]:
+        with self._lock:
+            return {event: sum(c[event] for c in self.counts.values()) for event in self.EVENTS}
+
+    def report(self) -> str:
+        """One line: every category, then the aggregate with listings per minute."""
+        with self._lock:
+            parts = [f"{name}[{self.status[name]}] pages={c['page']} listings={c['listing']} errors={c['error']}"
+                     for name, c in self.counts.items()]
+        totals = self.totals()
+        minutes = max(time.monotonic() - self.started, 1e-9) / 60
+        parts.append(f"total pages={totals['page']} listings={totals['listing']} errors={totals['error']} "
+                     f"({totals['listing'] / minutes:.1f} listings/min)")
+        return " | ".join(parts)
+
+def crawl_categories(categories: list[Category], crawl_one: Callable[..., Any], *,
+                     progress: CrawlProgress | None = None, report_every: float = 30.0) -> CrawlProgress:
+    """Run `crawl_one(category, progress=...)` for every category concurrently.
+
+    Each category gets its own thread; an exception marks that category
+    "failed" and is logged without stopping the others. Progress is printed
+    every `report_every` seconds (0 disables the periodic line) and once at
+    the end.
+    """
+    progress = progress or CrawlProgress(c.name for c in categories)
+    stop = threading.Event()
+
+    def run(category: Category) -> None:
+        progress.set_status(category.name, "running")
+        try:
+            crawl_one(category, progress=progress.callback(category.name))
+        except Exception as exc:  # noqa: BLE001 - isolate categories
+            progress.set_status(category.name, "failed")
+            print(f"[error] category {category.name} failed: {exc}")
+        else:
+            progress.set_status(category.name, "done")
+
+    def reporter() -> None:
+        while not stop.wait(report_every):
+            print(f"[progress] {progress.report()}")
+
+    ticker = threading.Thread(target=reporter, daemon=True) if report_every > 0 else None
+    if ticker is not None:
+        ticker.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(categories), 1), thread_name_prefix="category") as pool:
+            list(pool.map(run, categories))
+    finally:
+        stop.set()
+        if ticker is not None:
+            ticker.join()
+    print(f"[progress] {progress.report()}")
+    return progress
@@ -0,0 +1,159 @@
+"""Process-pool parse stage and offline re-parsing of saved listing pages.
+
+BeautifulSoup work is CPU-bound and holds the GIL, so once fetching is
+concurrent it becomes the bottleneck. The helpers here run the parsers in a
+`ProcessPoolExecutor` sized to the available cores:
+- `parse_detail_job` / `extract_cards_job` are the picklable entry points used
+  by the concurrent crawl (`async_crawl`, `parse_workers=`)
+- `save_page` / `load_saved_page` keep raw detail HTML on disk (one file per
+  listing under `<dir>/room<N>/`), tagged with its source URL
+- `reparse_directory` re-parses such a directory in parallel with a bounded
+  number of pending jobs, so selector changes can be applied without
+  re-scraping
+
+Usage:
+  python -m src.scraping.parse_pool data/html --output data/raw/reparsed.csv --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+from src.scraping.pipeline import (
+    RAW_COLUMNS,
+    _load_seen_urls,
+    _merge_card,
+    extract_listing_cards,
+    parse_listing_detail,
+)
+from src.scraping.raw_writer import RawWriter
+from src.workflow import metrics
+
+SOURCE_MARKER = "<!-- source-url: "
+DEFAULT_SOURCE_HOST = "https://www.imot.bg"
+_ROOM_DIR_RE = re.compile(r"^room(\d+)$")
+_UNSAFE_NAME_RE = re.compile(r"[^\w.-]+")
+
+def default_parse_workers() -> int:
+    """Number of parse processes: one per core available to this process."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+def parse_detail_job(raw_page: str, rooms: int, card: dict[str, Any]) -> dict[str, Any]:
+    """Parse a detail page and merge in its card fields (runs in a pool process)."""
+    with metrics.timer("parse_seconds", page_type="detail"):
+        return _merge_card(parse_listing_detail(raw_page, rooms=rooms), card)
+
+def extract_cards_job(results_page: str) -> list[dict[str, Any]]:
+    """Extract listing cards from a results page (runs in a pool process)."""
+    with metrics.timer("parse_seconds", page_type="results"):
+        return extract_listing_cards(results_page)
+
+def _page_filename(url: str) -> str:
+    path = urlsplit(url).path.strip("/") or "index"
+    return _UNSAFE_NAME_RE.sub("_", path)[:200] + ".html"
+
+def save_page(save_dir: str | Path, rooms: int, url: str, html: str) -> Path:
+    """Write decoded detail HTML to `<save_dir>/room<rooms>/<slug>.html`."""
+    out = Path(save_dir) / f"room{rooms}" / _page_filename(url)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".tmp")
+    tmp.write_text(f"{SOURCE_MARKER}{url} -->\n{html}", encoding="utf-8")
+    os.replace(tmp, out)
+    return out
+
+def load_saved_page(path: str | Path) -> tuple[str, str]:
+    """Return (url, html) for a saved page; pages without a marker get an imot.bg URL from the filename."""
+    p = Path(path)
+    text = p.read_text(encoding="utf-8", errors="ignore")
+    if text.startswith(SOURCE_MARKER):
+        first, _, html = text.partition("\n")
+        return first[len(SOURCE_MARKER):].strip().removesuffix("-->").strip(), html
+    return f"{DEFAULT_SOURCE_HOST}/{p.stem}", text
+
+def _reparse_file_job(path: str, rooms: int) -> dict[str, Any]:
+    url, html = load_saved_page(path)
+    listing_id = re.search(r"obiava-(\w+?)-", url)
+    card = {"url": url, "listing_id": f"ida{listing_id.group(1)}" if listing_id else None}
+    return parse_detail_job(html, rooms, card)
+
+def _iter_saved_pages(pages_dir: Path, rooms: int | None) -> Iterator[tuple[Path, int]]:
+    for path in sorted(pages_dir.rglob("*.html")):
+        room_match = _ROOM_DIR_RE.match(path.parent.name)
+        page_rooms = int(room_match.group(1)) if room_match else rooms
+        if page_rooms is None:
+            print(f"[warn] cannot infer rooms for {path}; pass rooms=")
+            continue
+        if rooms is not None and page_rooms != rooms:
+            continue
+        yield path, page_rooms
+
+def reparse_directory(
+    pages_dir: str | Path,
+    output_path: str,
+    *,
+    rooms: int | None = None,
+    workers: int | None = None,
+    max_pending: int | None = None,
+    log_every: int = 100,
+) -> int:
+    """Re-parse every saved page under `pages_dir` in parallel and append rows to `output_path`.
+
+    Room counts come from `room<N>` directories (or `rooms=`). Files are read
+    inside the workers and at most `max_pending` jobs are queued at once, so
+    memory stays flat regardless of directory size. URLs already present in
+    `output_path` are skipped, which makes the run resumable.
+    """
+    workers = workers or default_parse_workers()
+    max_pending = max_pending or workers * 4
+    writer = RawWriter(output_path, RAW_COLUMNS, batch_size=200)
+    seen = _load_seen_urls(output_path)
+    written = 0
+    pending: set[Future] = set()
+
+    def drain(block_until: int) -> None:
+        nonlocal pending, written
+        while len(pending) > block_until:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    row = fut.result()
+                except Exception as exc:
+                    print(f"[warn] Failed to parse {getattr(fut, 'path', '?')}: {exc}")
+                    continue
+                if row["url"] in seen:
+                    continue
+                writer.append(row)
+                seen.add(row["url"])
+                written += 1
+                if written % log_every == 0:
+                    print(f"[reparse] {written} pages parsed so far")
+
+    with writer, ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, page_rooms in _iter_saved_pages(Path(pages_dir), rooms):
+            fut = pool.submit(_reparse_file_job, str(path), page_rooms)
+            fut.path = path  # type: ignore[attr-defined]
+            pending.add(fut)
+            drain(max_pending - 1)
+        drain(0)
+    print(f"[reparse] done. rows written: {written} -> {output_path}")
+    return written
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-parse saved imot.bg detail pages in parallel")
+    parser.add_argument("pages_dir", help="Directory of saved pages (room<N>/ subfolders)")
+    parser.add_argument("--output", required=True, help="CSV to append parsed rows to")
+    parser.add_argument("--rooms", type=int, default=None, help="Room count when not encoded in folders")
+    parser.add_argument("--workers", type=int, default=None, help="Parse processes (default: all cores)")
+    args = parser.parse_args(argv)
+    reparse_directory(args.pages_dir, args.output, rooms=args.rooms, workers=args.workers)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
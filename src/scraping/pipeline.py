@@ -4,7 +4,16 @@ This module is designed for incremental, restart-friendly scraping:
 - iterate paginated result pages per room category
 - extract detail URLs
 - fetch + parse each listing
-- append each row immediately to a CSV so crashes do not lose work
+- append rows to a CSV in small journaled batches (`raw_writer.RawWriter`)
+  so crashes lose at most the last unflushed batch
+- skip listings recorded in the shared seen index (`seen_index.SeenIndex`)
+- optionally keep every response in an on-disk cache and replay crawls from
+  it without network (`http_cache.HttpCache`)
+- retry transient HTTP failures with backoff and keep listings that still
+  fail in a dead-letter file retried first by the next crawl
+  (`http_client`)
+- record request latency, bytes, decode/parse/disk time, skips and errors
+  per room category when `src.workflow.metrics` is enabled
 
 Selectors and patterns are conservative; adjust after inspecting real HTML during
 the pilot run. Network calls can be rate-limited to remain polite, but the website doesn't seem to have a rate limiter so we won't be using it.
@@ -15,10 +24,23 @@ import csv
 import re
 import time
 from pathlib import Path
-from typing import Dict, Any, Iterator, Iterable
+from typing import Dict, Any, Callable, Iterator, Iterable
 
 import requests
-from bs4 import BeautifulSoup
+from src.scraping.encoding import decode_bytes
+from src.scraping.html_backend import parse_html
+from src.scraping.http_cache import CachedSession, HttpCache
+from src.scraping.http_client import (
+    DeadLetters,
+    RequestBudget,
+    RetryPolicy,
+    ThrottledAdapter,
+    default_dead_letters_path,
+    mount_adapter,
+)
+from src.scraping.raw_writer import RawWriter
+from src.scraping.seen_index import SeenIndex, default_index_path, validators_of
+from src.workflow import metrics
 
 BASE_URLS: dict[int, str] = {
     # 1: "https://www.imot.bg/obiavi/prodazhbi/grad-sofiya/ednostaen?type_home=2~3~", for all
@@ -48,42 +70,49 @@ RAW_COLUMNS = [
     "desc_text",
 ]
 
-def _session() -> requests.Session:
-    ses = requests.Session()
+# Patterns are compiled once; the extraction logic below must stay identical across
+# backends, including the heading/id/year patterns written with doubled backslashes.
+_PAGE_PARAM_RE = re.compile(r"page=(\d+)")
+_PAGE_PARAM_SUB_RE = re.compile(r"page=\d+")
+_PATH_PAGE_RE = re.compile(r"/p-(\d+)")
+_PATH_PAGE_SUB_RE = re.compile(r"/p-\d+")
+_ITEM_CLASS_RE = re.compile(r"\bitem\b")
+_PRICE_CLASS_RE = re.compile(r"Price", re.IGNORECASE)
+_HEADING_ROOMS_RE = re.compile(r"Продава\\s+(\\d)")
+_HEADING_ID_RE = re.compile(r"Обява:\\s*(\\w+)")
+_FLOOR_RE = re.compile(r"(\d+)")
+_MAX_FLOOR_RE = re.compile(r"(?:от|/)\s*(\d+)")
+_CONSTRUCTION_RE = re.compile(r"(Тухла|Панел|ЕПК|ПК)", re.IGNORECASE)
+_PARAM_YEAR_RE = re.compile(r"(19\d{2}|20\d{2})")
+_DESC_YEAR_RE = re.compile(r"(19\\d{2}|20\\d{2})")
+_HEAT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (r"ТЕЦ", r"газ", r"електр", r"клим", r"парно")]
+
+def _session(http_cache: HttpCache | None = None, *, pool_size: int = 10, retry: RetryPolicy | None = None,
+             throttle: RequestBudget | None = None) -> requests.Session:
+    """Crawl session: `pool_size` connections per host, retries (default `RetryPolicy()`), optional pacer."""
+    ses = CachedSession(http_cache) if http_cache is not None else requests.Session()
     ses.headers.update({"User-Agent": USER_AGENT})
-    return ses
-
-def _decode_html(resp: requests.Response) -> str:
-    """Decode response bytes, choosing encoding with most Cyrillic characters."""
-    candidates: list[str] = []
-    if resp.encoding:
-        candidates.append(resp.encoding)
-    if resp.apparent_encoding and resp.apparent_encoding not in candidates:
-        candidates.append(resp.apparent_encoding)
-    for enc in ("utf-8", "cp1251"):
-        if enc not in candidates:
-            candidates.append(enc)
-
-    best_html = None
-    best_score = -1
-    for enc in candidates:
-        try:
-            html = resp.content.decode(enc, errors="ignore")
-        except Exception:
-            continue
-        score = sum(1 for ch in html if "\u0400" <= ch <= "\u04FF")
-        if score > best_score:
-            best_score = score
-            best_html = html
-    return best_html or resp.text
-
-def _extract_next_page_url(html: str, current_url: str) -> str | None:
+    return mount_adapter(ses, ThrottledAdapter(pool_size=pool_size, retry=retry or RetryPolicy(), throttle=throttle))
+
+def _decode_html(resp: requests.Response, *, page_type: str = "page") -> str:
+    """Decode response bytes using the declared charset, else the encoding detected
+    for this host and page type (see `src.scraping.encoding`)."""
+    host = requests.compat.urlparse(resp.url or "").netloc
+    with metrics.timer("decode_seconds", page_type=page_type):
+        return decode_bytes(
+            resp.content,
+            content_type=resp.headers.get("Content-Type"),
+            cache_key=(host, page_type),
+        )
+
+def _extract_next_page_url(html: Any, current_url: str, *, backend: str | None = None) -> str | None:
     """Attempt to find the next-page URL from pagination links.
 
     This uses `<a rel="next">`, Bulgarian "Следваща" text, or a general `page=`
-    parameter. Adjust selectors after inspecting live markup.
+    parameter. Adjust selectors after inspecting live markup. `html` may be a
+    tree from `parse_html` to reuse the one built for card extraction.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html, backend)
 
     link_tag = soup.find("link", rel="next")
     if link_tag and link_tag.get("href"):
@@ -100,48 +129,96 @@ def _extract_next_page_url(html: str, current_url: str) -> str | None:
 
     if "page=" in current_url:
         try:
-            current_page = int(re.search(r"page=(\d+)", current_url).group(1))
-            return re.sub(r"page=\d+", f"page={current_page + 1}", current_url)
+            current_page = int(_PAGE_PARAM_RE.search(current_url).group(1))
+            return _PAGE_PARAM_SUB_RE.sub(f"page={current_page + 1}", current_url)
         except Exception:
             return None
-    path_match = re.search(r"/p-(\d+)", current_url)
+    path_match = _PATH_PAGE_RE.search(current_url)
     if path_match:
         current_page = int(path_match.group(1))
-        return re.sub(r"/p-\d+", f"/p-{current_page + 1}", current_url)
+        return _PATH_PAGE_SUB_RE.sub(f"/p-{current_page + 1}", current_url)
     if "?" in current_url:
         return f"{current_url}&page=2"
     return f"{current_url}?page=2"
 
+def _result_page_url(base_url: str, page_num: int) -> str:
+    """Build the URL of results page `page_num` (1-based) for a category base URL."""
+    prefix, q = (base_url.split("?", 1) + [""])[:2]
+    url = prefix if page_num == 1 else f"{prefix}/p-{page_num}"
+    if q:
+        url = f"{url}?{q}"
+    return url
+
+def _category_base_url(rooms: int, base_url: str | None = None) -> str:
+    if base_url:
+        return base_url
+    if rooms not in BASE_URLS:
+        raise ValueError(f"Unsupported rooms={rooms}; expected one of {list(BASE_URLS)}")
+    return BASE_URLS[rooms]
+
+def _conditional_get(ses: requests.Session, url: str, validators: dict[str, str] | None = None, *,
+                     page_type: str = "page") -> requests.Response:
+    """GET with If-None-Match / If-Modified-Since from stored validators; 304 is not an error.
+
+    Records the request latency, status and response bytes under `page_type`.
+    """
+    headers = {}
+    if validators:
+        if validators.get("http_etag"):
+            headers["If-None-Match"] = validators["http_etag"]
+        if validators.get("http_last_modified"):
+            headers["If-Modified-Since"] = validators["http_last_modified"]
+    with metrics.timer("http_request_seconds", page_type=page_type):
+        resp = ses.get(url, timeout=15, headers=headers or None)
+    metrics.inc("http_responses_total", page_type=page_type, status=resp.status_code)
+    metrics.inc("http_response_bytes_total", len(resp.content), page_type=page_type)
+    if resp.status_code != 304:
+        resp.raise_for_status()
+    return resp
+
+def _response_validators(resp: requests.Response) -> dict[str, str | None]:
+    return {"http_etag": resp.headers.get("ETag"), "http_last_modified": resp.headers.get("Last-Modified")}
+
 def iter_result_pages(rooms: int, *, delay_seconds: float = 1.0, max_pages: int | None = None,
-                      session: requests.Session | None = None) -> Iterator[str]:
+                      session: requests.Session | None = None, base_url: str | None = None,
+                      index: SeenIndex | None = None) -> Iterator[str]:
     """Yield HTML for each search-results page for the given room count.
 
     Pagination uses `/p-{n}` path segments used by imot.bg (p-1, p-2, ...).
-    Stops when `max_pages` is reached.
-    """
-    if rooms not in BASE_URLS:
-        raise ValueError(f"Unsupported rooms={rooms}; expected one of {list(BASE_URLS)}")
+    Stops when `max_pages` is reached or a page past the first returns 404
+    (the end of the listing). `base_url` overrides the category URL
+    from `BASE_URLS` (e.g. to point at a local fixture server).
 
+    With an `index`, pages are fetched conditionally; a page the server reports
+    as unchanged (304) is yielded as "". Validators are stored only when the
+    next page is requested, i.e. after the caller has finished with the page.
+    """
+    base_url = _category_base_url(rooms, base_url)
     ses = session or _session()
-    base_url = BASE_URLS[rooms]
-    prefix, q = (base_url.split("?", 1) + [""])[:2]
     page_num = 1
     while True:
-        url = prefix if page_num == 1 else f"{prefix}/p-{page_num}"
-        if q:
-            url = f"{url}?{q}"
-        resp = ses.get(url, timeout=15)
-        resp.raise_for_status()
-        html = _decode_html(resp)
+        url = _result_page_url(base_url, page_num)
+        try:
+            resp = _conditional_get(ses, url, index.page_validators(url) if index is not None else None,
+                                    page_type="results")
+        except requests.HTTPError as exc:
+            if page_num > 1 and exc.response is not None and exc.response.status_code == 404:
+                print(f"[rooms={rooms}] {url} not found; last page reached")
+                break
+            raise
+        html = "" if resp.status_code == 304 else _decode_html(resp, page_type="results")
         print(f"[rooms={rooms}] GET {url} status={resp.status_code} bytes={len(resp.content)}")
         yield html
+        if index is not None and resp.status_code != 304:
+            index.set_page_validators(url, _response_validators(resp))
 
         if max_pages is not None and page_num >= max_pages:
             break
         page_num += 1
         time.sleep(delay_seconds)
+        metrics.inc("sleep_seconds_total", delay_seconds)
 
-def extract_listing_cards(results_page: str) -> list[dict[str, Any]]:
+def extract_listing_cards(results_page: Any, *, backend: str | None = None) -> list[dict[str, Any]]:
     """Parse the results page and return listing cards (url + headline info).
 
     Rules from sample HTML:
@@ -149,15 +226,16 @@ def extract_listing_cards(results_page: str) -> list[dict[str, Any]]:
     - actual offers are <div class="item ..."> (e.g., item BEST, item TOP)
     - link is inside div.text > div.zaglavie > a.title
     We also capture the item id, headline price, and district if present.
+    `results_page` is HTML or a tree from `parse_html`.
     """
-    soup = BeautifulSoup(results_page, "html.parser")
+    soup = parse_html(results_page, backend)
     container = soup.find("div", class_="ads2023")
     if not container:
         print("[warn] ads2023 container not found on results page")
         return []
 
     cards: list[dict[str, Any]] = []
-    for item in container.find_all("div", class_=re.compile(r"\bitem\b")):
+    for item in container.find_all("div", class_=_ITEM_CLASS_RE):
         title_tag = item.select_one("div.text div.zaglavie a.title[href]")
         if not title_tag:
             continue
@@ -186,28 +264,44 @@ def extract_listing_cards(results_page: str) -> list[dict[str, Any]]:
         })
     return cards
 
+def extract_results_page(results_page: Any, current_url: str, *,
+                         backend: str | None = None) -> tuple[list[dict[str, Any]], str | None]:
+    """Return (listing cards, next-page URL) from a single parse of a results page."""
+    soup = parse_html(results_page, backend)
+    return extract_listing_cards(soup), _extract_next_page_url(soup, current_url)
+
 def fetch_listing_detail(url: str, *, session: requests.Session | None = None) -> str:
     """Return raw HTML for a listing detail page (polite pacing applied externally)."""
     ses = session or _session()
     resp = ses.get(url, timeout=15)
     resp.raise_for_status()
-    return _decode_html(resp)
+    return _decode_html(resp, page_type="detail")
 
-def _text_search(text: str, patterns: Iterable[str]) -> str | None:
+def fetch_listing_detail_conditional(url: str, *, session: requests.Session | None = None,
+                                     validators: dict[str, str] | None = None) -> tuple[str | None, dict[str, str | None]]:
+    """Conditional detail fetch: (HTML or None when unchanged (304), response validators)."""
+    ses = session or _session()
+    resp = _conditional_get(ses, url, validators, page_type="detail")
+    if resp.status_code == 304:
+        return None, dict(validators or {})
+    return _decode_html(resp, page_type="detail"), _response_validators(resp)
+
+def _text_search(text: str, patterns: Iterable[re.Pattern[str]]) -> str | None:
     for pat in patterns:
-        match = re.search(pat, text, flags=re.IGNORECASE)
+        match = pat.search(text)
         if match:
             return match.group(0)
     return None
 
-def parse_listing_detail(raw_page: str, *, rooms: int) -> Dict[str, Any]:
+def parse_listing_detail(raw_page: Any, *, rooms: int, backend: str | None = None) -> Dict[str, Any]:
     """Extract structured fields from a listing detail page.
 
     Fields: url (to be added by caller), price_raw, area_raw, rooms, district_raw,
     floor_raw, max_floor_raw, heat_raw, construction_raw, year_raw, desc_text.
     Parsing follows the observed imot.bg DOM (ad2023 / contactsBox / adParams).
+    `raw_page` is HTML or a tree from `parse_html`; `backend` picks the parser.
     """
-    soup = BeautifulSoup(raw_page, "html.parser")
+    soup = parse_html(raw_page, backend)
 
     listing_id = None
     district_raw = None
@@ -227,7 +321,7 @@ def parse_listing_detail(raw_page: str, *, rooms: int) -> Dict[str, Any]:
         ob_title = contacts.select_one("div.obTitle h1")
         if ob_title:
             heading_text = ob_title.get_text(" ", strip=True)
-            rooms_match = re.search(r"Продава\\s+(\\d)", heading_text)
+            rooms_match = _HEADING_ROOMS_RE.search(heading_text)
             if rooms_match:
                 rooms = int(rooms_match.group(1))
             district_div = ob_title.find("div")
@@ -236,11 +330,11 @@ def parse_listing_detail(raw_page: str, *, rooms: int) -> Dict[str, Any]:
             id_span = ob_title.find("span")
             if id_span:
                 id_text = id_span.get_text(strip=True)
-                id_match = re.search(r"Обява:\\s*(\\w+)", id_text)
+                id_match = _HEADING_ID_RE.search(id_text)
                 if id_match:
                     listing_id = id_match.group(1)
 
-        price_block = contacts.find("div", class_=re.compile(r"Price", re.IGNORECASE))
+        price_block = contacts.find("div", class_=_PRICE_CLASS_RE)
         if price_block:
             lines = [l.strip() for l in price_block.get_text("\\n", strip=True).split("\\n") if l.strip()]
             euro_line = next((ln for ln in lines if "€" in ln or "EUR" in ln), None)
@@ -259,17 +353,17 @@ def parse_listing_detail(raw_page: str, *, rooms: int) -> Dict[str, Any]:
             if label == "Площ":
                 area_raw = val
             elif label == "Етаж":
-                fl_match = re.search(r"(\d+)", val)
+                fl_match = _FLOOR_RE.search(val)
                 if fl_match:
                     floor_raw = fl_match.group(1)
-                max_match = re.search(r"(?:от|/)\s*(\d+)", val)
+                max_match = _MAX_FLOOR_RE.search(val)
                 if max_match:
                     max_floor_raw = max_match.group(1)
             elif label and "Строителство" in label:
-                cons_match = re.search(r"(Тухла|Панел|ЕПК|ПК)", val, flags=re.IGNORECASE)
+                cons_match = _CONSTRUCTION_RE.search(val)
                 if cons_match:
                     construction_raw = cons_match.group(1)
-                year_match = re.search(r"(19\d{2}|20\d{2})", val)
+                year_match = _PARAM_YEAR_RE.search(val)
                 if year_match and not year_raw:
                     year_raw = year_match.group(1)
             elif label in {"Газ", "ТEЦ", "ТЕЦ"}:
@@ -278,7 +372,7 @@ def parse_listing_detail(raw_page: str, *, rooms: int) -> Dict[str, Any]:
     if heat_raw_entries:
         heat_raw = "; ".join(heat_raw_entries)
     else:
-        heat_raw = _text_search(text_main, [r"ТЕЦ", r"газ", r"електр", r"клим", r"парно"])
+        heat_raw = _text_search(text_main, _HEAT_PATTERNS)
 
     desc_box = soup.find("div", class_="borderBox")
     if desc_box:
@@ -287,7 +381,7 @@ def parse_listing_detail(raw_page: str, *, rooms: int) -> Dict[str, Any]:
         desc_text = text_main[:2000]
 
     if not year_raw:
-        yr_match = re.search(r"(19\\d{2}|20\\d{2})", desc_text or "")
+        yr_match = _DESC_YEAR_RE.search(desc_text or "")
         if yr_match:
             year_raw = yr_match.group(1)
 
@@ -308,7 +402,10 @@ def parse_listing_detail(raw_page: str, *, rooms: int) -> Dict[str, Any]:
     }
 
 def append_row(row: dict[str, Any], *, output_path: str) -> None:
-    """Append a single listing row to a CSV (restart-friendly)."""
+    """Append a single listing row to a CSV (restart-friendly).
+
+    Opens the file per call; crawls use the batched `RawWriter` instead.
+    """
     path = Path(output_path)
     path.parent.mkdir(parents=True, exist_ok=True)
     write_header = not path.exists()
@@ -331,6 +428,24 @@ def _load_seen_urls(output_path: str) -> set[str]:
                 urls.add(url_val)
     return urls
 
+def _merge_card(parsed: dict[str, Any], card: dict[str, Any]) -> dict[str, Any]:
+    """Complete a parsed detail row with the URL/id and headline fields from its card.
+
+    The card price and any HTTP validators ride along as extra keys for the
+    seen index; they are not part of `RAW_COLUMNS` and never reach the CSV.
+    """
+    parsed.update({
+        "url": card["url"],
+        "listing_id": card.get("listing_id"),
+        "price_raw": parsed.get("price_raw") or card.get("price_raw"),
+        "district_raw": parsed.get("district_raw") or card.get("district_raw"),
+        "card_price_raw": card.get("price_raw"),
+    })
+    for key in ("http_etag", "http_last_modified"):
+        if card.get(key):
+            parsed[key] = card[key]
+    return parsed
+
 def crawl_room_category(
     rooms: int,
     *,
@@ -338,6 +453,16 @@ def crawl_room_category(
     delay_seconds: float = 1.0,
     max_pages: int | None = None,
     log_every: int = 10,
+    base_url: str | None = None,
+    batch_size: int = 20,
+    durability: str = "flush",
+    index_path: str | None = None,
+    delta: bool = False,
+    stop_after_known_pages: int = 3,
+    http_cache: HttpCache | None = None,
+    session: requests.Session | None = None,
+    progress: Callable[[str], None] | None = None,
+    dead_letters_path: str | None = None,
 ) -> None:
     """Driver to crawl one room-count category and append listings incrementally.
 
@@ -345,37 +470,162 @@ def crawl_room_category(
     - iterate result pages
     - extract detail URLs
     - fetch details (optional per-listing delay)
-    - parse and append immediately to disk for crash resilience
-    - skip already-seen URLs when restarting (read existing output)
+    - parse and write to disk in batches of `batch_size` rows (or every few
+      seconds) with the given `durability` policy, see `RawWriter`
+    - skip listings already in the seen index (`index_path`, default
+      `seen_index.sqlite` next to the output), shared by all categories
+
+    `delta=True` is the daily-refresh mode: known listings whose card price
+    changed are re-fetched (conditionally, so an unchanged page costs a 304)
+    and written as a new row, and paging stops after `stop_after_known_pages`
+    consecutive result pages without new or re-priced listings, so
+    `max_pages=None` ends naturally.
+
+    `http_cache` routes every GET through an `HttpCache`; in replay mode the
+    crawl runs from the cache only and `delay_seconds` is ignored. `session`
+    replaces the crawl's own session (e.g. one shared by several categories)
+    and `progress` is called with "page", "listing" or "error" as the crawl
+    advances.
+
+    Listings that fail after the HTTP retries go to the dead-letter file
+    (`dead_letters_path`, default `dead_letters.jsonl` next to the output);
+    the next crawl of this output fetches them before the first result page.
     """
-    seen = _load_seen_urls(output_path)
-    ses = _session()
+    if http_cache is not None and http_cache.replay:
+        delay_seconds = 0.0
+    with metrics.labels(rooms=rooms), _open_seen_index(output_path, index_path, rooms=rooms) as index, \
+            _crawl_writer(output_path, index, rooms=rooms, batch_size=batch_size, durability=durability) as writer:
+        _crawl_room_category(rooms, writer=writer, index=index, delay_seconds=delay_seconds,
+                             max_pages=max_pages, log_every=log_every, base_url=base_url, delta=delta,
+                             stop_after_known_pages=stop_after_known_pages, http_cache=http_cache,
+                             session=session, progress=progress,
+                             dead_letters=DeadLetters(dead_letters_path or default_dead_letters_path(output_path)))
+
+def _no_progress(event: str) -> None:
+    pass
+
+def _open_seen_index(output_path: str, index_path: str | None = None, *, rooms: int | None = None) -> SeenIndex:
+    """Open the shared seen index and catch it up with rows already in `output_path`."""
+    index = SeenIndex(index_path or default_index_path(output_path))
+    index.sync_csv(output_path, rooms=rooms)
+    return index
+
+def _crawl_writer(output_path: str, index: SeenIndex, *, rooms: int, batch_size: int = 20,
+                 durability: str = "flush") -> RawWriter:
+    """RawWriter for a crawl that records every flushed batch in `index`."""
+    return RawWriter(
+        output_path,
+        RAW_COLUMNS,
+        batch_size=batch_size,
+        durability=durability,
+        on_flush=lambda rows, end: index.record_batch(output_path, rows, end, rooms=rooms),
+    )
+
+def _select_cards(cards: list[dict[str, Any]], index: SeenIndex, claimed: set[str], *,
+                  delta: bool) -> list[dict[str, Any]]:
+    """Cards to fetch: new listings, plus re-priced ones (with stored validators) in delta mode."""
+    selected = []
+    skipped: dict[str, int] = {}
+    for card in cards:
+        if card["url"] in claimed:
+            skipped["claimed"] = skipped.get("claimed", 0) + 1
+            continue
+        status, record = index.classify(card)
+        if status == "new":
+            selected.append(card)
+        elif status == "repriced" and delta:
+            selected.append({**card, "validators": validators_of(record)})
+        else:
+            skipped[status] = skipped.get(status, 0) + 1
+    for reason, count in skipped.items():
+        metrics.inc("listings_skipped_total", count, reason=reason)
+    return selected
+
+def _dead_letter_cards(dead_letters: DeadLetters, output_path: str, index: SeenIndex, claimed: set[str], *,
+                       delta: bool) -> list[dict[str, Any]]:
+    """Dead-lettered cards of this output still worth fetching; the rest are marked resolved."""
+    pending = dead_letters.pending(output_path)
+    todo = _select_cards(pending, index, claimed, delta=delta)
+    wanted = {card["url"] for card in todo}
+    for card in pending:
+        if card["url"] not in wanted:
+            dead_letters.resolve(card["url"], output_path=output_path)
+    return todo
+
+def _crawl_room_category(rooms: int, *, writer: RawWriter, index: SeenIndex, delay_seconds: float,
+                         max_pages: int | None, log_every: int, base_url: str | None, delta: bool = False,
+                         stop_after_known_pages: int = 3, http_cache: HttpCache | None = None,
+                         session: requests.Session | None = None,
+                         progress: Callable[[str], None] | None = None,
+                         dead_letters: DeadLetters | None = None) -> None:
+    claimed: set[str] = set()
+    ses = session or _session(http_cache)
+    progress = progress or _no_progress
+    output_path = str(writer.path)
+    dead_letters = dead_letters or DeadLetters(default_dead_letters_path(output_path))
+    dead_urls = dead_letters.unresolved(output_path)  # only these need a "resolved" line on success
     processed = 0
+    unchanged = 0
     page_idx = 0
-    for page_html in iter_result_pages(rooms, delay_seconds=delay_seconds, max_pages=max_pages, session=ses):
-        page_idx += 1
-        print(f"[rooms={rooms}] page {page_idx} fetched")
-        cards = extract_listing_cards(page_html)
-        print(f"[rooms={rooms}] page {page_idx} cards found: {len(cards)} (seen so far: {len(seen)})")
-        for card in cards:
+    known_pages = 0
+
+    def fetch_cards(todo: list[dict[str, Any]]) -> None:
+        nonlocal processed, unchanged
+        for card in todo:
             url = card["url"]
-            if url in seen:
-                continue
+            claimed.add(url)
             try:
-                raw_detail = fetch_listing_detail(url, session=ses)
-                parsed = parse_listing_detail(raw_detail, rooms=rooms)
-                parsed.update({
-                    "url": url,
-                    "listing_id": card.get("listing_id"),
-                    "price_raw": parsed.get("price_raw") or card.get("price_raw"),
-                    "district_raw": parsed.get("district_raw") or card.get("district_raw"),
-                })
-                append_row(parsed, output_path=output_path)
-                seen.add(url)
+                raw_detail, validators = fetch_listing_detail_conditional(
+                    url, session=ses, validators=card.pop("validators", None)
+                )
+                if raw_detail is None:
+                    index.mark_seen([{"listing_id": card.get("listing_id"), "url": url,
+                                      "card_price_raw": card.get("price_raw")}])
+                    if url in dead_urls:
+                        dead_letters.resolve(url, output_path=output_path)
+                    unchanged += 1
+                    metrics.inc("listings_skipped_total", reason="unchanged")
+                    continue
+                with metrics.timer("parse_seconds", page_type="detail"):
+                    parsed = _merge_card(parse_listing_detail(raw_detail, rooms=rooms), {**card, **validators})
+                writer.append(parsed)
+                if url in dead_urls:
+                    dead_letters.resolve(url, output_path=output_path)
                 processed += 1
+                progress("listing")
                 if processed % log_every == 0:
                     print(f"[rooms={rooms}] processed {processed} listings so far")
             except Exception as exc:
+                progress("error")
+                metrics.inc("errors_total", stage="detail", error=type(exc).__name__)
+                dead_letters.add(card, output_path=output_path, reason=f"{type(exc).__name__}: {exc}")
+                dead_urls.add(url)
                 print(f"[warn] Failed to process {url}: {exc}")
             time.sleep(delay_seconds)
-    print(f"[rooms={rooms}] done. new listings processed: {processed}")
+            metrics.inc("sleep_seconds_total", delay_seconds)
+
+    retry = _dead_letter_cards(dead_letters, output_path, index, claimed, delta=delta)
+    if retry:
+        print(f"[rooms={rooms}] retrying {len(retry)} dead-lettered listings first")
+        fetch_cards(retry)
+    for page_html in iter_result_pages(rooms, delay_seconds=delay_seconds, max_pages=max_pages,
+                                       session=ses, base_url=base_url, index=index if delta else None):
+        page_idx += 1
+        progress("page")
+        print(f"[rooms={rooms}] page {page_idx} fetched")
+        with metrics.timer("parse_seconds", page_type="results"):
+            cards = extract_listing_cards(page_html) if page_html else []
+        todo = _select_cards(cards, index, claimed, delta=delta)
+        print(f"[rooms={rooms}] page {page_idx} cards found: {len(cards)} to fetch: {len(todo)} "
+              f"(indexed so far: {len(index)})")
+        index.touch(cards)
+        if delta:
+            known_pages = known_pages + 1 if not todo else 0
+            if known_pages >= stop_after_known_pages:
+                print(f"[rooms={rooms}] {known_pages} consecutive known pages; stopping delta crawl")
+                break
+        fetch_cards(todo)
+    remaining = dead_letters.compact()
+    print(f"[rooms={rooms}] done. new listings processed: {processed}"
+          + (f", unchanged (304): {unchanged}" if unchanged else "")
+          + (f", dead-lettered (all outputs): {remaining}" if remaining else ""))
@@ -0,0 +1,183 @@
+"""Long-lived, batched CSV writer for raw listing rows.
+
+`append_row` reopens the file and builds a new `csv.DictWriter` per listing.
+`RawWriter` keeps the file open and buffers rows instead:
+- rows are written in batches, every `batch_size` rows or `flush_interval`
+  seconds (a background timer flushes idle buffers)
+- `durability="flush"` hands each batch to the OS (survives a killed process);
+  `"fsync"` also fsyncs it (survives power loss)
+- `append` is thread-safe, so concurrent fetch/parse workers in one process
+  can share a writer
+- each batch is journaled before it touches the CSV: `<output>.journal`
+  records the pre-write file size and the batch bytes. On open, a complete
+  journal is replayed and an incomplete one truncates the CSV back to its
+  recorded size, so a hard kill loses at most the unflushed batch and never
+  leaves a half-written line.
+- `on_flush(rows, end_offset)` runs after each batch is on disk (used to
+  update the seen-listing index only for rows that were really written)
+- each batch records `disk_write_seconds`, `rows_written_total` and
+  `bytes_written_total` (`src.workflow.metrics`), with the metric labels
+  active when the writer was opened (flushes may run on the timer thread)
+
+Usage:
+  with RawWriter("data/raw/raw_room1.csv", RAW_COLUMNS, batch_size=50) as writer:
+      writer.append(row)
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Sequence
+
+from src.workflow import metrics
+
+DURABILITY_POLICIES = ("flush", "fsync")
+
+class RawWriter:
+    """Buffered, journaled appender for one raw CSV (see module docstring)."""
+
+    def __init__(
+        self,
+        output_path: str | Path,
+        fieldnames: Sequence[str],
+        *,
+        batch_size: int = 50,
+        flush_interval: float | None = 5.0,
+        durability: str = "flush",
+        on_flush: Callable[[list[dict[str, Any]], int], None] | None = None,
+    ) -> None:
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability={durability!r}; expected one of {DURABILITY_POLICIES}")
+        self.path = Path(output_path)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.fieldnames = list(fieldnames)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.on_flush = on_flush
+        self.rows_written = 0
+        self._metric_labels = dict(metrics.current_labels())
+        self._buffer: list[dict[str, Any]] = []
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+        self._closed = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.recover()
+        self._needs_header = not self.path.exists() or self.path.stat().st_size == 0
+        self._fh = self.path.open("ab")
+        self._stop = threading.Event()
+        self._timer: threading.Thread | None = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._timer.start()
+
+    def recover(self) -> None:
+        """Redo a complete journaled batch or roll back a partial one left by a crash."""
+        if not self.journal_path.exists():
+            return
+        data = self.journal_path.read_bytes()
+        header, sep, payload = data.partition(b"\n")
+        try:
+            meta = json.loads(header) if sep else None
+        except ValueError:
+            meta = None
+        if meta is not None and self.path.exists():
+            with self.path.open("r+b") as f:
+                f.truncate(min(int(meta["offset"]), f.seek(0, os.SEEK_END)))
+                if len(payload) == int(meta["length"]):
+                    f.seek(0, os.SEEK_END)
+                    f.write(payload)
+                    print(f"[writer] replayed journaled batch into {self.path}")
+                else:
+                    print(f"[writer] dropped partial batch for {self.path}")
+                f.flush()
+                os.fsync(f.fileno())
+        elif meta is not None and len(payload) == int(meta["length"]) and int(meta["offset"]) == 0:
+            self.path.write_bytes(payload)
+        self.journal_path.unlink()
+
+    def append(self, row: dict[str, Any]) -> None:
+        """Buffer one row; flushes when the batch is full or the interval has passed."""
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"RawWriter for {self.path} is closed")
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size or self._interval_elapsed():
+                self.flush()
+
+    def extend(self, rows: Iterable[dict[str, Any]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def _interval_elapsed(self) -> bool:
+        return bool(self.flush_interval) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def _serialize(self, rows: list[dict[str, Any]]) -> bytes:
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=self.fieldnames, extrasaction="ignore")
+        if self._needs_header:
+            writer.writeheader()
+        writer.writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+    def _sync(self, fh: Any) -> None:
+        fh.flush()
+        if self.durability == "fsync":
+            os.fsync(fh.fileno())
+
+    def flush(self) -> None:
+        """Write the buffered rows as one journaled batch."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            start = time.perf_counter()
+            payload = self._serialize(rows)
+            offset = self._fh.seek(0, os.SEEK_END)
+            with self.journal_path.open("wb") as journal:
+                journal.write(json.dumps({"offset": offset, "length": len(payload)}).encode() + b"\n")
+                journal.write(payload)
+                self._sync(journal)
+            self._fh.write(payload)
+            self._sync(self._fh)
+            self.journal_path.unlink()
+            self._needs_header = False
+            self.rows_written += len(rows)
+            metrics.observe("disk_write_seconds", time.perf_counter() - start, **self._metric_labels)
+            metrics.inc("rows_written_total", len(rows), **self._metric_labels)
+            metrics.inc("bytes_written_total", len(payload), **self._metric_labels)
+            if self.on_flush is not None:
+                try:
+                    self.on_flush(rows, offset + len(payload))
+                except Exception as exc:
+                    print(f"[warn] on_flush failed for {self.path}: {exc}")
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            with self._lock:
+                if self._closed:
+                    return
+                if self._buffer and self._interval_elapsed():
+                    self.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self.flush()
+            self._closed = True
+            self._fh.close()
+        self._stop.set()
+
+    def __enter__(self) -> "RawWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
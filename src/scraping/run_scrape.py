@@ -2,6 +2,14 @@
 
 Usage:
   python run_pilot_scrape.py --pages 2 --delay 1.0 --output-prefix data/raw/raw_room
+  python run_pilot_scrape.py --pages 50 --delay 0 --workers 8 --per-host 4   # concurrent mode
+  python run_pilot_scrape.py --pages 0 --delta                                # daily refresh
+  python run_pilot_scrape.py --cache-dir data/http_cache                      # keep responses
+  python run_pilot_scrape.py --cache-dir data/http_cache --replay --output-prefix /tmp/replay/raw_room
+  python run_pilot_scrape.py --parallel --rps 4 --pages 0                      # all categories at once
+  python run_pilot_scrape.py --parallel --categories config/categories.example.json   # extra categories
+  python run_pilot_scrape.py --parallel --adaptive --rps 2 --max-rps 10 --workers 4     # AIMD pacing
+  python run_pilot_scrape.py --metrics data/metrics/crawl.prom                 # per-category timings (or .jsonl)
 
 Logs progress per page and every N listings; reports HTTP/parse errors.
 """
@@ -10,13 +18,56 @@ from __future__ import annotations
 import argparse
 import sys
 from pathlib import Path
+from typing import Any, Callable
 
+import requests
+
+from src.scraping.async_crawl import crawl_room_category_concurrent
+from src.scraping.http_cache import HttpCache
+from src.scraping.http_client import AdaptiveThrottle, RequestBudget, RetryPolicy
+from src.scraping.multi_crawl import Category, crawl_categories, default_categories, load_categories, shared_session
 from src.scraping.pipeline import crawl_room_category
+from src.workflow import metrics
+
+def _crawl_one(category: Category, args: argparse.Namespace, http_cache: HttpCache | None, *,
+               session: requests.Session | None = None,
+               progress: Callable[[str], None] | None = None) -> Any:
+    output_path = category.output_for(args.output_prefix)
+    max_pages = args.pages if args.pages > 0 else None
+    print(f"[start] category={category.name} rooms={category.rooms} -> {output_path}, "
+          f"pages={args.pages}, delay={args.delay}s")
+    common = dict(
+        output_path=output_path,
+        batch_size=args.batch_size,
+        durability=args.durability,
+        index_path=args.index,
+        delta=args.delta,
+        stop_after_known_pages=args.stop_after_known_pages,
+        http_cache=http_cache,
+        delay_seconds=args.delay,
+        max_pages=max_pages,
+        log_every=args.log_every,
+        base_url=category.base_url,
+        session=session,
+        progress=progress,
+        dead_letters_path=args.dead_letters,
+    )
+    with metrics.labels(category=category.name):
+        if args.workers > 0:
+            return crawl_room_category_concurrent(
+                category.rooms,
+                workers=args.workers,
+                per_host=args.per_host,
+                parse_workers=None if args.parse_workers < 0 else args.parse_workers,
+                save_html_dir=args.save_html,
+                **common,
+            )
+        return crawl_room_category(rooms=category.rooms, **common)
 
 
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Pilot scrape imot.bg Sofia apartments")
-    parser.add_argument("--pages", type=int, default=2, help="Max pages per room (None for all)")
+    parser.add_argument("--pages", type=int, default=2, help="Max pages per room (0 for all)")
     parser.add_argument("--delay", type=float, default=1.0, help="Delay between requests (seconds)")
     parser.add_argument(
         "--output-prefix",
@@ -24,24 +75,124 @@ def main(argv: list[str] | None = None) -> int:
         help="Prefix for output CSVs; rooms will append 1/2/3 and _pilot.csv",
     )
     parser.add_argument("--log-every", type=int, default=10, help="Log every N listings")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Concurrent detail fetchers per category (0 = sequential crawl)",
+    )
+    parser.add_argument("--per-host", type=int, default=4, help="Max in-flight requests per host")
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="Parse processes in concurrent mode (-1 = one per core, 0 = parse in threads)",
+    )
+    parser.add_argument("--batch-size", type=int, default=20, help="Rows buffered per CSV write")
+    parser.add_argument(
+        "--durability",
+        choices=["flush", "fsync"],
+        default="flush",
+        help="flush: hand batches to the OS; fsync: also sync to disk",
+    )
+    parser.add_argument(
+        "--index",
+        default=None,
+        help="Seen-listing index shared by all categories (default: seen_index.sqlite next to the CSVs)",
+    )
+    parser.add_argument("--save-html", default=None, help="Directory to keep raw detail pages for re-parsing")
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Refresh mode: also re-fetch re-priced listings and stop after runs of known pages",
+    )
+    parser.add_argument(
+        "--stop-after-known-pages",
+        type=int,
+        default=3,
+        help="Delta mode: stop after this many consecutive pages with nothing new or re-priced",
+    )
+    parser.add_argument("--cache-dir", default=None, help="Keep every HTTP response in this on-disk cache")
+    parser.add_argument("--cache-ttl-hours", type=float, default=None, help="Re-fetch cached responses older than this")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="Evict least recently used responses above this size")
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Crawl from --cache-dir only, without network (use a fresh --output-prefix/--index)",
+    )
+    parser.add_argument(
+        "--categories",
+        default=None,
+        help="JSON file listing the categories to crawl (default: rooms 1/2/3 from BASE_URLS)",
+    )
+    parser.add_argument("--parallel", action="store_true", help="Crawl all categories concurrently")
+    parser.add_argument("--rps", type=float, default=0,
+                        help="Global requests/second budget (0 = none); start rate with --adaptive")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="AIMD pacing between --min-rps and --max-rps instead of a fixed budget (ignores --delay)")
+    parser.add_argument("--min-rps", type=float, default=0.2, help="Adaptive mode: lowest request rate")
+    parser.add_argument("--max-rps", type=float, default=20, help="Adaptive mode: highest request rate")
+    parser.add_argument("--retries", type=int, default=3, help="Retries of 429/5xx/timeouts per request (jittered backoff)")
+    parser.add_argument(
+        "--dead-letters",
+        default=None,
+        help="File of listings that kept failing, retried first next run (default: dead_letters.jsonl next to the CSVs)",
+    )
+    parser.add_argument("--pool-size", type=int, default=16, help="Connections per host in the shared pool")
+    parser.add_argument("--progress-every", type=float, default=30, help="Parallel mode: seconds between progress lines")
+    parser.add_argument("--metrics", default=None,
+                        help="Record timings/counters per category and write them here (.prom or .jsonl)")
     args = parser.parse_args(argv)
+    if args.replay and not args.cache_dir:
+        parser.error("--replay needs --cache-dir")
+    if args.metrics:
+        metrics.enable()
+    http_cache = None
+    if args.cache_dir:
+        http_cache = HttpCache(
+            args.cache_dir,
+            mode="replay" if args.replay else "record",
+            ttl_seconds=args.cache_ttl_hours * 3600 if args.cache_ttl_hours else None,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None,
+        )
 
-    rooms_list = [1, 2, 3]
-    for r in rooms_list:
-        output_path = f"{args.output_prefix}{r}_pilot.csv"
-        print(f"[start] rooms={r} -> {output_path}, pages={args.pages}, delay={args.delay}s")
-        try:
-            crawl_room_category(
-                rooms=r,
-                output_path=output_path,
-                delay_seconds=args.delay,
-                max_pages=args.pages,
-                log_every=args.log_every,
-            )
-        except Exception as exc:  # noqa: BLE001
-            print(f"[error] rooms={r} failed: {exc}")
-    print("[done] pilot scrape finished")
-    return 0
+    throttle: RequestBudget | None = None
+    if args.adaptive:
+        throttle = AdaptiveThrottle(args.rps or 2.0, min_rps=args.min_rps, max_rps=args.max_rps)
+        args.delay = 0.0
+    elif args.rps:
+        throttle = RequestBudget(args.rps)
+    session = shared_session(max(args.pool_size, args.workers), throttle=throttle,
+                             retry=RetryPolicy(attempts=args.retries + 1), http_cache=http_cache)
+
+    categories = load_categories(args.categories) if args.categories else default_categories()
+    failed = 0
+    if args.parallel:
+        progress = crawl_categories(
+            categories,
+            lambda category, progress: _crawl_one(category, args, http_cache, session=session, progress=progress),
+            report_every=args.progress_every,
+        )
+        failed = sum(status == "failed" for status in progress.status.values())
+    else:
+        for category in categories:
+            try:
+                _crawl_one(category, args, http_cache, session=session)
+            except Exception as exc:  # noqa: BLE001
+                print(f"[error] category={category.name} failed: {exc}")
+                failed += 1
+    if isinstance(throttle, AdaptiveThrottle):
+        print(f"[throttle] final rate {throttle.rps:.2f} req/s, recent error rate {throttle.error_rate:.1%}")
+    if http_cache is not None:
+        print(f"[cache] hits={http_cache.hits} misses={http_cache.misses} entries={len(http_cache)} "
+              f"bytes={http_cache.total_bytes()}")
+        http_cache.close()
+    if args.metrics:
+        for line in metrics.summary("category"):
+            print(line)
+        print(f"[metrics] wrote {metrics.write(args.metrics)}")
+    print("[done] pilot scrape finished" + (f" ({failed} categories failed)" if failed else ""))
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
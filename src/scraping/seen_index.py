@@ -0,0 +1,267 @@
+"""Persistent index of listings already scraped, shared by all crawls.
+
+Restarting a crawl used to re-read the whole output CSV (including the long
+`desc_text` column) just to rebuild a set of URLs, and dedup was per file.
+`SeenIndex` keeps that state in a small SQLite database instead:
+- one row per listing, keyed by `listing_id` (URL when the id is missing),
+  with `url`, `rooms`, last `price_raw`, output file and first/last-seen
+  timestamps (UTC ISO-8601)
+- lookups are indexed queries, so opening the index costs milliseconds no
+  matter how many listings it holds
+- one database is shared across room categories and output files (by default
+  `seen_index.sqlite` next to the raw CSVs)
+- `record_batch` is wired to `RawWriter(on_flush=...)`, so a listing is only
+  marked seen once its row is on disk; `sync_csv` imports rows appended to a
+  CSV since the last recorded offset (first run, or a crash between the CSV
+  write and the index update)
+- for delta crawls it also keeps the headline (card) price and the HTTP
+  validators (ETag / Last-Modified) of detail and result pages, so
+  `classify` can tell new, re-priced and unchanged listings apart and
+  fetches can be conditional
+"""
+from __future__ import annotations
+
+import csv
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable
+
+INDEX_FILENAME = "seen_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    key TEXT PRIMARY KEY,
+    listing_id TEXT,
+    url TEXT,
+    rooms INTEGER,
+    price_raw TEXT,
+    card_price_raw TEXT,
+    http_etag TEXT,
+    http_last_modified TEXT,
+    output_path TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_url ON listings(url);
+CREATE TABLE IF NOT EXISTS synced_files (
+    path TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    http_etag TEXT,
+    http_last_modified TEXT
+);
+"""
+# Columns added after the first release of the index; created on open if missing.
+_LATER_COLUMNS = ("card_price_raw", "http_etag", "http_last_modified")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def default_index_path(output_path: str | Path) -> Path:
+    """Index location shared by every CSV in the same directory."""
+    return Path(output_path).parent / INDEX_FILENAME
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def _same_price(a: str | None, b: str | None) -> bool:
+    return _WHITESPACE_RE.sub("", a or "") == _WHITESPACE_RE.sub("", b or "")
+
+def validators_of(record: dict[str, Any] | None) -> dict[str, str]:
+    """HTTP validators stored for a listing or page, as `http_*` keys (empty when unknown)."""
+    if not record:
+        return {}
+    return {k: record[k] for k in ("http_etag", "http_last_modified") if record.get(k)}
+
+def _key(listing_id: str | None, url: str | None) -> str:
+    if listing_id:
+        return f"id:{listing_id}"
+    if url:
+        return f"url:{url}"
+    raise ValueError("listing needs a listing_id or url")
+
+class SeenIndex:
+    """SQLite-backed seen-listing index (see module docstring). Thread-safe."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(listings)")}
+        for column in _LATER_COLUMNS:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE listings ADD COLUMN {column} TEXT")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def get(self, listing_id: str | None = None, url: str | None = None) -> dict[str, Any] | None:
+        """Stored record for a listing, matched by id first and URL second."""
+        with self._lock:
+            self._conn.row_factory = sqlite3.Row
+            try:
+                row = None
+                if listing_id:
+                    row = self._conn.execute(
+                        "SELECT * FROM listings WHERE key = ?", (_key(listing_id, url),)
+                    ).fetchone()
+                if row is None and url:
+                    row = self._conn.execute("SELECT * FROM listings WHERE url = ? LIMIT 1", (url,)).fetchone()
+            finally:
+                self._conn.row_factory = None
+        return dict(row) if row is not None else None
+
+    def contains(self, listing_id: str | None = None, url: str | None = None) -> bool:
+        return self.get(listing_id, url) is not None
+
+    def classify(self, card: dict[str, Any]) -> tuple[str, dict[str, Any] | None]:
+        """Return ("new" | "repriced" | "known", stored record) for a results-page card.
+
+        A known listing counts as re-priced when the card's headline price
+        differs (ignoring whitespace) from the stored card price, or from the
+        detail price for listings indexed before card prices were kept.
+        """
+        record = self.get(card.get("listing_id"), card.get("url"))
+        if record is None:
+            return "new", None
+        stored = record.get("card_price_raw") or record.get("price_raw")
+        if card.get("price_raw") and stored and not _same_price(card["price_raw"], stored):
+            return "repriced", record
+        return "known", record
+
+    def page_validators(self, url: str) -> dict[str, str]:
+        """Stored ETag / Last-Modified of a results page."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT http_etag, http_last_modified FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        return validators_of(dict(zip(("http_etag", "http_last_modified"), row)) if row else None)
+
+    def set_page_validators(self, url: str, validators: dict[str, str | None]) -> None:
+        if not any(validators.values()):
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO pages (url, http_etag, http_last_modified) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET http_etag = excluded.http_etag, "
+                "http_last_modified = excluded.http_last_modified",
+                (url, validators.get("http_etag"), validators.get("http_last_modified")),
+            )
+
+    def _upsert(self, rows: Iterable[dict[str, Any]], *, output_path: str | None, rooms: int | None,
+                when: str) -> int:
+        params = []
+        for row in rows:
+            if not (row.get("listing_id") or row.get("url")):
+                continue
+            row_rooms = row.get("rooms") or rooms
+            params.append((
+                _key(row.get("listing_id"), row.get("url")),
+                row.get("listing_id"),
+                row.get("url"),
+                int(float(row_rooms)) if row_rooms not in (None, "") else None,
+                row.get("price_raw"),
+                row.get("card_price_raw"),
+                row.get("http_etag"),
+                row.get("http_last_modified"),
+                output_path,
+                when,
+                when,
+            ))
+        self._conn.executemany(
+            """
+            INSERT INTO listings (key, listing_id, url, rooms, price_raw, card_price_raw, http_etag,
+                                  http_last_modified, output_path, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                url = COALESCE(excluded.url, url),
+                rooms = COALESCE(excluded.rooms, rooms),
+                price_raw = COALESCE(excluded.price_raw, price_raw),
+                card_price_raw = COALESCE(excluded.card_price_raw, card_price_raw),
+                http_etag = COALESCE(excluded.http_etag, http_etag),
+                http_last_modified = COALESCE(excluded.http_last_modified, http_last_modified),
+                output_path = COALESCE(excluded.output_path, output_path),
+                last_seen = excluded.last_seen
+            """,
+            params,
+        )
+        return len(params)
+
+    def mark_seen(self, rows: Iterable[dict[str, Any]], *, output_path: str | None = None,
+                  rooms: int | None = None) -> int:
+        """Insert or refresh listings (first_seen is kept, last_seen is set to now)."""
+        with self._lock, self._conn:
+            return self._upsert(rows, output_path=output_path, rooms=rooms, when=_now())
+
+    def touch(self, cards: Iterable[dict[str, Any]]) -> None:
+        """Refresh last_seen for known listings that showed up on a results page."""
+        when = _now()
+        with self._lock, self._conn:
+            for card in cards:
+                self._conn.execute(
+                    "UPDATE listings SET last_seen = ? WHERE key = ? OR url = ?",
+                    (when, _key(card.get("listing_id"), card.get("url")), card.get("url")),
+                )
+
+    def record_batch(self, output_path: str | Path, rows: list[dict[str, Any]], end_offset: int,
+                     *, rooms: int | None = None) -> None:
+        """Mark a flushed batch seen and remember how far `output_path` is indexed."""
+        path = str(Path(output_path).resolve())
+        with self._lock, self._conn:
+            self._upsert(rows, output_path=str(output_path), rooms=rooms, when=_now())
+            self._set_offset(path, end_offset)
+
+    def _set_offset(self, path: str, offset: int) -> None:
+        self._conn.execute(
+            "INSERT INTO synced_files (path, byte_offset) VALUES (?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET byte_offset = excluded.byte_offset",
+            (path, offset),
+        )
+
+    def sync_csv(self, output_path: str | Path, *, rooms: int | None = None) -> int:
+        """Index rows appended to a raw CSV since the last recorded offset; return rows added."""
+        src = Path(output_path)
+        if not src.exists():
+            return 0
+        path = str(src.resolve())
+        size = src.stat().st_size
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT byte_offset FROM synced_files WHERE path = ?", (path,)
+            ).fetchone()
+        offset = found[0] if found and found[0] <= size else 0
+        if offset == size:
+            return 0
+        with src.open("r", encoding="utf-8", newline="") as f:
+            header = next(csv.reader(f), None)
+            if not header:
+                return 0
+            if offset:
+                f.seek(offset)
+            reader = csv.DictReader(f, fieldnames=header)
+            rows = [{k: (row.get(k) or None) for k in ("url", "listing_id", "price_raw", "rooms")} for row in reader]
+        when = _now()
+        with self._lock, self._conn:
+            added = self._upsert(rows, output_path=str(output_path), rooms=rooms, when=when)
+            self._set_offset(path, size)
+        if added:
+            print(f"[index] synced {added} rows from {output_path}")
+        return added
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SeenIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,210 @@
+"""Minimal stage DAG with content-hash caching and parallel execution.
+
+A `Stage` names its dependencies, the files it reads (`inputs`: paths, globs
+or directories), the files it writes (`outputs`), the modules whose source
+is its code version (`code`) and its parameters. Before running a stage,
+`run_dag` fingerprints all of that (SHA-256 of the input and code file
+contents, the parameters as JSON) and skips the stage when:
+- the fingerprint equals the one recorded after its last successful run, and
+- every output still exists with the content hash recorded then
+  (an output edited or deleted by hand re-runs the stage), and
+- `max_age_seconds` (stages that read the outside world, e.g. a crawl) has
+  not elapsed since that run
+
+Ready stages run concurrently in a thread pool as soon as their
+dependencies finish. A failed stage marks everything downstream "blocked";
+independent branches keep going. File hashes are cached by (size,
+mtime_ns) in the state file, so unchanged multi-MB inputs are not re-read
+on every run. Each stage that runs records `stage_seconds{stage=...}` and
+`stage_runs_total{stage=..., status=...}` (`src.workflow.metrics`), with
+its name as the `stage` label of everything it records.
+
+Usage:
+  results = run_dag(stages, state_path="data/cache/pipeline_state.json", workers=4)
+"""
+from __future__ import annotations
+
+import glob
+import hashlib
+import importlib.util
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from src.workflow import metrics
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], Any]
+    deps: list[str] = field(default_factory=list)
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    code: list[str] = field(default_factory=list)
+    params: dict[str, Any] = field(default_factory=dict)
+    max_age_seconds: float | None = None
+
+def expand(patterns: Iterable[str]) -> list[Path]:
+    """Files named by paths, globs or directories (recursively), sorted and de-duplicated."""
+    files: set[Path] = set()
+    for pattern in patterns:
+        for match in (glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]):
+            path = Path(match)
+            if path.is_dir():
+                files.update(p for p in path.rglob("*") if p.is_file())
+            elif path.is_file():
+                files.add(path)
+    return sorted(files)
+
+def module_file(module: str) -> Path:
+    spec = importlib.util.find_spec(module)
+    if spec is None or spec.origin is None:
+        raise ValueError(f"cannot locate module {module!r}")
+    return Path(spec.origin)
+
+class PipelineState:
+    """Per-stage fingerprints and output hashes of the last successful runs, plus a file-hash cache (JSON)."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.data: dict[str, Any] = {"stages": {}, "hashes": {}}
+        if self.path.exists():
+            try:
+                self.data = json.loads(self.path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                print(f"[warn] unreadable pipeline state {self.path}; every stage will run")
+        self._lock = threading.Lock()
+
+    def file_hash(self, path: Path) -> str:
+        stat = path.stat()
+        key = str(path.resolve())
+        with self._lock:
+            cached = self.data["hashes"].get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self.data["hashes"][key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, stage: Stage) -> str:
+        digest = hashlib.sha256(json.dumps({"name": stage.name, "params": stage.params},
+                                           sort_keys=True, default=str).encode("utf-8"))
+        for label, files in (("code", [module_file(m) for m in stage.code]), ("input", expand(stage.inputs))):
+            for path in files:
+                digest.update(f"{label}:{path}:{self.file_hash(path)}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def output_hashes(self, stage: Stage) -> dict[str, str]:
+        return {str(p): self.file_hash(p) for p in expand(stage.outputs)}
+
+    def is_fresh(self, stage: Stage, fingerprint: str) -> bool:
+        with self._lock:
+            record = self.data["stages"].get(stage.name)
+        if not record or record["fingerprint"] != fingerprint:
+            return False
+        if stage.max_age_seconds is not None and time.time() - record["finished"] > stage.max_age_seconds:
+            return False
+        if any(not expand([out]) for out in stage.outputs):
+            return False
+        return self.output_hashes(stage) == record["outputs"]
+
+    def record(self, stage: Stage, fingerprint: str) -> None:
+        outputs = self.output_hashes(stage)
+        with self._lock:
+            self.data["stages"][stage.name] = {"fingerprint": fingerprint, "outputs": outputs, "finished": time.time()}
+            self._save()
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data, indent=1, sort_keys=True), encoding="utf-8")
+        tmp.replace(self.path)
+
+def _check(stages: list[Stage]) -> dict[str, Stage]:
+    by_name = {s.name: s for s in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("stage names must be unique")
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"stage {stage.name} depends on unknown stages {missing}")
+    visiting: set[str] = set()
+    done: set[str] = set()
+
+    def visit(name: str) -> None:
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"dependency cycle through {name}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in by_name:
+        visit(name)
+    return by_name
+
+def run_dag(stages: list[Stage], *, state_path: str | Path, workers: int = 4, force: Iterable[str] = (),
+            dry_run: bool = False) -> dict[str, str]:
+    """Run `stages`; return each stage's status: ran, cached, failed, blocked (or stale, in a dry run)."""
+    by_name = _check(stages)
+    state = PipelineState(state_path)
+    force = set(force)
+    status: dict[str, str] = {}
+
+    def execute(stage: Stage) -> str:
+        fingerprint = state.fingerprint(stage)
+        if stage.name not in force and state.is_fresh(stage, fingerprint):
+            print(f"[dag] {stage.name}: up to date")
+            return "cached"
+        if dry_run:
+            print(f"[dag] {stage.name}: would run")
+            return "stale"
+        print(f"[dag] {stage.name}: running")
+        start = time.perf_counter()
+        try:
+            with metrics.labels(stage=stage.name):
+                stage.run()
+        except Exception as exc:  # noqa: BLE001 - report and block dependents
+            print(f"[error] stage {stage.name} failed after {time.perf_counter() - start:.1f}s: {exc!r}")
+            metrics.inc("stage_runs_total", stage=stage.name, status="failed")
+            return "failed"
+        metrics.observe("stage_seconds", time.perf_counter() - start, stage=stage.name)
+        metrics.inc("stage_runs_total", stage=stage.name, status="ran")
+        state.record(stage, fingerprint)  # inputs changed during the run -> stale next time
+        print(f"[dag] {stage.name}: done in {time.perf_counter() - start:.1f}s")
+        return "ran"
+
+    pending = dict(by_name)
+    running: dict[Future[str], str] = {}
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="stage") as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                dep_status = [status.get(d) for d in stage.deps]
+                if any(s in ("failed", "blocked") for s in dep_status):
+                    status[name] = "blocked"
+                    print(f"[dag] {name}: blocked by a failed dependency")
+                    del pending[name]
+                elif dry_run and any(s == "stale" for s in dep_status):
+                    status[name] = "stale"
+                    print(f"[dag] {name}: would run (after {', '.join(stage.deps)})")
+                    del pending[name]
+                elif all(s is not None for s in dep_status):
+                    running[pool.submit(execute, stage)] = name
+                    del pending[name]
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                status[running.pop(future)] = future.result()
+    return {s.name: status[s.name] for s in stages}
@@ -0,0 +1,176 @@
+"""End-to-end production run: crawl -> combine -> clean -> hedonic fit -> risk/yield map.
+
+Replaces running notebooks 01-04 by hand. Each step is a `dag.Stage`, so a
+rerun only executes the stages whose inputs, code or parameters changed:
+
+  crawl:<category> (one per category, in parallel)
+        -> combine   raw CSVs -> data/raw/raw_combined.csv (exact, with --near-duplicates also
+                     near-duplicate re-posts dropped)
+        -> clean     -> data/processed/processed.csv
+        -> hedonic   -> district_effects.csv, district_residuals.csv, hedonic_model.json (fixed-effects fit)
+  official           official_*.txt -> *_flat_final.csv + history (independent of the crawl)
+        -> risk_yield (after hedonic and official) -> district_metrics.csv
+
+Crawl stages have no file inputs; they count as up to date for
+`--crawl-max-age-hours` after their last run, and `--no-crawl` leaves the
+existing raw CSVs as they are. Stage state (fingerprints, output hashes) is
+kept in `data/cache/pipeline_state.json`.
+
+Usage:
+  python -m src.workflow.run_pipeline --no-crawl            # rebuild whatever is stale from the current raw CSVs
+  python -m src.workflow.run_pipeline --pages 0 --delta --rps 4
+  python -m src.workflow.run_pipeline --dry-run
+  python -m src.workflow.run_pipeline --force hedonic       # rerun one stage (and what it changes downstream)
+  python -m src.workflow.run_pipeline --no-crawl --metrics data/metrics/pipeline.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from src.workflow import metrics
+from src.workflow.dag import Stage, run_dag
+
+RAW_PREFIX = "data/raw/sales/raw_room"
+RAW_GLOB = "data/raw/sales/raw_*_pilot.csv"
+COMBINED_PATH = "data/raw/raw_combined.csv"
+PROCESSED_PATH = "data/processed/processed.csv"
+PROCESSED_DIR = "data/processed"
+OFFICIAL_DIR = "data/official"
+STATE_PATH = "data/cache/pipeline_state.json"
+PIPELINE = "src.workflow.run_pipeline"  # the stage bodies live here, so it is part of every stage's code
+
+def _crawl_stages(args: argparse.Namespace) -> list[Stage]:
+    from src.scraping.multi_crawl import default_categories, load_categories, shared_session
+
+    categories = load_categories(args.categories) if args.categories else default_categories()
+    session = None
+
+    def crawl(category):
+        def run() -> None:
+            nonlocal session
+            from src.scraping.pipeline import crawl_room_category
+
+            if session is None:
+                session = shared_session(max(len(categories), 4), rps=args.rps or None)
+            crawl_room_category(category.rooms, base_url=category.base_url,
+                                output_path=category.output_for(args.raw_prefix), delay_seconds=args.delay,
+                                max_pages=args.pages or None, delta=args.delta, session=session)
+        return run
+
+    return [
+        Stage(f"crawl:{c.name}", crawl(c), outputs=[c.output_for(args.raw_prefix)],
+              code=["src.scraping.pipeline", PIPELINE],
+              params={"url": c.base_url, "pages": args.pages, "delta": args.delta},
+              max_age_seconds=args.crawl_max_age_hours * 3600)
+        for c in categories
+    ]
+
+def build_stages(args: argparse.Namespace) -> list[Stage]:
+    crawl = [] if args.no_crawl else _crawl_stages(args)
+    processed_dir = Path(args.processed).parent
+    effects, resid = str(processed_dir / "district_effects.csv"), str(processed_dir / "district_residuals.csv")
+    model = str(processed_dir / "hedonic_model.json")
+    flat = [f"{args.official}/official_{kind}_flat_final.csv" for kind in ("sale", "rent")]
+    metrics = str(processed_dir / "district_metrics.csv")
+
+    def combine() -> None:
+        from src.processing.combine import drop_exact_duplicates, list_raw_paths, load_and_concat, write_combined
+        from src.processing.near_duplicates import drop_near_duplicates
+
+        paths = list_raw_paths(args.raw_glob)
+        if not paths:
+            raise FileNotFoundError(f"no raw files match {args.raw_glob}")
+        df = drop_exact_duplicates(load_and_concat(paths))
+        if args.near_duplicates:
+            df = drop_near_duplicates(df, threshold=args.near_duplicates)
+        write_combined(df, args.combined)
+
+    def clean() -> None:
+        from src.processing.cleaning import clean_listings
+        from src.processing.schema import apply_schema, write_processed
+
+        # same steps as notebook 02: clean, apply the compact modeling schema, write
+        write_processed(apply_schema(clean_listings(pd.read_csv(args.combined))), args.processed)
+
+    def hedonic() -> None:
+        from src.modeling.fixed_effects import HEDONIC_FORMULA, fit_fe_ols, hedonic_frame
+        from src.modeling.incremental import MODEL_COLUMNS, write_outputs
+        from src.processing.schema import read_processed
+
+        df = read_processed(args.processed, columns=MODEL_COLUMNS)
+        write_outputs(fit_fe_ols(HEDONIC_FORMULA, hedonic_frame(df)), processed_dir)
+
+    def official() -> None:
+        from src.processing.official import OfficialStore, discover, write_flat
+
+        snapshots = discover(args.official, args.official_date)
+        store = OfficialStore(Path(args.state).parent / "official", history_dir=args.official)
+        store.ingest(snapshots)
+        for kind in ("sale", "rent"):
+            latest = [s for s in snapshots if s.kind == kind]
+            if latest:
+                write_flat(kind, store.parsed(latest[-1]), args.official)
+
+    def risk_yield() -> None:
+        from src.modeling.risk_yield import load_inputs, risk_yield_metrics
+
+        risk_yield_metrics(*load_inputs(*flat, resid)).to_csv(metrics, index=False)
+
+    return [
+        *crawl,
+        Stage("combine", combine, deps=[s.name for s in crawl], inputs=[args.raw_glob], outputs=[args.combined],
+              code=["src.processing.combine", "src.processing.near_duplicates", PIPELINE],
+              params={"near_duplicates": args.near_duplicates}),
+        Stage("clean", clean, deps=["combine"], inputs=[args.combined], outputs=[args.processed],
+              code=["src.processing.cleaning", "src.processing.schema", PIPELINE]),
+        Stage("hedonic", hedonic, deps=["clean"], inputs=[args.processed], outputs=[effects, resid, model],
+              code=["src.modeling.fixed_effects", "src.modeling.incremental", PIPELINE]),
+        Stage("official", official, inputs=[f"{args.official}/**/official_sale*.txt",
+                                            f"{args.official}/**/official_rent*.txt"],
+              outputs=flat, code=["src.processing.official", PIPELINE], params={"date": args.official_date}),
+        Stage("risk_yield", risk_yield, deps=["hedonic", "official"], inputs=[*flat, resid], outputs=[metrics],
+              code=["src.modeling.risk_yield", "src.modeling.quadrants", "src.processing.districts", PIPELINE]),
+    ]
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the scrape -> clean -> model -> map pipeline, skipping fresh stages")
+    parser.add_argument("--no-crawl", action="store_true", help="Use the existing raw CSVs, do not crawl")
+    parser.add_argument("--categories", default=None, help="Category JSON (see src.scraping.multi_crawl)")
+    parser.add_argument("--pages", type=int, default=2, help="Max result pages per category (0 for all)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Delay between requests (seconds)")
+    parser.add_argument("--rps", type=float, default=0, help="Shared request budget across categories (0 = none)")
+    parser.add_argument("--delta", action="store_true", help="Refresh crawl (see run_scrape --delta)")
+    parser.add_argument("--crawl-max-age-hours", type=float, default=24, help="Re-crawl after this long")
+    parser.add_argument("--raw-prefix", default=RAW_PREFIX, help="Output prefix of the crawl CSVs")
+    parser.add_argument("--raw-glob", default=RAW_GLOB, help="Raw files the combine stage reads")
+    parser.add_argument("--combined", default=COMBINED_PATH)
+    parser.add_argument("--near-duplicates", type=float, nargs="?", const=0.7, default=None, metavar="THRESHOLD",
+                        help="Also keep one listing per near-duplicate cluster (MinHash similarity, default 0.7)")
+    parser.add_argument("--processed", default=PROCESSED_PATH)
+    parser.add_argument("--official", default=OFFICIAL_DIR, help="Directory of the official_*.txt snapshots")
+    parser.add_argument("--official-date", type=date.fromisoformat, default=None,
+                        help="Date of official snapshots without one in their file name")
+    parser.add_argument("--state", default=STATE_PATH, help="Stage fingerprints and output hashes")
+    parser.add_argument("--workers", type=int, default=4, help="Stages run concurrently")
+    parser.add_argument("--force", nargs="*", default=[], metavar="STAGE", help="Run these stages even if fresh")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages would run")
+    parser.add_argument("--metrics", default=None, help="Record stage/step timings and write them here (.prom or .jsonl)")
+    args = parser.parse_args(argv)
+    stages = build_stages(args)
+    unknown = set(args.force) - {s.name for s in stages}
+    if unknown:
+        parser.error(f"unknown stages {sorted(unknown)}; have {[s.name for s in stages]}")
+    if args.metrics:
+        metrics.enable()
+    status = run_dag(stages, state_path=args.state, workers=args.workers, force=args.force, dry_run=args.dry_run)
+    print("[dag] " + ", ".join(f"{name}={s}" for name, s in status.items()))
+    if args.metrics:
+        print(f"[metrics] wrote {metrics.write(args.metrics)}")
+    return 1 if any(s in ("failed", "blocked") for s in status.values()) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())